@@ -0,0 +1,180 @@
+"""
+Módulo de control de admisión de consultas concurrentes.
+
+Limita cuántas consultas se procesan a la vez en el proceso (MAX_CONSULTAS_CONCURRENTES) y
+cuántas pueden esperar turno (MAX_COLA_CONSULTAS). Cuando la cola está llena, o una consulta
+espera más de ESPERA_MAX_COLA_CONSULTAS segundos, se rechaza con ColaLlena en lugar de
+acumular trabajo que el modelo no alcanza a atender (backpressure). La interfaz de Gradio
+aplica los mismos límites en su propia cola; este control protege además a los demás puntos
+de entrada que llaman a app.services.
+
+Dependencias:
+- threading: Condición que coordina las consultas en curso y en espera.
+- asyncio: Espera de turno de las corrutinas sin ocupar hilos.
+- app.config (obtener_parametro): Límites de concurrencia y de cola.
+- app.metricas (metricas): Tiempo de espera en cola y consultas rechazadas.
+"""
+
+import asyncio
+import contextlib
+import threading
+import time
+from app.config import obtener_parametro
+from app.metricas import metricas
+
+MAX_CONSULTAS_CONCURRENTES = obtener_parametro("MAX_CONSULTAS_CONCURRENTES", 8, int)
+MAX_COLA_CONSULTAS = obtener_parametro("MAX_COLA_CONSULTAS", 64, int)
+ESPERA_MAX_COLA_CONSULTAS = obtener_parametro("ESPERA_MAX_COLA_CONSULTAS", 120.0, float)
+
+
+class ColaLlena(RuntimeError):
+    """
+    La consulta se rechazó porque la cola de espera está llena o se agotó el tiempo de espera.
+    """
+
+
+class ControlAdmision:
+    """
+    Semáforo de consultas con una cola de espera acotada.
+
+    Se usa como context manager (`with admision:`) o, desde corrutinas, con `aadmitir()`.
+
+    Parameters:
+        max_concurrentes (int): Consultas procesadas a la vez.
+        max_cola (int): Consultas que pueden esperar turno; las siguientes se rechazan.
+        espera_maxima (float): Segundos máximos de espera en la cola.
+    """
+
+    def __init__(self, max_concurrentes=MAX_CONSULTAS_CONCURRENTES, max_cola=MAX_COLA_CONSULTAS,
+                 espera_maxima=ESPERA_MAX_COLA_CONSULTAS):
+        self.max_concurrentes = max(1, max_concurrentes)
+        self.max_cola = max(0, max_cola)
+        self.espera_maxima = espera_maxima
+        self.en_curso = 0
+        self.en_espera = 0
+        self.rechazadas = 0
+        self._condicion = threading.Condition()
+        # Turnos pendientes de las corrutinas en espera: (loop, futuro)
+        self._turnos_async = []
+
+    def entrar(self, timeout=None):
+        """
+        Espera un turno libre.
+
+        Parameters:
+            timeout (float, optional): Segundos máximos de espera (por defecto, espera_maxima).
+
+        Raises:
+            ColaLlena: Si la cola está llena o no hubo turno dentro del plazo.
+        """
+        timeout = self.espera_maxima if timeout is None else timeout
+        inicio = time.perf_counter()
+        with self._condicion:
+            if self.en_curso >= self.max_concurrentes:
+                if self.en_espera >= self.max_cola:
+                    self._rechazar("cola_llena")
+                self.en_espera += 1
+                try:
+                    admitida = self._condicion.wait_for(lambda: self.en_curso < self.max_concurrentes, timeout)
+                finally:
+                    self.en_espera -= 1
+                if not admitida:
+                    self._rechazar("espera_agotada")
+            self.en_curso += 1
+        metricas.observar("espera_admision_segundos", time.perf_counter() - inicio)
+
+    def salir(self):
+        with self._condicion:
+            self.en_curso -= 1
+            self._condicion.notify()
+            # Las corrutinas en espera vuelven a competir por el turno liberado
+            turnos, self._turnos_async = self._turnos_async, []
+        for loop, turno in turnos:
+            with contextlib.suppress(RuntimeError):  # Event loop ya cerrado
+                loop.call_soon_threadsafe(_resolver, turno)
+
+    def _rechazar(self, motivo):
+        # Se llama con la condición tomada
+        self.rechazadas += 1
+        metricas.incrementar("consultas_rechazadas_total", motivo=motivo)
+        raise ColaLlena(
+            f"Servidor saturado: {self.en_curso} consultas en curso y {self.en_espera} en espera ({motivo})"
+        )
+
+    def __enter__(self):
+        self.entrar()
+        return self
+
+    def __exit__(self, *excepcion):
+        self.salir()
+
+    async def aentrar(self):
+        """
+        Versión asíncrona de entrar: la espera ocurre en el event loop, sin ocupar un hilo del
+        executor por cada consulta en cola (las admitidas los necesitan para el pipeline).
+
+        Raises:
+            ColaLlena: Si la cola está llena o no hubo turno dentro de espera_maxima.
+        """
+        loop = asyncio.get_running_loop()
+        inicio = time.perf_counter()
+        limite = time.monotonic() + self.espera_maxima
+        en_cola = False
+        try:
+            while True:
+                with self._condicion:
+                    if self.en_curso < self.max_concurrentes:
+                        self.en_curso += 1
+                        break
+                    if not en_cola:
+                        if self.en_espera >= self.max_cola:
+                            self._rechazar("cola_llena")
+                        self.en_espera += 1
+                        en_cola = True
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self._rechazar("espera_agotada")
+                    turno = loop.create_future()
+                    self._turnos_async.append((loop, turno))
+                await asyncio.wait([turno], timeout=restante)
+        finally:
+            if en_cola:
+                with self._condicion:
+                    self.en_espera -= 1
+        metricas.observar("espera_admision_segundos", time.perf_counter() - inicio)
+
+    @contextlib.asynccontextmanager
+    async def aadmitir(self):
+        """
+        Context manager asíncrono: espera el turno con aentrar y lo libera al salir.
+        """
+        await self.aentrar()
+        try:
+            yield self
+        finally:
+            self.salir()
+
+    def estadisticas(self):
+        """
+        Devuelve el estado actual del control, para exportar en /metrics.
+
+        Returns:
+            dict: Consultas en curso, en espera, límites y total de rechazadas.
+        """
+        with self._condicion:
+            return {
+                "en_curso": self.en_curso,
+                "en_espera": self.en_espera,
+                "max_concurrentes": self.max_concurrentes,
+                "max_cola": self.max_cola,
+                "rechazadas": self.rechazadas,
+            }
+
+
+def _resolver(turno):
+    if not turno.done():
+        turno.set_result(None)
+
+
+# Control de admisión único del proceso
+admision = ControlAdmision()
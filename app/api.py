@@ -0,0 +1,361 @@
+"""
+Módulo de la API HTTP (ASGI) del pipeline RAG, independiente de la interfaz de Gradio.
+
+Pensada para clientes programáticos: cada consulta es un request HTTP que llega directo a
+aprocesar_consulta, sin la cola de eventos ni el protocolo de Gradio. Endpoints:
+- POST /consultas: consulta completa (aprocesar_consulta).
+- POST /consultas/stream: respuesta en texto plano que se envía a medida que se genera.
+- POST /consultas/lote: varias preguntas sobre un documento (procesar_lote).
+- POST /documentos: carga e indexación de archivos .pdf y .docx (cola de indexación).
+- GET /documentos/tareas/{tarea_id}: estado de una tarea de indexación.
+- GET /documentos, GET /salud (503 si la inicialización falló) y GET /metrics (métricas de este
+  proceso en formato Prometheus).
+
+Cada respuesta lleva los encabezados Server-Timing (duración total y de cada etapa del pipeline
+hasta el envío de los encabezados) y X-Traza (ID de los spans de la solicitud en el archivo de
+trazas). Las consultas pasan por el mismo control de admisión que la interfaz: con la cola llena
+se responde 503 con Retry-After, igual que si el modelo no está disponible.
+
+Ejecución:
+    uvicorn app.api:app --host 0.0.0.0 --port 8000 --workers 4
+
+Cada worker es un proceso con sus propios clientes de Chroma, modelos y pool de conexiones al
+proveedor (keep-alive, ver app.proveedores). La sincronización de documents/ al arrancar se hace
+de a un worker (bloqueo_inicializacion) y la caché de embeddings y las escrituras de cada
+colección se bloquean entre procesos (app.bloqueos). Las consultas escalan con --workers; la
+carga de documentos, en cambio, solo se acepta con un único worker vivo (si no, 409): el cliente
+de Chroma de cada worker no ve lo que indexa otro proceso hasta reabrir la colección.
+
+Dependencias:
+- fastapi: Rutas, validación de los cuerpos (app.models) y respuestas en streaming.
+- app.services (aprocesar_consulta, procesar_consulta_stream): Pipeline de consultas.
+- app.lote (procesar_lote): Consultas por lotes.
+- app.cola_indexacion (cola_indexacion): Indexación de los archivos cargados.
+- app.arranque (calentamiento): Inicialización en segundo plano al arrancar el worker.
+- app.admision (admision, ColaLlena): Límite de consultas concurrentes.
+- app.metricas (medir_solicitud, metricas): Encabezados de tiempos y endpoint /metrics.
+- app.bloqueos (RegistroProcesos): Workers vivos, para aceptar cargas solo con uno.
+"""
+
+import asyncio
+import contextlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from app.admision import MAX_CONSULTAS_CONCURRENTES, ColaLlena, admision
+from app.arranque import calentamiento
+from app.bloqueos import RegistroProcesos
+from app.cliente_llm import ESPERA_CIRCUITO_ABIERTO, CircuitoAbierto, LLMNoDisponible
+from app.config import configurar_logging, load_env_vars, obtener_parametro
+from app.inicializar_db import ORIGENES, documentos_en_cache
+from app.metricas import configurar_trazas, medir_solicitud, metricas
+from app.models import ConsultaAPI, LoteAPI, RespuestaConsulta
+
+MODO_UNICA_LLAMADA = obtener_parametro("MODO_UNICA_LLAMADA", False, bool)
+EXTENSIONES_SOPORTADAS = (".docx", ".pdf")
+# Hilos para las etapas bloqueantes del pipeline (asyncio.to_thread); cada consulta admitida
+# usa hasta dos a la vez (detección de idioma y recuperación)
+HILOS_API = obtener_parametro("HILOS_API", 4 * MAX_CONSULTAS_CONCURRENTES, int)
+
+# Directorios de los archivos cargados (los mismos que usa la interfaz)
+DIRECTORIO_CARGAS, PERSISTENCIA_CARGAS = ORIGENES[1]
+
+# Workers de la API vivos sobre el mismo chroma_db/
+workers = RegistroProcesos("chroma_db/.workers_api")
+
+# Tareas de limpieza de las cargas en segundo plano (se guardan para que no se recolecten)
+_limpiezas = set()
+
+
+@contextlib.asynccontextmanager
+async def ciclo_de_vida(aplicacion):
+    load_env_vars()
+    configurar_logging()
+    configurar_trazas()
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(HILOS_API, thread_name_prefix="api"))
+    # La inicialización pesada avanza mientras el worker ya acepta conexiones
+    calentamiento.iniciar()
+    workers.registrar()
+    try:
+        yield
+    finally:
+        workers.retirar()
+
+
+class EncabezadosTiempos:
+    """
+    Middleware ASGI que agrega Server-Timing y X-Traza a cada respuesta.
+
+    Parameters:
+        app: Aplicación ASGI envuelta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        inicio = time.perf_counter()
+        with medir_solicitud() as (traza, etapas):
+            async def enviar(mensaje):
+                if mensaje["type"] == "http.response.start":
+                    tiempos = [f"total;dur={(time.perf_counter() - inicio) * 1000:.1f}"]
+                    tiempos += [f"{etapa};dur={segundos * 1000:.1f}" for etapa, segundos in list(etapas.items())]
+                    mensaje["headers"] = [
+                        *mensaje.get("headers", []),
+                        (b"server-timing", ", ".join(tiempos).encode("latin-1")),
+                        (b"x-traza", traza.encode("latin-1")),
+                    ]
+                await send(mensaje)
+
+            await self.app(scope, receive, enviar)
+
+
+app = FastAPI(title="RAG Tradicional", lifespan=ciclo_de_vida)
+app.add_middleware(EncabezadosTiempos)
+
+
+@app.exception_handler(ColaLlena)
+async def _cola_llena(request: Request, error: ColaLlena):
+    return JSONResponse({"detail": str(error)}, status_code=503, headers={"Retry-After": "1"})
+
+
+@app.exception_handler(LLMNoDisponible)
+async def _llm_no_disponible(request: Request, error: LLMNoDisponible):
+    encabezados = {"Retry-After": str(int(ESPERA_CIRCUITO_ABIERTO))} if isinstance(error, CircuitoAbierto) else None
+    return JSONResponse({"detail": str(error)}, status_code=503, headers=encabezados)
+
+
+@app.exception_handler(FileNotFoundError)
+async def _documento_no_encontrado(request: Request, error: FileNotFoundError):
+    return JSONResponse({"detail": str(error)}, status_code=404)
+
+
+async def _esperar_calentamiento():
+    # La primera solicitud de cada worker espera a que termine la inicialización
+    if not calentamiento.listo:
+        try:
+            await asyncio.to_thread(calentamiento.esperar)
+        except Exception as e:
+            raise HTTPException(503, f"La inicialización del worker falló: {e}") from e
+
+
+def _modo_unica_llamada(solicitud):
+    return MODO_UNICA_LLAMADA if solicitud.modo_unica_llamada is None else solicitud.modo_unica_llamada
+
+
+@app.get("/salud")
+async def salud():
+    """
+    Estado del worker: 'iniciando', 'listo' o, con 503, 'error' si la inicialización falló.
+    """
+    if calentamiento.error is not None:
+        return JSONResponse(
+            {"estado": "error", "error": str(calentamiento.error), "pid": os.getpid()}, status_code=503
+        )
+    return {"estado": "listo" if calentamiento.listo else "iniciando", "pid": os.getpid()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def exportar_metricas():
+    return PlainTextResponse(metricas.exportar_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/documentos")
+async def listar_documentos():
+    """
+    Documentos consultables en este worker.
+    """
+    if not calentamiento.listo:
+        return {"documentos": documentos_en_cache()}
+    from app.cola_indexacion import cola_indexacion
+    return {"documentos": list(dict.fromkeys(calentamiento.resultado + cola_indexacion.documentos_indexados()))}
+
+
+@app.post("/consultas", response_model=RespuestaConsulta)
+async def consultar(consulta: ConsultaAPI):
+    """
+    Procesa una consulta y devuelve la respuesta completa.
+    """
+    await _esperar_calentamiento()
+    from app import services
+    return await services.aprocesar_consulta(
+        consulta, consulta.documento, consulta.temperatura, _modo_unica_llamada(consulta)
+    )
+
+
+def _producir(respuestas, bucle, cola, cancelado):
+    """
+    Recorre un generador de respuestas en un único hilo y entrega cada elemento a una cola de
+    asyncio como (respuesta, None), o (None, error) si falla; (None, None) marca el final.
+
+    Si se activa `cancelado` (el cliente se desconectó), el generador se cierra en este mismo
+    hilo tras su siguiente elemento, lo que libera de inmediato la admisión y el stream del
+    modelo en lugar de esperar a que el recolector de basura lo cierre.
+
+    Parameters:
+        respuestas (Generator): Generador de procesar_consulta_stream.
+        bucle (asyncio.AbstractEventLoop): Bucle de eventos dueño de la cola.
+        cola (asyncio.Queue): Cola que lee la respuesta en streaming.
+        cancelado (threading.Event): Indica que ya nadie lee la cola.
+    """
+    def entregar(elemento):
+        with contextlib.suppress(RuntimeError):  # Bucle ya cerrado
+            bucle.call_soon_threadsafe(cola.put_nowait, elemento)
+
+    try:
+        for respuesta in respuestas:
+            if cancelado.is_set():
+                break
+            entregar((respuesta, None))
+    except Exception as e:
+        entregar((None, e))
+    finally:
+        respuestas.close()
+        entregar((None, None))
+
+
+@app.post("/consultas/stream")
+async def consultar_stream(consulta: ConsultaAPI):
+    """
+    Procesa una consulta y envía la respuesta en texto plano a medida que se genera.
+    """
+    await _esperar_calentamiento()
+    from app import services
+    respuestas = services.procesar_consulta_stream(
+        consulta, consulta.documento, consulta.temperatura, _modo_unica_llamada(consulta)
+    )
+    cola, cancelado = asyncio.Queue(), threading.Event()
+    threading.Thread(
+        target=_producir, args=(respuestas, asyncio.get_running_loop(), cola, cancelado), name="stream_api", daemon=True
+    ).start()
+    # El primer fragmento se obtiene antes de responder: la admisión, el documento inexistente
+    # o el modelo no disponible se informan con su código HTTP y no como un cuerpo cortado
+    try:
+        primera, error = await cola.get()
+    except asyncio.CancelledError:
+        cancelado.set()
+        raise
+    if error is not None:
+        raise error
+
+    async def fragmentos():
+        # procesar_consulta_stream entrega la respuesta acumulada; se envía solo lo nuevo
+        anterior, actual = "", primera
+        try:
+            while actual is not None:
+                yield actual[len(anterior):]
+                anterior = actual
+                actual, error = await cola.get()
+                if error is not None:
+                    raise error
+        finally:
+            cancelado.set()  # Cliente desconectado: el productor cierra el generador
+
+    return StreamingResponse(fragmentos(), media_type="text/plain; charset=utf-8")
+
+
+@app.post("/consultas/lote")
+async def consultar_lote(lote: LoteAPI):
+    """
+    Responde varias preguntas sobre un documento. El lote ocupa un turno de admisión.
+    """
+    await _esperar_calentamiento()
+    from app.lote import procesar_lote
+    from app.models import SolicitudConsulta
+
+    solicitudes = [SolicitudConsulta(user_name=lote.user_name, question=pregunta) for pregunta in lote.preguntas]
+    async with admision.aadmitir():
+        resultado = await asyncio.to_thread(
+            procesar_lote, solicitudes, lote.documento, lote.temperatura,
+            modo_unica_llamada=_modo_unica_llamada(lote), k=lote.k
+        )
+    return {
+        "resultados": resultado.resultados,
+        "segundos": resultado.segundos,
+        "reintentos": resultado.reintentos,
+        "errores": resultado.errores,
+    }
+
+
+def _describir_tarea(tarea):
+    return {
+        "tarea": tarea.id,
+        "estado": tarea.estado,
+        "archivos": [nombre for _, nombre in tarea.archivos],
+        "procesados": list(tarea.procesados),
+        "documentos": tarea.documentos,
+        "error": tarea.error,
+    }
+
+
+def _guardar_archivo(archivo, directorio):
+    # Copia un archivo recibido al directorio temporal de la carga (bloqueante: se ejecuta en un hilo)
+    ruta = os.path.join(directorio, os.path.basename(archivo.filename))
+    with open(ruta, "wb") as destino:
+        shutil.copyfileobj(archivo.file, destino)
+    return ruta
+
+
+async def _terminar_carga(tarea, directorio):
+    # Espera la tarea y borra las copias temporales de los archivos recibidos
+    try:
+        await asyncio.wrap_future(tarea.futuro)
+    finally:
+        await asyncio.to_thread(shutil.rmtree, directorio, True)
+
+
+@app.post("/documentos")
+async def cargar_documentos(archivos: List[UploadFile] = File(...), esperar: bool = False):
+    """
+    Encola la indexación de los archivos recibidos. Devuelve 202 con el ID de la tarea o, con
+    esperar=true, 200 cuando los documentos ya se pueden consultar. Con más de un worker vivo
+    responde 409.
+    """
+    if workers.contar() > 1:
+        raise HTTPException(
+            409, "La carga de documentos requiere un solo worker de la API: los demás workers no verían los "
+                 "documentos nuevos. Inicia la API con --workers 1 para cargar documentos."
+        )
+    invalidos = [archivo.filename for archivo in archivos if not (archivo.filename or "").lower().endswith(EXTENSIONES_SOPORTADAS)]
+    if invalidos:
+        raise HTTPException(400, f"Formatos soportados: {', '.join(EXTENSIONES_SOPORTADAS)}. Rechazados: {', '.join(map(str, invalidos))}")
+    await _esperar_calentamiento()
+    from app.cola_indexacion import cola_indexacion
+
+    directorio = tempfile.mkdtemp(prefix="carga_api_")
+    rutas = []
+    for archivo in archivos:
+        rutas.append(await asyncio.to_thread(_guardar_archivo, archivo, directorio))
+    tarea = cola_indexacion.encolar(rutas, DIRECTORIO_CARGAS, PERSISTENCIA_CARGAS)
+
+    limpieza = asyncio.create_task(_terminar_carga(tarea, directorio))
+    _limpiezas.add(limpieza)
+    limpieza.add_done_callback(_limpiezas.discard)
+    if not esperar:
+        return JSONResponse(_describir_tarea(tarea), status_code=202)
+    # Si el cliente se desconecta, la limpieza sigue esperando a la tarea (no borra los archivos antes)
+    await asyncio.shield(limpieza)
+    if tarea.error:
+        raise HTTPException(500, f"Error al indexar: {tarea.error}")
+    return _describir_tarea(tarea)
+
+
+@app.get("/documentos/tareas/{tarea_id}")
+async def estado_tarea(tarea_id: str):
+    """
+    Estado de una tarea de indexación (las cargas solo se aceptan con un único worker).
+    """
+    from app.cola_indexacion import cola_indexacion
+    tarea = cola_indexacion.obtener(tarea_id)
+    if tarea is None:
+        raise HTTPException(404, f"No existe la tarea {tarea_id}.")
+    return _describir_tarea(tarea)
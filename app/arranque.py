@@ -0,0 +1,106 @@
+"""
+Módulo de arranque diferido de la aplicación.
+
+Con ARRANQUE_DIFERIDO (por defecto) la interfaz se construye y se lanza sin esperar la
+inicialización pesada: la lista de documentos se lee de los manifiestos de ingesta y un hilo en
+segundo plano importa el pipeline, sincroniza `documents/` con Chroma (inicializar_documentos),
+crea los clientes de Chroma y el modelo de chat, y deja cargado el modelo de embeddings. La
+primera consulta espera a que ese calentamiento termine.
+
+Dependencias:
+- threading: Hilo del calentamiento y evento de finalización.
+- app.config (obtener_parametro): Activación del arranque diferido.
+"""
+
+import logging
+import threading
+import time
+from app.config import obtener_parametro
+
+ARRANQUE_DIFERIDO = obtener_parametro("ARRANQUE_DIFERIDO", True, bool)
+
+logger = logging.getLogger(__name__)
+
+
+def calentar():
+    """
+    Inicialización pesada de la aplicación: indexa los documentos nuevos o modificados,
+    importa app.services (cliente del modelo de chat y detector de idioma) y carga el modelo de
+    embeddings compartido.
+
+    Returns:
+        list: Documentos disponibles tras la inicialización.
+    """
+    from app.inicializar_db import inicializar_documentos
+    documentos = inicializar_documentos()
+    from app import services
+    services.registro.embeddings()
+    return documentos
+
+
+class Calentamiento:
+    """
+    Ejecuta una función de inicialización una sola vez, en un hilo en segundo plano.
+
+    Parameters:
+        funcion (callable): Inicialización a ejecutar; su resultado queda en `resultado`.
+    """
+
+    def __init__(self, funcion=calentar):
+        self.funcion = funcion
+        self.resultado = None
+        self.error = None
+        self.segundos = None
+        self._terminado = threading.Event()
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    @property
+    def listo(self):
+        return self._terminado.is_set() and self.error is None
+
+    def iniciar(self):
+        """
+        Lanza el calentamiento si aún no se lanzó. Devuelve de inmediato.
+        """
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._ejecutar, name="calentamiento", daemon=True)
+                self._hilo.start()
+
+    def _ejecutar(self):
+        inicio = time.perf_counter()
+        try:
+            self.resultado = self.funcion()
+        except Exception as e:
+            self.error = e
+            logger.exception("Error en la inicialización en segundo plano")
+        finally:
+            self.segundos = time.perf_counter() - inicio
+            logger.info("Inicialización en segundo plano terminada en %.2fs", self.segundos)
+            self._terminado.set()
+
+    def esperar(self, timeout=None):
+        """
+        Espera a que termine el calentamiento, lanzándolo si hace falta.
+
+        Parameters:
+            timeout (float, optional): Segundos máximos de espera.
+
+        Returns:
+            Resultado de la función de inicialización.
+
+        Raises:
+            TimeoutError: Si no termina dentro del plazo.
+            Exception: El error de la inicialización, si falló.
+        """
+        self.iniciar()
+        if not self._terminado.wait(timeout):
+            raise TimeoutError("La inicialización de la aplicación no terminó a tiempo")
+        if self.error is not None:
+            raise self.error
+        return self.resultado
+
+
+# Calentamiento único del proceso
+calentamiento = Calentamiento()
@@ -0,0 +1,140 @@
+"""
+Módulo de bloqueos entre procesos sobre archivos.
+
+Los workers de uvicorn (y la interfaz, si comparte `chroma_db/`) son procesos distintos y los
+threading.Lock de cada uno no los coordinan. Estos bloqueos usan fcntl.flock sobre un archivo
+de bloqueo, que el sistema operativo libera si el proceso termina. Sin fcntl (Windows) solo
+coordinan los hilos del proceso.
+
+También permite contar los procesos vivos que comparten un directorio (RegistroProcesos).
+
+Dependencias:
+- fcntl: Bloqueos de archivo POSIX.
+- threading: Reentrada y exclusión entre los hilos de un mismo proceso.
+"""
+
+import contextlib
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+@contextlib.contextmanager
+def bloqueo_archivo(ruta):
+    """
+    Toma un bloqueo exclusivo sobre un archivo (creándolo si no existe) mientras dura el bloque.
+
+    Parameters:
+        ruta (str): Ruta del archivo de bloqueo.
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    with open(ruta, "a") as archivo:
+        fcntl.flock(archivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(archivo, fcntl.LOCK_UN)
+
+
+class BloqueoEntreProcesos:
+    """
+    Bloqueo reentrante que excluye a los hilos del proceso (RLock) y a los demás procesos
+    (bloqueo_archivo, tomado solo por el nivel más externo).
+
+    Parameters:
+        ruta (str): Ruta del archivo de bloqueo.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._rlock = threading.RLock()
+        self._profundidad = 0
+        self._archivo = None
+
+    def __enter__(self):
+        self._rlock.acquire()
+        if self._profundidad == 0:
+            try:
+                self._archivo = contextlib.ExitStack()
+                self._archivo.enter_context(bloqueo_archivo(self.ruta))
+            except BaseException:
+                self._rlock.release()
+                raise
+        self._profundidad += 1
+        return self
+
+    def __exit__(self, *excepcion):
+        self._profundidad -= 1
+        try:
+            if self._profundidad == 0:
+                self._archivo.close()
+        finally:
+            self._rlock.release()
+
+
+class RegistroProcesos:
+    """
+    Registro de los procesos vivos que comparten un directorio (por ejemplo, los workers de la
+    API). Cada proceso mantiene un bloqueo exclusivo sobre su propio archivo mientras vive, así
+    que un archivo sin bloqueo es de un proceso terminado y se borra al contar. Sin fcntl solo
+    cuenta al proceso actual.
+
+    Parameters:
+        directorio (str): Directorio de los archivos de registro.
+    """
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self._archivo = None
+
+    def registrar(self):
+        """
+        Registra el proceso actual hasta que llame a retirar() o termine.
+        """
+        if fcntl is None or self._archivo is not None:
+            return
+        os.makedirs(self.directorio, exist_ok=True)
+        self._archivo = open(os.path.join(self.directorio, f"{os.getpid()}.lock"), "w")
+        fcntl.flock(self._archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def retirar(self):
+        if self._archivo is None:
+            return
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._archivo.name)
+        self._archivo.close()
+        self._archivo = None
+
+    def contar(self):
+        """
+        Cuenta los procesos registrados que siguen vivos.
+
+        Returns:
+            int: Procesos vivos, incluido el actual (1 si no está registrado).
+        """
+        if self._archivo is None:
+            return 1
+        propio = os.path.basename(self._archivo.name)
+        vivos = 1
+        for nombre in os.listdir(self.directorio):
+            if nombre == propio or not nombre.endswith(".lock"):
+                continue
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                with open(ruta, "a") as archivo:
+                    try:
+                        fcntl.flock(archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        vivos += 1
+                        continue
+                    os.remove(ruta)
+            except FileNotFoundError:
+                continue
+        return vivos
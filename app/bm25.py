@@ -0,0 +1,228 @@
+"""
+Módulo de búsqueda léxica BM25 por documento y fusión con la búsqueda vectorial.
+
+Cada documento indexado tiene su propio índice invertido BM25, construido durante la ingesta y
+persistido junto a la base Chroma (`<persist_directory>/bm25/`). La recuperación híbrida combina
+el ranking BM25 con el vectorial mediante Reciprocal Rank Fusion (RRF), lo que recupera términos
+exactos (nombres, códigos, números) que la búsqueda por embeddings suele pasar por alto.
+
+Dependencias:
+- math: Cálculo del IDF.
+- json: Persistencia de los índices.
+- app.config (obtener_parametro): Parámetros de BM25 y de la fusión.
+- app.idioma (PALABRAS_VACIAS): Palabras que se ignoran en las consultas.
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from app.config import obtener_parametro
+from app.idioma import PALABRAS_VACIAS
+
+# Parámetros de la recuperación híbrida
+RECUPERACION_HIBRIDA = obtener_parametro("RECUPERACION_HIBRIDA", True, bool)
+K_RRF = obtener_parametro("K_RRF", 60, int)
+PESO_VECTORIAL = obtener_parametro("PESO_VECTORIAL", 1.0, float)
+PESO_BM25 = obtener_parametro("PESO_BM25", 1.0, float)
+K_CANDIDATOS = obtener_parametro("K_CANDIDATOS", 10, int)
+
+_PATRON_TERMINO = re.compile(r"\w+(?:[.,-]\w+)*", re.UNICODE)
+
+
+def tokenizar(texto):
+    """
+    Divide un texto en términos en minúsculas. Conserva números y códigos con puntos o guiones
+    (por ejemplo, '2.0' o 'V6-TDI') como un único término.
+
+    Parameters:
+        texto (str): Texto a tokenizar.
+
+    Returns:
+        list: Términos del texto.
+    """
+    return _PATRON_TERMINO.findall(texto.lower())
+
+
+class IndiceBM25:
+    """
+    Índice invertido BM25 sobre los fragmentos de un documento.
+
+    Parameters:
+        ids (list): IDs de los fragmentos.
+        textos (list): Contenido de cada fragmento.
+        metadatos (list, optional): Metadatos de cada fragmento (documento, página, posición).
+        k1 (float): Saturación de la frecuencia de términos.
+        b (float): Normalización por longitud del fragmento.
+    """
+
+    def __init__(self, ids, textos, metadatos=None, k1=1.5, b=0.75):
+        self.ids = list(ids)
+        self.textos = list(textos)
+        self.metadatos = list(metadatos) if metadatos is not None else [{} for _ in self.ids]
+        self.posiciones = {chunk_id: posicion for posicion, chunk_id in enumerate(self.ids)}
+        self.k1 = k1
+        self.b = b
+        self.longitudes = []
+        self.postings = {}  # término -> [(posición del fragmento, frecuencia)]
+        for posicion, texto in enumerate(self.textos):
+            frecuencias = Counter(tokenizar(texto))
+            self.longitudes.append(sum(frecuencias.values()))
+            for termino, frecuencia in frecuencias.items():
+                self.postings.setdefault(termino, []).append((posicion, frecuencia))
+        self.longitud_media = sum(self.longitudes) / len(self.longitudes) if self.longitudes else 0.0
+
+    def idf(self, termino):
+        n = len(self.ids)
+        df = len(self.postings.get(termino, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def buscar(self, consulta, k):
+        """
+        Devuelve los fragmentos con mayor puntaje BM25 para la consulta. Las palabras vacías
+        de la consulta se ignoran, salvo que no quede ningún otro término.
+
+        Parameters:
+            consulta (str): Texto de la consulta.
+            k (int): Número máximo de resultados.
+
+        Returns:
+            list: Tuplas (id, texto, metadatos, puntaje) ordenadas de mayor a menor puntaje.
+        """
+        terminos = set(tokenizar(consulta))
+        puntajes = {}
+        for termino in (terminos - PALABRAS_VACIAS) or terminos:
+            postings = self.postings.get(termino)
+            if not postings:
+                continue
+            idf = self.idf(termino)
+            for posicion, frecuencia in postings:
+                normalizacion = self.k1 * (1 - self.b + self.b * self.longitudes[posicion] / (self.longitud_media or 1))
+                puntajes[posicion] = puntajes.get(posicion, 0.0) + idf * frecuencia * (self.k1 + 1) / (frecuencia + normalizacion)
+        mejores = sorted(puntajes.items(), key=lambda par: par[1], reverse=True)[:k]
+        return [
+            (self.ids[posicion], self.textos[posicion], self.metadatos[posicion], puntaje)
+            for posicion, puntaje in mejores
+        ]
+
+    def fragmento(self, chunk_id):
+        """
+        Devuelve el contenido y los metadatos de un fragmento del documento.
+
+        Returns:
+            tuple: (texto, metadatos) del fragmento.
+        """
+        posicion = self.posiciones[chunk_id]
+        return self.textos[posicion], self.metadatos[posicion]
+
+    def a_dict(self):
+        return {"ids": self.ids, "textos": self.textos, "metadatos": self.metadatos, "k1": self.k1, "b": self.b}
+
+    @classmethod
+    def desde_dict(cls, datos):
+        return cls(datos["ids"], datos["textos"], datos.get("metadatos"), datos.get("k1", 1.5), datos.get("b", 0.75))
+
+
+class AlmacenBM25:
+    """
+    Persistencia y caché en memoria de los índices BM25 de cada documento.
+
+    Parameters:
+        max_en_memoria (int): Número máximo de índices cargados a la vez.
+    """
+
+    def __init__(self, max_en_memoria=64):
+        self.max_en_memoria = max_en_memoria
+        self._cargados = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def ruta(persist_directory, documento):
+        nombre = hashlib.sha1(documento.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(persist_directory, "bm25", f"{nombre}.json")
+
+    def _recordar(self, ruta, indice):
+        with self._lock:
+            self._cargados[ruta] = indice
+            self._cargados.move_to_end(ruta)
+            while len(self._cargados) > self.max_en_memoria:
+                self._cargados.popitem(last=False)
+
+    def construir(self, persist_directory, documento, ids, textos, metadatos=None):
+        """
+        Construye y persiste el índice BM25 de un documento.
+
+        Parameters:
+            persist_directory (str): Directorio de persistencia de la colección.
+            documento (str): Nombre del documento.
+            ids (list): IDs de los fragmentos.
+            textos (list): Contenido de los fragmentos.
+            metadatos (list, optional): Metadatos de los fragmentos.
+
+        Returns:
+            IndiceBM25: Índice construido.
+        """
+        indice = IndiceBM25(ids, textos, metadatos)
+        ruta = self.ruta(persist_directory, documento)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({"documento": documento, **indice.a_dict()}, f, ensure_ascii=False)
+        os.replace(temporal, ruta)
+        self._recordar(ruta, indice)
+        return indice
+
+    def obtener(self, persist_directory, documento):
+        """
+        Devuelve el índice BM25 de un documento, cargándolo del disco si hace falta.
+
+        Returns:
+            IndiceBM25 | None: Índice del documento, o None si no existe.
+        """
+        ruta = self.ruta(persist_directory, documento)
+        with self._lock:
+            if ruta in self._cargados:
+                self._cargados.move_to_end(ruta)
+                return self._cargados[ruta]
+        if not os.path.exists(ruta):
+            return None
+        with open(ruta, encoding="utf-8") as f:
+            indice = IndiceBM25.desde_dict(json.load(f))
+        self._recordar(ruta, indice)
+        return indice
+
+    def eliminar(self, persist_directory, documento):
+        """
+        Elimina el índice BM25 de un documento (del disco y de la memoria).
+        """
+        ruta = self.ruta(persist_directory, documento)
+        with self._lock:
+            self._cargados.pop(ruta, None)
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+
+def fusionar_rrf(rankings, pesos, k_rrf=K_RRF):
+    """
+    Combina varios rankings con Reciprocal Rank Fusion ponderado.
+
+    Parameters:
+        rankings (list): Listas de IDs ordenadas de más a menos relevante.
+        pesos (list): Peso de cada ranking.
+        k_rrf (int): Constante de suavizado de RRF.
+
+    Returns:
+        list: IDs ordenados por puntaje fusionado.
+    """
+    puntajes = {}
+    for ranking, peso in zip(rankings, pesos):
+        for posicion, identificador in enumerate(ranking):
+            puntajes[identificador] = puntajes.get(identificador, 0.0) + peso / (k_rrf + posicion + 1)
+    return sorted(puntajes, key=puntajes.get, reverse=True)
+
+
+# Almacén único del proceso
+almacen_bm25 = AlmacenBM25()
@@ -0,0 +1,255 @@
+"""
+Módulo de caché persistente de embeddings direccionada por contenido.
+
+Envuelve un modelo de embeddings de Langchain (por ejemplo, CohereEmbeddings) y guarda en disco
+cada vector calculado, usando como clave el hash de (modelo, tipo de entrada, texto). Así, volver
+a subir un documento apenas editado o reconstruir `chroma_db/` no vuelve a pagar por los
+fragmentos que no cambiaron.
+
+Formato en disco (un subdirectorio por modelo):
+- vectores.f32: matriz float32 de filas contiguas, leída como memoria mapeada.
+- indice.tsv: líneas `hash<TAB>fila`, solo se agregan al final.
+- meta.json: modelo y dimensión de los vectores.
+- indice.lock: bloqueo de las escrituras. Varios procesos (workers de la API, la interfaz)
+  pueden compartir la caché: cada escritura lee antes las entradas que agregaron los demás y
+  calcula la fila inicial con el archivo bloqueado.
+
+Dependencias:
+- numpy: Almacenamiento compacto y lectura mapeada en memoria.
+- langchain_core (Embeddings): Interfaz común de los modelos de embeddings.
+- app.proveedores (crear_embeddings): Modelo de embeddings del proveedor configurado.
+- app.config (obtener_parametro): Directorio de la caché.
+- app.bloqueos (bloqueo_archivo): Exclusión entre procesos de las escrituras.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from app.bloqueos import bloqueo_archivo
+from app.config import obtener_parametro
+from app.proveedores import crear_embeddings
+
+DIRECTORIO_CACHE_EMBEDDINGS = obtener_parametro("DIRECTORIO_CACHE_EMBEDDINGS", "chroma_db/cache_embeddings")
+
+
+class AlmacenVectores:
+    """
+    Almacén en disco de vectores float32 indexados por hash.
+
+    Parameters:
+        directorio (str): Directorio donde se guardan los archivos del almacén.
+        modelo (str): Identificador del modelo, guardado en los metadatos.
+    """
+
+    def __init__(self, directorio, modelo):
+        self.directorio = directorio
+        self.modelo = modelo
+        self.ruta_vectores = os.path.join(directorio, "vectores.f32")
+        self.ruta_indice = os.path.join(directorio, "indice.tsv")
+        self.ruta_meta = os.path.join(directorio, "meta.json")
+        self.ruta_bloqueo = os.path.join(directorio, "indice.lock")
+        self.dimension = None
+        self._indice = {}
+        self._posicion_indice = 0  # Bytes de indice.tsv ya leídos
+        self._mapa = None
+        self._lock = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+        self._cargar()
+
+    def _cargar(self):
+        if self.dimension is None and os.path.exists(self.ruta_meta):
+            with open(self.ruta_meta, encoding="utf-8") as f:
+                self.dimension = json.load(f)["dimension"]
+        if self.dimension is None or not os.path.exists(self.ruta_indice):
+            return
+
+        # Solo se aceptan filas completamente escritas en vectores.f32, y líneas completas del índice
+        filas_en_disco = os.path.getsize(self.ruta_vectores) // (4 * self.dimension)
+        with open(self.ruta_indice, "rb") as f:
+            f.seek(self._posicion_indice)
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break
+                self._posicion_indice += len(linea)
+                partes = linea.decode("utf-8").rstrip("\n").split("\t")
+                if len(partes) == 2 and partes[1].isdigit() and int(partes[1]) < filas_en_disco:
+                    self._indice[partes[0]] = int(partes[1])
+
+    def __len__(self):
+        return len(self._indice)
+
+    def _matriz(self, filas_necesarias):
+        # Se vuelve a mapear el archivo cuando creció desde el último acceso
+        if self._mapa is None or self._mapa.shape[0] < filas_necesarias:
+            filas = os.path.getsize(self.ruta_vectores) // (4 * self.dimension)
+            self._mapa = np.memmap(self.ruta_vectores, dtype=np.float32, mode="r", shape=(filas, self.dimension))
+        return self._mapa
+
+    def obtener(self, claves):
+        """
+        Lee los vectores almacenados para un conjunto de claves.
+
+        Parameters:
+            claves (list): Hashes a buscar.
+
+        Returns:
+            dict: Vectores encontrados (como listas de floats) indexados por clave.
+        """
+        with self._lock:
+            filas = {clave: self._indice[clave] for clave in claves if clave in self._indice}
+            if not filas:
+                return {}
+            matriz = self._matriz(max(filas.values()) + 1)
+            return {clave: matriz[fila].tolist() for clave, fila in filas.items()}
+
+    def agregar(self, vectores_por_clave):
+        """
+        Agrega vectores nuevos al final del almacén.
+
+        Parameters:
+            vectores_por_clave (dict): Vectores indexados por clave.
+        """
+        with self._lock, bloqueo_archivo(self.ruta_bloqueo):
+            # Entradas que otros procesos agregaron desde la última lectura
+            self._cargar()
+            nuevos = {clave: vector for clave, vector in vectores_por_clave.items() if clave not in self._indice}
+            if not nuevos:
+                return
+            matriz = np.asarray(list(nuevos.values()), dtype=np.float32)
+            if self.dimension is None:
+                self.dimension = int(matriz.shape[1])
+                with open(self.ruta_meta, "w", encoding="utf-8") as f:
+                    json.dump({"modelo": self.modelo, "dimension": self.dimension}, f)
+            elif matriz.shape[1] != self.dimension:
+                raise ValueError(f"Dimensión inesperada {matriz.shape[1]} (se esperaba {self.dimension}).")
+
+            # Primero los vectores y luego el índice: una escritura interrumpida no deja claves
+            # huérfanas. Una fila incompleta de una escritura interrumpida se descarta.
+            fila_inicial = os.path.getsize(self.ruta_vectores) // (4 * self.dimension) if os.path.exists(self.ruta_vectores) else 0
+            with open(self.ruta_vectores, "ab") as f:
+                f.truncate(fila_inicial * 4 * self.dimension)
+                f.write(matriz.tobytes())
+            with open(self.ruta_indice, "ab") as f:
+                # Una línea incompleta al final se cierra para no pegarla a la primera nueva
+                prefijo = "\n" if f.tell() > self._posicion_indice else ""
+                lineas = "".join(f"{clave}\t{fila_inicial + desplazamiento}\n" for desplazamiento, clave in enumerate(nuevos))
+                f.write((prefijo + lineas).encode("utf-8"))
+                self._posicion_indice = f.tell()
+            for desplazamiento, clave in enumerate(nuevos):
+                self._indice[clave] = fila_inicial + desplazamiento
+
+
+class CacheEmbeddings(Embeddings):
+    """
+    Modelo de embeddings con caché persistente. Solo llama al modelo subyacente para los
+    textos que no están en la caché.
+
+    Parameters:
+        embeddings (Embeddings): Modelo de embeddings subyacente.
+        modelo (str): Identificador del modelo, forma parte de la clave de caché.
+        directorio (str): Directorio raíz de la caché; se usa un subdirectorio por modelo.
+    """
+
+    def __init__(self, embeddings, modelo, directorio=DIRECTORIO_CACHE_EMBEDDINGS):
+        self.embeddings = embeddings
+        self.modelo = modelo
+        nombre = re.sub(r"[^A-Za-z0-9_.-]", "_", modelo)
+        self.almacen = AlmacenVectores(os.path.join(directorio, nombre), modelo)
+        self._lock = threading.Lock()
+        self._contadores = {"aciertos": 0, "fallos": 0, "llamadas_modelo": 0}
+
+    def clave(self, texto, tipo):
+        """
+        Calcula la clave de caché de un texto.
+
+        Parameters:
+            texto (str): Texto a embeber.
+            tipo (str): 'documento' o 'consulta'; el modelo los embebe de forma distinta.
+
+        Returns:
+            str: Hash SHA-256 en hexadecimal.
+        """
+        return hashlib.sha256(f"{self.modelo}\0{tipo}\0{texto}".encode("utf-8")).hexdigest()
+
+    def _embeber(self, textos, tipo, calcular):
+        claves = [self.clave(texto, tipo) for texto in textos]
+        encontrados = self.almacen.obtener(claves)
+
+        # Textos repetidos dentro del mismo lote se calculan una sola vez
+        pendientes = {}
+        for clave, texto in zip(claves, textos):
+            if clave not in encontrados and clave not in pendientes:
+                pendientes[clave] = texto
+
+        if pendientes:
+            vectores = calcular(list(pendientes.values()))
+            nuevos = dict(zip(pendientes.keys(), vectores))
+            self.almacen.agregar(nuevos)
+            encontrados.update(nuevos)
+
+        with self._lock:
+            self._contadores["aciertos"] += len(textos) - len(pendientes)
+            self._contadores["fallos"] += len(pendientes)
+            self._contadores["llamadas_modelo"] += 1 if pendientes else 0
+
+        return [list(encontrados[clave]) for clave in claves]
+
+    def embed_documents(self, texts):
+        return self._embeber(texts, "documento", self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        return self._embeber([text], "consulta", lambda textos: [self.embeddings.embed_query(textos[0])])[0]
+
+    def embed_queries(self, texts, tamano_lote=96):
+        """
+        Embebe varias consultas con una llamada al modelo por cada `tamano_lote` textos no cacheados.
+
+        Parameters:
+            texts (list): Textos de las consultas.
+            tamano_lote (int): Máximo de textos por llamada (Cohere admite hasta 96).
+
+        Returns:
+            list: Un vector por consulta.
+        """
+        def calcular(textos):
+            # CohereEmbeddings acepta lotes de consultas; otros modelos se llaman texto a texto
+            if not hasattr(self.embeddings, "embed"):
+                return [self.embeddings.embed_query(texto) for texto in textos]
+            vectores = []
+            for inicio in range(0, len(textos), tamano_lote):
+                vectores.extend(self.embeddings.embed(textos[inicio:inicio + tamano_lote], input_type="search_query"))
+            return vectores
+        return self._embeber(texts, "consulta", calcular)
+
+    def estadisticas(self):
+        """
+        Devuelve los contadores de la caché.
+
+        Returns:
+            dict: Aciertos, fallos, llamadas al modelo, vectores almacenados y tasa de aciertos.
+        """
+        with self._lock:
+            estadisticas = dict(self._contadores)
+        total = estadisticas["aciertos"] + estadisticas["fallos"]
+        estadisticas["vectores_almacenados"] = len(self.almacen)
+        estadisticas["tasa_aciertos"] = estadisticas["aciertos"] / total if total else 0.0
+        return estadisticas
+
+
+def crear_embeddings_cacheados(modelo="embed-multilingual-v2.0"):
+    """
+    Crea el modelo de embeddings del proveedor configurado (Cohere por defecto) envuelto en
+    la caché persistente.
+
+    Parameters:
+        modelo (str): Modelo de embeddings de Cohere.
+
+    Returns:
+        CacheEmbeddings: Modelo con caché en DIRECTORIO_CACHE_EMBEDDINGS.
+    """
+    embeddings, clave_modelo = crear_embeddings(modelo)
+    return CacheEmbeddings(embeddings, clave_modelo)
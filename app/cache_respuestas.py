@@ -0,0 +1,204 @@
+"""
+Módulo de caché de respuestas para consultas repetidas sobre un mismo documento.
+
+La caché se consulta antes de recuperar contexto y llamar al LLM:
+1. Una pregunta idéntica (tras normalizar espacios y mayúsculas) se sirve de inmediato.
+2. Una pregunta casi idéntica se sirve si la similitud coseno entre su embedding y el de
+   una pregunta ya respondida sobre el mismo documento supera un umbral configurable.
+
+Las entradas se desalojan por antigüedad de uso (LRU), por tiempo de vida (TTL) y por un
+límite de tamaño. Al re-indexar un documento se invalidan todas sus entradas.
+
+Dependencias:
+- numpy: Cálculo vectorizado de similitudes coseno.
+- app.config (obtener_parametro): Parámetros opcionales de la caché.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from app.config import obtener_parametro
+
+
+def normalizar_pregunta(pregunta):
+    """
+    Normaliza una pregunta para la búsqueda exacta.
+
+    Parameters:
+        pregunta (str): Pregunta del usuario.
+
+    Returns:
+        str: Pregunta en minúsculas y con los espacios colapsados.
+    """
+    return " ".join(pregunta.lower().split())
+
+
+class _Entrada:
+    """
+    Respuesta almacenada en la caché junto con el embedding normalizado de la pregunta.
+    """
+    __slots__ = ("documento", "idioma", "vector", "respuesta", "creada")
+
+    def __init__(self, documento, idioma, vector, respuesta, creada):
+        self.documento = documento
+        self.idioma = idioma
+        self.vector = vector
+        self.respuesta = respuesta
+        self.creada = creada
+
+
+class CacheRespuestas:
+    """
+    Caché LRU con TTL de respuestas indexada por documento y pregunta.
+
+    Parameters:
+        max_entradas (int): Número máximo de respuestas almacenadas. Con 0 la caché queda deshabilitada.
+        ttl_segundos (float): Tiempo de vida de cada entrada.
+        umbral_similitud (float): Similitud coseno mínima para un acierto semántico.
+        reloj (callable): Fuente de tiempo, reemplazable para pruebas.
+    """
+
+    def __init__(self, max_entradas=256, ttl_segundos=3600, umbral_similitud=0.95, reloj=time.monotonic):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self.umbral_similitud = umbral_similitud
+        self.reloj = reloj
+        self._entradas = OrderedDict()  # (documento, pregunta normalizada) -> _Entrada
+        self._lock = threading.Lock()
+        self._contadores = {"aciertos_exactos": 0, "aciertos_semanticos": 0, "fallos": 0, "invalidaciones": 0}
+
+    @property
+    def habilitada(self):
+        return self.max_entradas > 0
+
+    def _vigente(self, entrada, ahora):
+        return ahora - entrada.creada <= self.ttl_segundos
+
+    def buscar_exacta(self, documento, pregunta):
+        """
+        Busca una respuesta para exactamente la misma pregunta sobre el documento.
+
+        Parameters:
+            documento (str): Nombre del documento consultado.
+            pregunta (str): Pregunta del usuario.
+
+        Returns:
+            str | None: Respuesta almacenada o None si no hay acierto.
+        """
+        clave = (documento, normalizar_pregunta(pregunta))
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            if not self._vigente(entrada, self.reloj()):
+                del self._entradas[clave]
+                return None
+            self._entradas.move_to_end(clave)
+            self._contadores["aciertos_exactos"] += 1
+            return entrada.respuesta
+
+    def buscar_similar(self, documento, vector, idioma=None):
+        """
+        Busca una respuesta a una pregunta casi idéntica sobre el mismo documento.
+
+        Parameters:
+            documento (str): Nombre del documento consultado.
+            vector (list): Embedding de la pregunta.
+            idioma (str, optional): Si se indica, solo se aceptan preguntas en el mismo idioma.
+
+        Returns:
+            str | None: Respuesta almacenada o None si no hay acierto (cuenta como fallo).
+        """
+        consulta = _normalizar_vector(vector)
+        with self._lock:
+            ahora = self.reloj()
+            claves, vectores = [], []
+            for clave, entrada in list(self._entradas.items()):
+                if entrada.documento != documento:
+                    continue
+                if not self._vigente(entrada, ahora):
+                    del self._entradas[clave]
+                    continue
+                if idioma is not None and entrada.idioma != idioma:
+                    continue
+                claves.append(clave)
+                vectores.append(entrada.vector)
+
+            if vectores:
+                similitudes = np.stack(vectores) @ consulta
+                mejor = int(np.argmax(similitudes))
+                if similitudes[mejor] >= self.umbral_similitud:
+                    self._entradas.move_to_end(claves[mejor])
+                    self._contadores["aciertos_semanticos"] += 1
+                    return self._entradas[claves[mejor]].respuesta
+
+            self._contadores["fallos"] += 1
+            return None
+
+    def guardar(self, documento, pregunta, vector, respuesta, idioma=None):
+        """
+        Almacena la respuesta a una pregunta, desalojando la entrada menos usada si se excede el límite.
+
+        Parameters:
+            documento (str): Nombre del documento consultado.
+            pregunta (str): Pregunta del usuario.
+            vector (list): Embedding de la pregunta.
+            respuesta (str): Respuesta final entregada al usuario.
+            idioma (str, optional): Idioma de la pregunta.
+        """
+        if not self.habilitada:
+            return
+        clave = (documento, normalizar_pregunta(pregunta))
+        entrada = _Entrada(documento, idioma, _normalizar_vector(vector), respuesta, self.reloj())
+        with self._lock:
+            self._entradas[clave] = entrada
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar_documento(self, documento):
+        """
+        Elimina todas las respuestas asociadas a un documento, por ejemplo al re-indexarlo.
+
+        Parameters:
+            documento (str): Nombre del documento.
+
+        Returns:
+            int: Número de entradas eliminadas.
+        """
+        with self._lock:
+            claves = [clave for clave in self._entradas if clave[0] == documento]
+            for clave in claves:
+                del self._entradas[clave]
+            self._contadores["invalidaciones"] += 1
+            return len(claves)
+
+    def estadisticas(self):
+        """
+        Devuelve los contadores de aciertos y fallos de la caché.
+
+        Returns:
+            dict: Contadores, número de entradas y tasa de aciertos.
+        """
+        with self._lock:
+            estadisticas = dict(self._contadores)
+            estadisticas["entradas"] = len(self._entradas)
+        aciertos = estadisticas["aciertos_exactos"] + estadisticas["aciertos_semanticos"]
+        consultas = aciertos + estadisticas["fallos"]
+        estadisticas["tasa_aciertos"] = aciertos / consultas if consultas else 0.0
+        return estadisticas
+
+
+def _normalizar_vector(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norma = np.linalg.norm(vector)
+    return vector / norma if norma > 0 else vector
+
+
+# Caché compartida por el proceso: la usan las consultas y la invalida la ingesta
+cache_respuestas = CacheRespuestas(
+    max_entradas=obtener_parametro("CACHE_RESPUESTAS_MAX", 256, int),
+    ttl_segundos=obtener_parametro("CACHE_RESPUESTAS_TTL", 3600, float),
+    umbral_similitud=obtener_parametro("CACHE_RESPUESTAS_UMBRAL", 0.95, float),
+)
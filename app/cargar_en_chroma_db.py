@@ -1,21 +1,336 @@
+"""
+Módulo de ingesta de documentos en ChromaDB.
+
+La ingesta se organiza como un pipeline por etapas:
+1. Lectura de los archivos PDF/Word página a página en hilos productores, cada uno con un
+   buffer acotado de páginas leídas y aún no divididas (MAX_PAGINAS_EN_VUELO en total).
+2. División de cada página en fragmentos a medida que llega, descartando los casi duplicados
+   de otro fragmento del mismo documento (SimHash, ver app.duplicados) antes de embeberlos.
+3. Agrupación de los fragmentos en lotes de tamaño acotado para calcular sus embeddings,
+   con un número limitado de lotes en vuelo a la vez.
+4. Escritura de cada lote en Chroma en una sola operación.
+
+Un manifiesto por base de vectores (hash, fecha de modificación e IDs de fragmentos de cada
+archivo) permite re-indexar solo los archivos nuevos o modificados y eliminar los borrados.
+Cada documento indexado guarda además su índice BM25 para la recuperación híbrida y su matriz
+de embeddings normalizados para el backend de recuperación matricial.
+Al terminar se genera un reporte de rendimiento en páginas/s y fragmentos/s, con la proporción
+de fragmentos descartados por duplicados.
+
+Ningún archivo se carga completo en memoria: las páginas, los lotes de embeddings y los
+vectores pendientes de la matriz (float32, liberados al completar cada documento) están
+acotados, de modo que el pico de memoria no crece con el tamaño del PDF. Los Word se leen como
+una sola sección (docx2txt no permite leerlos por partes).
+
+Dependencias:
+- concurrent.futures / queue: Hilos productores de páginas con colas acotadas y pool de embeddings.
+- pypdf (PdfReader): Lectura de los PDF página a página.
+- langchain_community (Docx2txtLoader): Carga de documentos Word.
+- langchain_text_splitters (RecursiveCharacterTextSplitter): División en fragmentos.
+- app.registro (registro): Cliente Chroma y modelo de embeddings compartidos por el proceso.
+- app.manifiesto (ManifiestoIngesta): Registro de archivos indexados para la ingesta incremental.
+- app.enrutador (enrutador): Índice documento -> colección/shard, actualizado en cada ingesta.
+- app.bm25 (almacen_bm25): Índices BM25 por documento.
+- app.indice_matricial (almacen_matrices): Matrices de embeddings por documento.
+- app.duplicados (IndiceSimHash, huella_simhash): Detección de fragmentos casi duplicados.
+- app.metricas (metricas): Spans de la ingesta, del cálculo de embeddings y de la escritura.
+"""
+
+import logging
 import os
-from langchain_community.document_loaders import Docx2txtLoader, PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_cohere import CohereEmbeddings
-from langchain_chroma import Chroma
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import numpy as np
+from app.cache_respuestas import cache_respuestas
+from app.bm25 import almacen_bm25
+from app.indice_matricial import BACKEND_RECUPERACION, almacen_matrices
+from app.duplicados import DEDUP_FRAGMENTOS, UMBRAL_SIMHASH, IndiceSimHash, huella_simhash
+from app.registro import registro
+from app.enrutador import enrutador
+from app.config import obtener_parametro
+from app.manifiesto import ManifiestoIngesta, hash_archivo
+from app.metricas import metricas
+
+logger = logging.getLogger(__name__)
+
+# Parámetros del pipeline de ingesta
+TAMANO_LOTE_EMBEDDINGS = obtener_parametro("TAMANO_LOTE_EMBEDDINGS", 96, int)  # Máximo de textos por llamada en Cohere
+MAX_LOTES_EN_VUELO = obtener_parametro("MAX_LOTES_EN_VUELO", 4, int)
+MAX_HILOS_PARSEO = obtener_parametro("MAX_HILOS_PARSEO", 2, int)
+MAX_PAGINAS_EN_VUELO = obtener_parametro("MAX_PAGINAS_EN_VUELO", 32, int)  # Leídas y aún no divididas
+
+# Parámetros del divisor de texto; si cambian, los documentos se re-indexan
+PARAMETROS_SPLITTER = {
+    "separators": ["\n\n", "\n"],
+    "chunk_size": 512,
+    "chunk_overlap": 128,
+    "add_start_index": True,
+}
 
-def cargar_documentos_en_chroma_db(directory, persist_directory, flag_nuevo):
+
+def parametros_indexado():
     """
-    Carga documentos desde un directorio en ChromaDB, dividiéndolos en fragmentos,
-    generando embeddings y almacenándolos en una base de vectores.
-    
+    Parámetros que determinan los fragmentos indexados de un documento (divisor y descarte de
+    duplicados). Se guardan en el manifiesto: si cambian, los documentos se re-indexan.
+
+    Returns:
+        dict: Parámetros actuales.
+    """
+    return {**PARAMETROS_SPLITTER, "umbral_duplicados": UMBRAL_SIMHASH if DEDUP_FRAGMENTOS else None}
+
+
+@dataclass
+class ReporteIngesta:
+    """
+    Resumen de una ejecución de la ingesta.
+
+    Attributes:
+        documentos (list): Nombres de los documentos disponibles tras la ingesta.
+        documentos_procesados (int): Documentos parseados e indexados en esta ejecución.
+        documentos_reindexados (int): Documentos modificados cuyos fragmentos se reemplazaron.
+        documentos_eliminados (int): Documentos borrados del directorio y eliminados de la base.
+        paginas (int): Páginas (o secciones) parseadas.
+        fragmentos (int): Fragmentos generados y escritos en Chroma.
+        fragmentos_duplicados (int): Fragmentos descartados por ser casi duplicados de otro.
+        lotes (int): Lotes de embeddings enviados.
+        segundos (float): Duración total de la ingesta.
+    """
+    documentos: list = field(default_factory=list)
+    documentos_procesados: int = 0
+    documentos_reindexados: int = 0
+    documentos_eliminados: int = 0
+    paginas: int = 0
+    fragmentos: int = 0
+    fragmentos_duplicados: int = 0
+    lotes: int = 0
+    segundos: float = 0.0
+
+    @property
+    def paginas_por_segundo(self):
+        return self.paginas / self.segundos if self.segundos else 0.0
+
+    @property
+    def fragmentos_por_segundo(self):
+        return self.fragmentos / self.segundos if self.segundos else 0.0
+
+    @property
+    def tasa_duplicados(self):
+        generados = self.fragmentos + self.fragmentos_duplicados
+        return self.fragmentos_duplicados / generados if generados else 0.0
+
+    def acumular(self, otro):
+        """
+        Suma al reporte los resultados de otra ejecución (por ejemplo, de otro shard).
+
+        Parameters:
+            otro (ReporteIngesta): Reporte a acumular.
+        """
+        self.documentos.extend(otro.documentos)
+        self.documentos_procesados += otro.documentos_procesados
+        self.documentos_reindexados += otro.documentos_reindexados
+        self.documentos_eliminados += otro.documentos_eliminados
+        self.paginas += otro.paginas
+        self.fragmentos += otro.fragmentos
+        self.fragmentos_duplicados += otro.fragmentos_duplicados
+        self.lotes += otro.lotes
+        self.segundos += otro.segundos
+
+    def __str__(self):
+        return (
+            f"Ingesta: {self.documentos_procesados} documentos, {self.paginas} páginas, "
+            f"{self.fragmentos} fragmentos en {self.lotes} lotes ({self.fragmentos_duplicados} duplicados "
+            f"descartados, {self.tasa_duplicados:.1%}), {self.segundos:.2f}s "
+            f"({self.paginas_por_segundo:.1f} páginas/s, {self.fragmentos_por_segundo:.1f} fragmentos/s)"
+        )
+
+
+def crear_text_splitter():
+    """
+    Crea el divisor de texto usado para fragmentar los documentos.
+
+    Returns:
+        RecursiveCharacterTextSplitter: Divisor configurado.
+    """
+    # Importaciones diferidas: un arranque sin archivos nuevos no necesita el divisor ni los loaders
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(**PARAMETROS_SPLITTER)
+
+
+def leer_paginas(file_path):
+    """
+    Lee un archivo PDF o Word de a una página (o sección), sin cargarlo completo.
+
+    PyPDFLoader.lazy_load construye igualmente la lista de todas las páginas, por lo que los PDF
+    se recorren directamente con pypdf, con el mismo modo de extracción de texto.
+
+    Parameters:
+        file_path (str): Ruta del archivo.
+
+    Yields:
+        Document: Una página (o el documento Word completo) con su contenido.
+    """
+    if file_path.endswith(".docx"):
+        from langchain_community.document_loaders import Docx2txtLoader
+        yield from Docx2txtLoader(file_path).lazy_load()
+        return
+
+    import pypdf
+    from langchain_core.documents import Document
+    with open(file_path, "rb") as archivo:
+        for numero, pagina in enumerate(pypdf.PdfReader(archivo).pages):
+            texto = pagina.extract_text(extraction_mode="plain")
+            yield Document(page_content=texto, metadata={"source": file_path, "page": numero})
+
+
+class _LectorPaginas:
+    """
+    Lee varios archivos en hilos productores y entrega sus páginas en el orden de los archivos.
+
+    Cada archivo tiene su propia cola acotada: un productor se bloquea cuando su cola está
+    llena hasta que el pipeline consume sus páginas, así que nunca hay más de
+    `max_paginas_en_vuelo` páginas leídas y sin dividir. Los archivos se asignan a los hilos en
+    orden, de modo que el archivo que se está consumiendo siempre tiene su productor activo.
+
+    Parameters:
+        rutas (list): Rutas de los archivos.
+        max_hilos (int): Archivos leyéndose a la vez.
+        max_paginas_en_vuelo (int): Páginas leídas y aún no consumidas, entre todos los archivos.
+    """
+
+    _FIN = object()
+
+    def __init__(self, rutas, max_hilos, max_paginas_en_vuelo):
+        self.rutas = rutas
+        self.max_hilos = max(1, min(max_hilos, len(rutas)))
+        self.tamano_cola = max(1, max_paginas_en_vuelo // self.max_hilos)
+        self._colas = [queue.Queue(maxsize=self.tamano_cola) for _ in rutas]
+        self._cancelado = threading.Event()
+        self._pool = None
+
+    def __enter__(self):
+        self._pool = ThreadPoolExecutor(max_workers=self.max_hilos, thread_name_prefix="lectura")
+        for ruta, cola in zip(self.rutas, self._colas):
+            self._pool.submit(self._producir, ruta, cola)
+        return self
+
+    def __exit__(self, *excepcion):
+        # Si el pipeline falla, los productores bloqueados en una cola llena se detienen
+        self._cancelado.set()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def _poner(self, cola, elemento):
+        while not self._cancelado.is_set():
+            try:
+                cola.put(elemento, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _producir(self, ruta, cola):
+        try:
+            for pagina in leer_paginas(ruta):
+                if not self._poner(cola, pagina):
+                    return
+        except Exception as e:
+            self._poner(cola, e)
+        else:
+            self._poner(cola, self._FIN)
+
+    def paginas(self, indice):
+        """
+        Páginas del archivo `indice`, a medida que se leen.
+
+        Raises:
+            Exception: El error de lectura del archivo, si lo hubo.
+        """
+        cola = self._colas[indice]
+        while True:
+            elemento = cola.get()
+            if elemento is self._FIN:
+                return
+            if isinstance(elemento, Exception):
+                raise elemento
+            yield elemento
+
+
+def _escribir_lote(vector_store, fragmentos, embeddings):
+    """
+    Escribe en Chroma un lote de fragmentos con sus embeddings ya calculados.
+    """
+    with metricas.span("ingesta_escritura", fragmentos=len(fragmentos)):
+        vector_store._collection.upsert(
+            ids=[fragmento.id for fragmento in fragmentos],
+            embeddings=embeddings,
+            metadatas=[fragmento.metadata for fragmento in fragmentos],
+            documents=[fragmento.page_content for fragmento in fragmentos],
+        )
+
+
+def _embeber_lote(embeddings, textos):
+    with metricas.span("ingesta_embeddings", fragmentos=len(textos)):
+        return embeddings.embed_documents(textos)
+
+
+def _actualizar_enrutador(manifiesto, persist_directory):
+    # Los documentos del manifiesto quedan resolubles para la recuperación en O(1)
+    for filename in manifiesto.archivos:
+        enrutador.asignar(filename, persist_directory)
+
+
+def _migrar_manifiesto(vector_store, manifiesto, directory):
+    """
+    Construye el manifiesto de una base creada antes de que existiera, leyendo una única vez
+    los metadatos de la colección. Los archivos presentes se asumen indexados tal como están.
+    """
+    ids_por_documento = {}
+    resultado = vector_store.get(include=["metadatas"])
+    for chunk_id, metadatos in zip(resultado["ids"], resultado["metadatas"]):
+        ids_por_documento.setdefault(metadatos["document"], []).append(chunk_id)
+
+    for filename, chunk_ids in ids_por_documento.items():
+        ruta = os.path.join(directory, filename)
+        if os.path.exists(ruta):
+            estado = os.stat(ruta)
+            manifiesto.registrar(filename, hash_archivo(ruta), estado.st_mtime, estado.st_size, chunk_ids, parametros_indexado())
+        else:
+            manifiesto.registrar(filename, None, None, None, chunk_ids, parametros_indexado())
+    manifiesto.guardar()
+    logger.info("Manifiesto creado a partir de %d documentos ya cargados.", len(ids_por_documento))
+
+
+def indexar_documentos(directory, persist_directory, flag_nuevo, embeddings=None, archivos=None,
+                       tamano_lote=TAMANO_LOTE_EMBEDDINGS, max_lotes_en_vuelo=MAX_LOTES_EN_VUELO,
+                       max_hilos_parseo=MAX_HILOS_PARSEO, max_paginas_en_vuelo=MAX_PAGINAS_EN_VUELO,
+                       progreso=None):
+    """
+    Indexa en ChromaDB los documentos de un directorio mediante el pipeline por etapas.
+
+    Qué indexar se decide con el manifiesto de ingesta: los archivos nuevos se indexan, los
+    modificados (por contenido o por parámetros del divisor) reemplazan sus fragmentos, y los
+    archivos que ya no están en el directorio se eliminan de la base. Si la colección está
+    particionada, cada archivo se indexa en el shard que le asigna el enrutador.
+
     Parameters:
         directory (str): Ruta del directorio donde se encuentran los documentos a cargar.
         persist_directory (str): Ruta del directorio de persistencia para la base de vectores.
-        flag_nuevo (bool): Si es True, solo procesa documentos nuevos no cargados previamente.
+        flag_nuevo (bool): Si es True, solo reporta los documentos indexados en esta ejecución.
+        embeddings (Embeddings, optional): Modelo de embeddings a usar. Por defecto, el modelo
+            compartido del registro, con caché persistente en disco.
+        archivos (list, optional): Nombres de archivos del directorio a considerar. Por defecto, todos.
+        tamano_lote (int): Número máximo de fragmentos por llamada de embeddings.
+        max_lotes_en_vuelo (int): Número máximo de lotes de embeddings calculándose a la vez.
+        max_hilos_parseo (int): Número máximo de archivos leyéndose a la vez.
+        max_paginas_en_vuelo (int): Número máximo de páginas leídas y aún no divididas.
+        progreso (callable, optional): Se llama con el nombre de cada archivo a medida que
+            queda indexado (o se confirma sin cambios).
 
     Returns:
-        list: Lista con los nombres de los documentos cargados.
+        ReporteIngesta: Documentos cargados y métricas de rendimiento.
 
     Raises:
         FileNotFoundError: Si el directorio especificado no existe.
@@ -24,63 +339,204 @@ def cargar_documentos_en_chroma_db(directory, persist_directory, flag_nuevo):
     # Validar la existencia del directorio
     if not os.path.exists(directory):
         raise FileNotFoundError(f"El directorio '{directory}' no existe.")
-    
-    # Inicializar variables y estructuras
-    lista_documentos = []
-    documentos_ya_cargados = set()
-    contador_doc = 0
-
-    # Inicializar Chroma
-    vector_store = Chroma(
-        collection_name="documentos", 
-        embedding_function=CohereEmbeddings(model="embed-multilingual-v2.0"), 
-        persist_directory=persist_directory
-    )
-    
-    # Obtener los metadatos de los documentos ya cargados
-    for doc in vector_store.get()['metadatas']: 
-        documentos_ya_cargados.add(doc['document'])
-    print("Documentos ya cargados:", documentos_ya_cargados)
-
-    # Iterar sobre los archivos en el directorio especificado
-    for filename in os.listdir(directory):
-        file_path = os.path.join(directory, filename)
-
-        # Determinar el tipo de documento (PDF o Word) y cargarlo
-        if filename.endswith(".docx"):
-            loader = Docx2txtLoader(file_path)
-        elif filename.endswith(".pdf"):
-            loader = PyPDFLoader(file_path)
+
+    if archivos is None:
+        archivos = sorted(os.listdir(directory))
+    soportados = []
+    for filename in archivos:
+        if filename.endswith((".docx", ".pdf")):
+            soportados.append(filename)
         else:
-            print(f"Formato no soportado: {filename}")
-            continue
+            logger.warning("Formato no soportado: %s", filename)
+
+    # Repartir los archivos entre los shards de la colección (uno solo si no está particionada)
+    reporte = ReporteIngesta()
+    for ruta_shard in enrutador.shards(persist_directory):
+        archivos_shard = [f for f in soportados if enrutador.elegir_shard(f, persist_directory) == ruta_shard]
+
+        # Una sola ingesta a la vez por colección
+        with registro.bloqueo_escritura(ruta_shard), metricas.span("ingesta", coleccion=ruta_shard) as span:
+            reporte_shard = _indexar_documentos(directory, ruta_shard, flag_nuevo, embeddings, archivos_shard,
+                                                tamano_lote, max_lotes_en_vuelo, max_hilos_parseo,
+                                                max_paginas_en_vuelo, progreso)
+            span["documentos"], span["paginas"] = reporte_shard.documentos_procesados, reporte_shard.paginas
+            span["fragmentos"], span["lotes"] = reporte_shard.fragmentos, reporte_shard.lotes
+            span["duplicados"] = reporte_shard.fragmentos_duplicados
+        reporte.acumular(reporte_shard)
+    return reporte
+
+
+def _indexar_documentos(directory, persist_directory, flag_nuevo, embeddings, archivos,
+                        tamano_lote, max_lotes_en_vuelo, max_hilos_parseo, max_paginas_en_vuelo, progreso=None):
+    inicio = time.perf_counter()
+    reporte = ReporteIngesta()
+    progreso = progreso or (lambda filename: None)
+
+    # Cliente Chroma compartido con la recuperación y modelo de embeddings cacheado
+    vector_store = registro.store(persist_directory)
+    if embeddings is None:
+        embeddings = registro.embeddings()
+
+    # El manifiesto reemplaza la lectura de los metadatos de todos los fragmentos
+    manifiesto = ManifiestoIngesta(persist_directory)
+    if not manifiesto.existe and vector_store._collection.count() > 0:
+        _migrar_manifiesto(vector_store, manifiesto, directory)
+
+    # Las matrices del backend matricial solo se construyen en la ingesta si es el backend en
+    # uso; con Chroma, services las construye desde la colección la primera vez que hacen falta
+    construir_matrices = BACKEND_RECUPERACION == "matricial"
 
+    # Seleccionar los archivos que hay que parsear
+    parametros = parametros_indexado()
+    pendientes = []
+    for filename in archivos:
         # Verificar si el documento ya está cargado y procesar según flag_nuevo
-        if filename in documentos_ya_cargados: 
+        if manifiesto.sin_cambios(filename, os.path.join(directory, filename), parametros):
             if flag_nuevo == False:
-                lista_documentos.append(filename)
-            print(f"Documento ya cargado: {filename}") 
+                reporte.documentos.append(filename)
+            progreso(filename)
             continue
 
-        # Cargar el contenido del archivo
-        data = loader.load()
-        contador_doc += 1
-        print(f"N° documentos cargados: {contador_doc}")
-        lista_documentos.append(filename)
-        
-        # Dividir el contenido del documento en fragmentos
-        text_splitter = RecursiveCharacterTextSplitter(
-            separators=["\n\n", "\n"],
-            chunk_size=512,
-            chunk_overlap=128,
-            add_start_index=True
-        )
+        # Documento modificado: se eliminan sus fragmentos anteriores antes de re-indexarlo
+        entrada = manifiesto.eliminar(filename)
+        if entrada is not None:
+            if entrada["chunk_ids"]:
+                vector_store.delete(ids=entrada["chunk_ids"])
+            if not construir_matrices:
+                # Sin reconstrucción en la ingesta, la matriz anterior quedaría desactualizada
+                almacen_matrices.eliminar(persist_directory, filename)
+            reporte.documentos_reindexados += 1
+            logger.info("Documento modificado, se re-indexará: %s", filename)
+        pendientes.append(filename)
+
+    # Eliminar de la base los documentos que ya no existen en el directorio
+    for filename in [nombre for nombre in manifiesto.archivos if not os.path.exists(os.path.join(directory, nombre))]:
+        entrada = manifiesto.eliminar(filename)
+        if entrada["chunk_ids"]:
+            vector_store.delete(ids=entrada["chunk_ids"])
+        cache_respuestas.invalidar_documento(filename)
+        almacen_bm25.eliminar(persist_directory, filename)
+        almacen_matrices.eliminar(persist_directory, filename)
+        enrutador.eliminar(filename, persist_directory)
+        reporte.documentos_eliminados += 1
+        logger.info("Documento eliminado de la base: %s", filename)
+
+    if not pendientes:
+        # Documentos eliminados o fechas de modificación actualizadas por sin_cambios
+        if manifiesto.modificado:
+            manifiesto.guardar()
+        _actualizar_enrutador(manifiesto, persist_directory)
+        reporte.segundos = time.perf_counter() - inicio
+        return reporte
+
+    text_splitter = crear_text_splitter()
+    lote = []
+    en_vuelo = deque()  # (fragmentos, futuro de embeddings) en orden de envío
+    vectores_por_id = {}  # Embeddings escritos (float32) de los documentos cuya matriz aún no se construyó
+    chunk_ids_por_documento = {}  # IDs de los fragmentos de cada documento ya dividido
+    totales, escritos = {}, {}  # Fragmentos de cada documento ya dividido / ya escritos en Chroma
+
+    def informar_si_completo(filename):
+        if filename in totales and escritos.get(filename, 0) >= totales[filename]:
+            del totales[filename]
+            # La matriz se construye apenas el documento está escrito, liberando sus vectores
+            chunk_ids = chunk_ids_por_documento.pop(filename)
+            if construir_matrices:
+                almacen_matrices.construir(persist_directory, filename, chunk_ids, [vectores_por_id.pop(i) for i in chunk_ids])
+            progreso(filename)
+
+    def enviar_lote(pool_embeddings):
+        en_vuelo.append((list(lote), pool_embeddings.submit(_embeber_lote, embeddings, [f.page_content for f in lote])))
+        lote.clear()
+        reporte.lotes += 1
+
+    def escribir_siguiente():
+        fragmentos, futuro = en_vuelo.popleft()
+        vectores = futuro.result()
+        _escribir_lote(vector_store, fragmentos, vectores)
+        if construir_matrices:
+            vectores_por_id.update(zip((fragmento.id for fragmento in fragmentos), np.asarray(vectores, dtype=np.float32)))
+        for fragmento in fragmentos:
+            escritos[fragmento.metadata["document"]] = escritos.get(fragmento.metadata["document"], 0) + 1
+        for filename in {fragmento.metadata["document"] for fragmento in fragmentos}:
+            informar_si_completo(filename)
+
+    rutas = [os.path.join(directory, filename) for filename in pendientes]
+    with _LectorPaginas(rutas, max_hilos_parseo, max_paginas_en_vuelo) as lector, \
+            ThreadPoolExecutor(max_workers=max_lotes_en_vuelo) as pool_embeddings:
+        # Los archivos se leen en paralelo y sus páginas se consumen en orden, a medida que llegan
+        for indice, (filename, ruta) in enumerate(zip(pendientes, rutas)):
+            reporte.documentos_procesados += 1
+            reporte.documentos.append(filename)
+            logger.info("N° documentos cargados: %d", reporte.documentos_procesados)
 
-        # Procesar cada documento cargado
-        for doc in data:
-            doc.metadata = {"document": filename}  # Agregar metadatos
-            print("Metadatos del documento:", doc.metadata)
-            splits = text_splitter.split_documents([doc])  # Dividir en fragmentos
-            vector_store.add_documents(splits)  # Agregar fragmentos a la base de vectores
-        
-    return lista_documentos
+            # Las respuestas cacheadas del documento dejan de ser válidas al re-indexarlo
+            cache_respuestas.invalidar_documento(filename)
+
+            # IDs deterministas: re-ejecutar una ingesta interrumpida sobrescribe en lugar de duplicar
+            estado = os.stat(ruta)
+            hash_contenido = hash_archivo(ruta)
+            chunk_ids, textos, metadatos = [], [], []
+            huellas = IndiceSimHash(UMBRAL_SIMHASH)
+            for doc in lector.paginas(indice):
+                doc.metadata = {"document": filename, "page": doc.metadata.get("page", 0)}  # Agregar metadatos
+                reporte.paginas += 1
+                splits = text_splitter.split_documents([doc])  # Dividir en fragmentos
+                for split in splits:
+                    if DEDUP_FRAGMENTOS:
+                        # Encabezados, pies de página o párrafos repetidos no se embeben dos veces
+                        huella = huella_simhash(split.page_content)
+                        if huellas.buscar(huella) is not None:
+                            reporte.fragmentos_duplicados += 1
+                            continue
+                        huellas.agregar(huella, len(chunk_ids))
+                    reporte.fragmentos += 1
+                    split.id = f"{filename}:{hash_contenido[:16]}:{len(chunk_ids)}"
+                    chunk_ids.append(split.id)
+                    textos.append(split.page_content)
+                    metadatos.append(split.metadata)
+                    lote.append(split)
+                    if len(lote) >= tamano_lote:
+                        # Contrapresión: no acumular más lotes en vuelo que hilos disponibles
+                        if len(en_vuelo) >= max_lotes_en_vuelo:
+                            escribir_siguiente()
+                        enviar_lote(pool_embeddings)
+
+            almacen_bm25.construir(persist_directory, filename, chunk_ids, textos, metadatos)
+            chunk_ids_por_documento[filename] = chunk_ids
+            manifiesto.registrar(filename, hash_contenido, estado.st_mtime, estado.st_size, chunk_ids, parametros)
+            totales[filename] = len(chunk_ids)
+            informar_si_completo(filename)
+
+        if lote:
+            enviar_lote(pool_embeddings)
+        while en_vuelo:
+            escribir_siguiente()
+
+    # El manifiesto se guarda solo cuando todos los fragmentos están escritos
+    manifiesto.guardar()
+    _actualizar_enrutador(manifiesto, persist_directory)
+    reporte.segundos = time.perf_counter() - inicio
+    logger.info("%s", reporte)
+    return reporte
+
+
+def cargar_documentos_en_chroma_db(directory, persist_directory, flag_nuevo, embeddings=None):
+    """
+    Carga documentos desde un directorio en ChromaDB, dividiéndolos en fragmentos,
+    generando embeddings y almacenándolos en una base de vectores.
+
+    Parameters:
+        directory (str): Ruta del directorio donde se encuentran los documentos a cargar.
+        persist_directory (str): Ruta del directorio de persistencia para la base de vectores.
+        flag_nuevo (bool): Si es True, solo procesa documentos nuevos no cargados previamente.
+        embeddings (Embeddings, optional): Modelo de embeddings a usar. Por defecto, el modelo
+            compartido del registro, con caché persistente en disco.
+
+    Returns:
+        list: Lista con los nombres de los documentos cargados.
+
+    Raises:
+        FileNotFoundError: Si el directorio especificado no existe.
+    """
+    return indexar_documentos(directory, persist_directory, flag_nuevo, embeddings).documentos
@@ -0,0 +1,415 @@
+"""
+Módulo del cliente resiliente de los modelos de chat.
+
+Todas las llamadas al modelo (detección de idioma, generación y traducción) pasan por
+ClienteLLM, que agrega:
+1. Un plazo por etapa (PLAZO_DETECCION_LLM, PLAZO_GENERACION_LLM, PLAZO_TRADUCCION_LLM) que
+   incluye los reintentos. Cada llamada se ejecuta en un pool de hilos propio de su modelo (y
+   el streaming en otro) y se abandona al vencer el plazo, de modo que un proveedor lento no
+   bloquea la consulta ni deja sin hilos al modelo de respaldo. El plazo restante también se
+   envía como timeout HTTP (con_plazo), así que la llamada abandonada termina cuando vence.
+2. Reintentos con espera exponencial y variación aleatoria para los errores transitorios
+   (conexión, HTTP 408/5xx). Los límites de tasa (HTTP 429) no se reintentan ni cuentan como
+   fallos: se propagan para que el llamador aplique su propia contrapresión (ver app.lote).
+3. Cobertura opcional (COBERTURA_LLM): si una llamada tarda más que el p95 reciente de su
+   etapa, se lanza otra idéntica y se usa la primera que responda.
+4. Un circuito por modelo: tras UMBRAL_FALLOS_CIRCUITO fallos seguidos se abre y las llamadas
+   fallan de inmediato durante ESPERA_CIRCUITO_ABIERTO segundos; después deja pasar una
+   llamada de prueba y se cierra si responde.
+
+Cuando un modelo no responde se lanza LLMNoDisponible y cada etapa degrada a su manera: la
+detección de idioma se queda con el detector local, la traducción devuelve el texto sin
+traducir y la generación recurre al modelo de respaldo (MODELO_RESPALDO_LLM), que tiene su
+propio circuito y su propio plazo.
+
+Dependencias:
+- concurrent.futures: Pools de hilos de las llamadas a cada modelo.
+- app.proveedores (con_temperatura, con_plazo): Temperatura y timeout HTTP por llamada sin
+  modificar el modelo compartido.
+- app.config (obtener_parametro): Plazos, reintentos, cobertura y circuito.
+- app.metricas (metricas): Reintentos, plazos vencidos, coberturas y respaldos por etapa.
+"""
+
+import logging
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from app.config import obtener_parametro
+from app.metricas import metricas
+from app.proveedores import con_plazo, con_temperatura
+
+try:
+    from httpx import TransportError as _ErrorTransporte  # Errores de red del cliente de Cohere
+except ImportError:
+    _ErrorTransporte = OSError
+
+PLAZOS_LLM = {
+    "deteccion_idioma": obtener_parametro("PLAZO_DETECCION_LLM", 5.0, float),
+    "generacion": obtener_parametro("PLAZO_GENERACION_LLM", 30.0, float),
+    "traduccion": obtener_parametro("PLAZO_TRADUCCION_LLM", 15.0, float),
+}
+MAX_REINTENTOS_LLM = obtener_parametro("MAX_REINTENTOS_LLM", 2, int)
+ESPERA_BASE_REINTENTO_LLM = obtener_parametro("ESPERA_BASE_REINTENTO_LLM", 0.25, float)
+COBERTURA_LLM = obtener_parametro("COBERTURA_LLM", False, bool)
+MIN_MUESTRAS_COBERTURA = 20  # Latencias observadas antes de estimar el p95 de una etapa
+UMBRAL_FALLOS_CIRCUITO = obtener_parametro("UMBRAL_FALLOS_CIRCUITO", 5, int)
+ESPERA_CIRCUITO_ABIERTO = obtener_parametro("ESPERA_CIRCUITO_ABIERTO", 30.0, float)
+MODELO_RESPALDO_LLM = obtener_parametro("MODELO_RESPALDO_LLM", "")
+MAX_LLAMADAS_LLM = obtener_parametro("MAX_LLAMADAS_LLM", 32, int)
+
+_CODIGOS_TRANSITORIOS = (408, 500, 502, 503, 504)
+_FIN = object()
+
+logger = logging.getLogger(__name__)
+
+
+class LLMNoDisponible(RuntimeError):
+    """
+    El modelo no respondió dentro del plazo de la etapa, falló o tiene el circuito abierto.
+
+    Attributes:
+        status_code (int): Código HTTP del último error del proveedor, si lo hubo.
+    """
+
+    def __init__(self, mensaje, status_code=None):
+        super().__init__(mensaje)
+        self.status_code = status_code
+
+
+class CircuitoAbierto(LLMNoDisponible):
+    """
+    El circuito del modelo está abierto: la llamada se rechazó sin enviarla.
+    """
+
+
+def _es_limite_de_tasa(error):
+    return getattr(error, "status_code", None) == 429
+
+
+def es_transitorio(error):
+    """
+    Indica si un error del proveedor puede resolverse reintentando la llamada.
+
+    Parameters:
+        error (Exception): Error lanzado por el cliente del modelo.
+
+    Returns:
+        bool: True para errores de red y códigos HTTP 408/5xx.
+    """
+    return getattr(error, "status_code", None) in _CODIGOS_TRANSITORIOS or isinstance(error, (ConnectionError, _ErrorTransporte))
+
+
+class Circuito:
+    """
+    Circuito de un modelo (cerrado, abierto o semiabierto).
+
+    Parameters:
+        nombre (str): Nombre del modelo, para los mensajes.
+        umbral_fallos (int): Fallos seguidos que abren el circuito.
+        espera (float): Segundos que permanece abierto antes de dejar pasar una llamada de prueba.
+        reloj (callable): Reloj monotónico.
+    """
+
+    def __init__(self, nombre, umbral_fallos=UMBRAL_FALLOS_CIRCUITO, espera=ESPERA_CIRCUITO_ABIERTO, reloj=time.monotonic):
+        self.nombre = nombre
+        self.umbral_fallos = max(1, umbral_fallos)
+        self.espera = espera
+        self.reloj = reloj
+        self.estado = "cerrado"
+        self.fallos_seguidos = 0
+        self.aperturas = 0
+        self._abierto_desde = 0.0
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        """
+        Indica si una llamada puede enviarse. En semiabierto solo pasa una a la vez.
+        """
+        with self._lock:
+            if self.estado == "abierto" and self.reloj() - self._abierto_desde >= self.espera:
+                self.estado = "semiabierto"
+            if self.estado == "semiabierto":
+                if self._prueba_en_curso:
+                    return False
+                self._prueba_en_curso = True
+            return self.estado != "abierto"
+
+    def registrar_exito(self):
+        with self._lock:
+            if self.estado != "cerrado":
+                logger.info("Circuito del modelo %s cerrado", self.nombre)
+            self.estado = "cerrado"
+            self.fallos_seguidos = 0
+            self._prueba_en_curso = False
+
+    def registrar_fallo(self):
+        with self._lock:
+            self.fallos_seguidos += 1
+            self._prueba_en_curso = False
+            if self.estado == "semiabierto" or self.fallos_seguidos >= self.umbral_fallos:
+                if self.estado != "abierto":
+                    self.aperturas += 1
+                    logger.warning("Circuito del modelo %s abierto tras %d fallos seguidos", self.nombre, self.fallos_seguidos)
+                self.estado = "abierto"
+                self._abierto_desde = self.reloj()
+
+
+class ClienteLLM:
+    """
+    Cliente de los modelos de chat con plazos, reintentos, cobertura y circuito por modelo.
+
+    Parameters:
+        modelo (callable): Devuelve el modelo principal; se resuelve en cada llamada, de modo
+            que el modelo puede reemplazarse (por ejemplo, por uno simulado).
+        respaldo (callable, optional): Devuelve el modelo de respaldo de la generación.
+        plazos (dict): Segundos por etapa.
+        max_reintentos (int): Reintentos por modelo ante errores transitorios.
+        espera_base (float): Espera inicial entre reintentos, en segundos.
+        cobertura (bool): Si es True, repite las llamadas que superan el p95 de su etapa.
+        umbral_fallos (int): Fallos seguidos que abren el circuito de un modelo.
+        espera_circuito (float): Segundos que el circuito permanece abierto.
+        max_llamadas (int): Hilos de cada pool (uno por modelo para invoke y otro para el
+            streaming), incluidas las llamadas abandonadas por plazo.
+    """
+
+    def __init__(self, modelo, respaldo=None, plazos=PLAZOS_LLM, max_reintentos=MAX_REINTENTOS_LLM,
+                 espera_base=ESPERA_BASE_REINTENTO_LLM, cobertura=COBERTURA_LLM, umbral_fallos=UMBRAL_FALLOS_CIRCUITO,
+                 espera_circuito=ESPERA_CIRCUITO_ABIERTO, max_llamadas=MAX_LLAMADAS_LLM):
+        self._modelos = {"principal": modelo}
+        if respaldo is not None:
+            self._modelos["respaldo"] = respaldo
+        self.plazos = dict(plazos)
+        self.max_reintentos = max_reintentos
+        self.espera_base = espera_base
+        self.cobertura = cobertura
+        self.circuitos = {nombre: Circuito(nombre, umbral_fallos, espera_circuito) for nombre in self._modelos}
+        self._latencias = {}
+        # Pools separados por modelo: las llamadas abandonadas del principal no ocupan los
+        # hilos del respaldo, y los streams largos no ocupan los de las llamadas cortas
+        self._pools = {nombre: ThreadPoolExecutor(max_workers=max_llamadas, thread_name_prefix=f"llm_{nombre}")
+                       for nombre in self._modelos}
+        self._pools_stream = {nombre: ThreadPoolExecutor(max_workers=max_llamadas, thread_name_prefix=f"llm_stream_{nombre}")
+                              for nombre in self._modelos}
+        self._contadores = {"reintentos": 0, "plazos_vencidos": 0, "coberturas": 0, "coberturas_ganadas": 0,
+                            "respaldos": 0, "rechazos_circuito": 0}
+        self._lock = threading.Lock()
+
+    def _contar(self, contador, etapa, modelo):
+        with self._lock:
+            self._contadores[contador] += 1
+        metricas.incrementar(f"llm_{contador}_total", etapa=etapa, modelo=modelo)
+
+    def _modelo(self, nombre, temperature, limite):
+        modelo = self._modelos[nombre]()
+        if temperature is not None:
+            modelo = con_temperatura(modelo, temperature)
+        return con_plazo(modelo, limite - time.monotonic())
+
+    def _nombres(self, respaldo):
+        return ["principal", "respaldo"] if respaldo and "respaldo" in self._modelos else ["principal"]
+
+    def _retraso_cobertura(self, nombre, etapa):
+        if not self.cobertura:
+            return None
+        with self._lock:
+            muestras = sorted(self._latencias.get((nombre, etapa), ()))
+        if len(muestras) < MIN_MUESTRAS_COBERTURA:
+            return None
+        return muestras[int(0.95 * (len(muestras) - 1))]
+
+    def _registrar_latencia(self, nombre, etapa, segundos):
+        with self._lock:
+            self._latencias.setdefault((nombre, etapa), deque(maxlen=200)).append(segundos)
+
+    def _turno(self, circuito, nombre, etapa, limite):
+        # Antes de cada intento: plazo restante y circuito
+        if time.monotonic() >= limite:
+            raise LLMNoDisponible(f"Plazo de {etapa} vencido para el modelo {nombre}")
+        if not circuito.permitir():
+            self._contar("rechazos_circuito", etapa, nombre)
+            raise CircuitoAbierto(f"Circuito del modelo {nombre} abierto")
+
+    def _fallo(self, circuito, nombre, etapa, error, intento, limite):
+        """
+        Registra un fallo y decide si se reintenta.
+
+        Returns:
+            float: Segundos a esperar antes del siguiente intento.
+
+        Raises:
+            Exception: El error original si es un límite de tasa.
+            LLMNoDisponible: Si no se reintenta.
+        """
+        if _es_limite_de_tasa(error):
+            circuito.registrar_exito()  # El proveedor responde: no es una falla del modelo
+            raise error
+        circuito.registrar_fallo()
+        status_code = getattr(error, "status_code", None)
+        if isinstance(error, TimeoutError):
+            self._contar("plazos_vencidos", etapa, nombre)
+            raise LLMNoDisponible(f"El modelo {nombre} no respondió en el plazo de {etapa} ({self.plazos[etapa]}s)") from error
+        espera = self.espera_base * 2 ** intento * random.uniform(0.5, 1.5)
+        if not es_transitorio(error) or intento >= self.max_reintentos or time.monotonic() + espera >= limite:
+            raise LLMNoDisponible(f"El modelo {nombre} falló en {etapa}: {error}", status_code) from error
+        self._contar("reintentos", etapa, nombre)
+        return espera
+
+    def _llamar(self, modelo, nombre, prompt, etapa, limite):
+        pool = self._pools[nombre]
+        futuros = [pool.submit(modelo.invoke, prompt)]
+        retraso = self._retraso_cobertura(nombre, etapa)
+        if retraso is not None and time.monotonic() + retraso < limite:
+            if not wait(futuros, timeout=retraso).done:
+                futuros.append(pool.submit(modelo.invoke, prompt))
+                self._contar("coberturas", etapa, nombre)
+
+        pendientes, error = set(futuros), None
+        while pendientes:
+            listos, pendientes = wait(pendientes, timeout=max(0.0, limite - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not listos:
+                for futuro in pendientes:
+                    futuro.cancel()
+                raise TimeoutError(f"Plazo de {etapa} vencido")
+            for futuro in listos:
+                if futuro.exception() is None:
+                    for otro in pendientes:
+                        otro.cancel()
+                    if len(futuros) > 1 and futuro is futuros[1]:
+                        self._contar("coberturas_ganadas", etapa, nombre)
+                    return futuro.result()
+                error = futuro.exception()
+        raise error
+
+    def _invocar_modelo(self, nombre, prompt, etapa, temperature):
+        circuito = self.circuitos[nombre]
+        limite = time.monotonic() + self.plazos[etapa]
+        for intento in range(self.max_reintentos + 1):
+            self._turno(circuito, nombre, etapa, limite)
+            inicio = time.monotonic()
+            try:
+                respuesta = self._llamar(self._modelo(nombre, temperature, limite), nombre, prompt, etapa, limite)
+            except Exception as error:
+                time.sleep(self._fallo(circuito, nombre, etapa, error, intento, limite))
+                continue
+            circuito.registrar_exito()
+            self._registrar_latencia(nombre, etapa, time.monotonic() - inicio)
+            return respuesta
+
+    def invocar(self, prompt, etapa, temperature=None, respaldo=False):
+        """
+        Llama al modelo y devuelve su respuesta completa.
+
+        Parameters:
+            prompt (str): Prompt a enviar.
+            etapa (str): 'deteccion_idioma', 'generacion' o 'traduccion' (define el plazo).
+            temperature (float, optional): Temperatura de la llamada.
+            respaldo (bool): Si es True y hay modelo de respaldo, se usa cuando el principal no responde.
+
+        Returns:
+            AIMessage: Respuesta del modelo.
+
+        Raises:
+            LLMNoDisponible: Si ningún modelo respondió.
+            Exception: El error del proveedor si es un límite de tasa (HTTP 429).
+        """
+        nombres = self._nombres(respaldo)
+        for posicion, nombre in enumerate(nombres):
+            try:
+                respuesta = self._invocar_modelo(nombre, prompt, etapa, temperature)
+            except LLMNoDisponible as error:
+                if posicion == len(nombres) - 1:
+                    raise
+                logger.warning("%s; se usa el modelo de respaldo", error)
+                continue
+            if posicion:
+                self._contar("respaldos", etapa, nombre)
+            return respuesta
+
+    def _transmitir_modelo(self, nombre, prompt, etapa, temperature):
+        circuito = self.circuitos[nombre]
+        limite = time.monotonic() + self.plazos[etapa]
+        for intento in range(self.max_reintentos + 1):
+            self._turno(circuito, nombre, etapa, limite)
+            inicio = time.monotonic()
+            modelo = self._modelo(nombre, temperature, limite)
+            cola, cancelado = queue.Queue(), threading.Event()
+
+            def bombear(modelo, cola, cancelado):
+                try:
+                    for fragmento in modelo.stream(prompt):
+                        if cancelado.is_set():
+                            return
+                        cola.put((fragmento, None))
+                    cola.put((_FIN, None))
+                except Exception as e:
+                    cola.put((None, e))
+
+            self._pools_stream[nombre].submit(bombear, modelo, cola, cancelado)
+            emitido = False
+            try:
+                while True:
+                    try:
+                        fragmento, error = cola.get(timeout=max(0.0, limite - time.monotonic()))
+                    except queue.Empty:
+                        fragmento, error = None, TimeoutError(f"Plazo de {etapa} vencido")
+                    if error is not None:
+                        if emitido:
+                            # Ya se entregó texto: no se reintenta, se corta la respuesta
+                            circuito.registrar_fallo()
+                            raise LLMNoDisponible(f"El modelo {nombre} se interrumpió en {etapa}: {error}") from error
+                        espera = self._fallo(circuito, nombre, etapa, error, intento, limite)
+                        break
+                    if fragmento is _FIN:
+                        circuito.registrar_exito()
+                        self._registrar_latencia(nombre, etapa, time.monotonic() - inicio)
+                        return
+                    emitido = True
+                    yield fragmento
+            finally:
+                cancelado.set()
+            time.sleep(espera)
+
+    def transmitir(self, prompt, etapa, temperature=None, respaldo=False):
+        """
+        Versión en streaming de invocar. Los reintentos y el respaldo solo se aplican antes del
+        primer fragmento; la cobertura no se usa en streaming.
+
+        Yields:
+            AIMessageChunk: Fragmentos de la respuesta.
+
+        Raises:
+            LLMNoDisponible: Si ningún modelo respondió, o si el modelo se interrumpe o vence el
+                plazo después de haber entregado fragmentos.
+        """
+        nombres = self._nombres(respaldo)
+        for posicion, nombre in enumerate(nombres):
+            fragmentos = self._transmitir_modelo(nombre, prompt, etapa, temperature)
+            try:
+                primero = next(fragmentos, _FIN)
+            except LLMNoDisponible as error:
+                if posicion == len(nombres) - 1:
+                    raise
+                logger.warning("%s; se usa el modelo de respaldo", error)
+                continue
+            if posicion:
+                self._contar("respaldos", etapa, nombre)
+            if primero is not _FIN:
+                yield primero
+                yield from fragmentos
+            return
+
+    def estadisticas(self):
+        """
+        Contadores del cliente y estado de cada circuito (0 cerrado, 1 semiabierto, 2 abierto).
+        """
+        estados = {"cerrado": 0, "semiabierto": 1, "abierto": 2}
+        with self._lock:
+            datos = dict(self._contadores)
+        for nombre, circuito in self.circuitos.items():
+            datos[f"circuito_{nombre}"] = estados[circuito.estado]
+            datos[f"aperturas_{nombre}"] = circuito.aperturas
+        return datos
@@ -0,0 +1,177 @@
+"""
+Módulo de la cola de tareas de indexación en segundo plano.
+
+Las cargas de archivos desde la interfaz no indexan en el mismo request: se encolan como una
+tarea con un ID y se devuelve el control de inmediato. Un pool de hilos ejecuta las tareas,
+cada una copia sus archivos al directorio de documentos e indexa solo esos archivos. Las
+tareas sobre una misma colección se serializan con el bloqueo de escritura del registro; las
+de colecciones distintas pueden avanzar en paralelo.
+
+Dependencias:
+- concurrent.futures: Pool de hilos que ejecuta las tareas.
+- app.cargar_en_chroma_db (indexar_documentos): Pipeline de ingesta.
+- app.registro (registro): Bloqueo de escritura por colección.
+- app.config (obtener_parametro): Número de tareas simultáneas.
+"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from app.cargar_en_chroma_db import indexar_documentos
+from app.config import obtener_parametro
+from app.registro import registro
+
+logger = logging.getLogger(__name__)
+
+MAX_TAREAS_INDEXACION = obtener_parametro("MAX_TAREAS_INDEXACION", 2, int)
+
+# Estados de una tarea
+EN_COLA = "en_cola"
+EN_PROCESO = "en_proceso"
+COMPLETADA = "completada"
+FALLIDA = "fallida"
+
+
+@dataclass
+class TareaIndexacion:
+    """
+    Tarea de indexación de un conjunto de archivos.
+
+    Attributes:
+        id (str): Identificador de la tarea.
+        archivos (list): Tuplas (ruta de origen, nombre de destino) de los archivos a indexar.
+        directorio (str): Directorio de documentos donde se copian los archivos.
+        persist_directory (str): Directorio de persistencia de la colección.
+        estado (str): en_cola, en_proceso, completada o fallida.
+        procesados (list): Archivos ya indexados.
+        documentos (list): Documentos disponibles para consultas al completarse.
+        error (str): Mensaje de error si la tarea falló.
+        creada (float): Instante de creación (time.time()).
+        terminada (float): Instante de finalización, si terminó.
+        futuro (Future): Ejecución de la tarea en el pool; se completa al terminar, para
+            esperarla sin consultar el estado (por ejemplo, con asyncio.wrap_future).
+    """
+    id: str
+    archivos: list
+    directorio: str
+    persist_directory: str
+    estado: str = EN_COLA
+    procesados: list = field(default_factory=list)
+    documentos: list = field(default_factory=list)
+    error: str = None
+    creada: float = field(default_factory=time.time)
+    terminada: float = None
+    futuro: Future = field(default=None, repr=False)
+
+    @property
+    def activa(self):
+        return self.estado in (EN_COLA, EN_PROCESO)
+
+    def descripcion(self):
+        """
+        Devuelve una línea de texto con el avance de la tarea, para mostrar en la interfaz.
+        """
+        nombres = ", ".join(nombre for _, nombre in self.archivos)
+        if self.estado == EN_COLA:
+            return f"⏳ Tarea {self.id}: en cola ({nombres})"
+        if self.estado == EN_PROCESO:
+            return f"⚙️ Tarea {self.id}: indexando {len(self.procesados)}/{len(self.archivos)} ({nombres})"
+        if self.estado == COMPLETADA:
+            return f"✅ Tarea {self.id}: {len(self.documentos)} documento(s) listos ({nombres})"
+        return f"❌ Tarea {self.id}: error ({self.error})"
+
+
+class ColaIndexacion:
+    """
+    Cola de tareas de indexación ejecutadas por un pool de hilos.
+
+    Parameters:
+        max_trabajadores (int): Tareas ejecutándose a la vez.
+        max_historial (int): Tareas terminadas que se conservan para consultar su estado.
+    """
+
+    def __init__(self, max_trabajadores=MAX_TAREAS_INDEXACION, max_historial=100):
+        self.max_historial = max_historial
+        self._pool = ThreadPoolExecutor(max_workers=max_trabajadores, thread_name_prefix="indexacion")
+        self._tareas = OrderedDict()
+        self._documentos_nuevos = []
+        self._lock = threading.Lock()
+
+    def encolar(self, rutas_origen, directorio, persist_directory):
+        """
+        Encola la copia e indexación de un conjunto de archivos y devuelve de inmediato.
+
+        Parameters:
+            rutas_origen (list): Rutas de los archivos subidos.
+            directorio (str): Directorio de documentos de la colección.
+            persist_directory (str): Directorio de persistencia de la colección.
+
+        Returns:
+            TareaIndexacion: Tarea creada.
+        """
+        archivos = list({os.path.basename(ruta): (ruta, os.path.basename(ruta)) for ruta in rutas_origen}.values())
+        tarea = TareaIndexacion(uuid.uuid4().hex[:8], archivos, directorio, persist_directory)
+        with self._lock:
+            self._tareas[tarea.id] = tarea
+            self._podar()
+        tarea.futuro = self._pool.submit(self._ejecutar, tarea)
+        return tarea
+
+    def _podar(self):
+        terminadas = [tarea_id for tarea_id, tarea in self._tareas.items() if not tarea.activa]
+        for tarea_id in terminadas[:max(0, len(self._tareas) - self.max_historial)]:
+            del self._tareas[tarea_id]
+
+    def _ejecutar(self, tarea):
+        tarea.estado = EN_PROCESO
+        try:
+            # Copia e indexación bajo el bloqueo de la colección: dos cargas del mismo archivo no se pisan
+            with registro.bloqueo_escritura(tarea.persist_directory):
+                os.makedirs(tarea.directorio, exist_ok=True)
+                for origen, nombre in tarea.archivos:
+                    shutil.copy2(origen, os.path.join(tarea.directorio, nombre))
+                reporte = indexar_documentos(
+                    tarea.directorio, tarea.persist_directory, flag_nuevo=False,
+                    archivos=[nombre for _, nombre in tarea.archivos],
+                    progreso=tarea.procesados.append
+                )
+            tarea.documentos = reporte.documentos
+            with self._lock:
+                self._documentos_nuevos.extend(reporte.documentos)
+            tarea.estado = COMPLETADA
+        except Exception as e:
+            tarea.error = str(e)
+            tarea.estado = FALLIDA
+            logger.exception("Error en la tarea de indexación %s", tarea.id)
+        finally:
+            tarea.terminada = time.time()
+
+    def obtener(self, tarea_id):
+        """
+        Devuelve una tarea por su ID.
+
+        Returns:
+            TareaIndexacion | None: La tarea, o None si no existe (o ya salió del historial).
+        """
+        with self._lock:
+            return self._tareas.get(tarea_id)
+
+    def documentos_indexados(self):
+        """
+        Devuelve los documentos indexados por las tareas completadas, en orden de finalización.
+        """
+        with self._lock:
+            return list(dict.fromkeys(self._documentos_nuevos))
+
+    def cerrar(self, esperar=True):
+        self._pool.shutdown(wait=esperar)
+
+
+# Cola única del proceso
+cola_indexacion = ColaIndexacion()
@@ -6,14 +6,18 @@ utilizando `python-dotenv` y validar que todas las claves requeridas estén pres
 
 Funcionalidades principales:
 - Cargar variables de entorno desde un archivo `.env`.
-- Validar la existencia de claves de entorno esenciales.
+- Validar la existencia de claves de entorno esenciales (solo con el proveedor Cohere).
 - Lanzar un error si alguna clave obligatoria falta.
+- Leer parámetros opcionales con un valor por defecto.
+- Configurar el nivel de logging del proceso.
 
 Dependencias:
+- logging: Registro de mensajes por niveles.
 - os: Acceso a variables de entorno del sistema.
 - dotenv (load_dotenv): Carga variables de entorno desde un archivo local.
 """
 
+import logging
 import os
 from dotenv import load_dotenv
 
@@ -26,11 +30,49 @@ REQUIRED_KEYS = [
 def load_env_vars():
     """
     Carga las variables de entorno desde un archivo .env.
+
+    Con PROVEEDOR_MODELOS=simulado no se exigen claves: los modelos son locales.
+
+    Raises:
+        EnvironmentError: Si falta alguna clave requerida por el proveedor Cohere.
     """
     load_dotenv()
+    if obtener_parametro("PROVEEDOR_MODELOS", "cohere").strip().lower() == "simulado":
+        return
     
     # Validar que las claves necesarias estén presentes
     missing_keys = [key for key in REQUIRED_KEYS if not os.getenv(key)]
     
     if missing_keys:
-        raise EnvironmentError(f"Faltan las siguientes claves de entorno: {', '.join(missing_keys)}")
\ No newline at end of file
+        raise EnvironmentError(f"Faltan las siguientes claves de entorno: {', '.join(missing_keys)}")
+
+def obtener_parametro(nombre, defecto, tipo=str):
+    """
+    Obtiene un parámetro opcional desde las variables de entorno.
+
+    Parameters:
+        nombre (str): Nombre de la variable de entorno.
+        defecto: Valor devuelto si la variable no está definida o está vacía.
+        tipo (type): Tipo al que se convierte el valor (str, int, float o bool).
+
+    Returns:
+        El valor convertido al tipo indicado, o el valor por defecto.
+    """
+    load_dotenv()
+    valor = os.getenv(nombre)
+    if valor is None or valor.strip() == "":
+        return defecto
+    if tipo is bool:
+        return valor.strip().lower() in ("1", "true", "si", "sí", "yes")
+    return tipo(valor)
+
+def configurar_logging(nivel=None):
+    """
+    Configura el logging del proceso. Los mensajes de depuración (por ejemplo, los fragmentos
+    recuperados) solo se formatean si el nivel es DEBUG.
+
+    Parameters:
+        nivel (str, optional): Nivel de logging. Por defecto, NIVEL_LOG o INFO.
+    """
+    nivel = (nivel or obtener_parametro("NIVEL_LOG", "INFO")).upper()
+    logging.basicConfig(level=nivel, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
@@ -0,0 +1,156 @@
+"""
+Módulo de ensamblado del contexto que se envía al modelo.
+
+Los fragmentos del divisor se solapan con sus vecinos (chunk_overlap de 128 caracteres sobre
+512), y la recuperación devuelve a menudo fragmentos contiguos de la misma página, de modo que
+unirlos tal cual repite texto en el prompt. Antes de generar la respuesta:
+1. Los fragmentos de la misma página (metadatos document y page) que se solapan o se tocan se
+   fusionan en un bloque usando start_index, sin repetir el texto compartido.
+2. Los bloques se ordenan por relevancia: la mejor posición de sus fragmentos en el ranking.
+3. Se agregan bloques hasta agotar PRESUPUESTO_TOKENS_CONTEXTO (0 = sin límite); el primero
+   que no cabe completo se recorta en un límite de palabra.
+
+Los tokens se estiman como caracteres / CARACTERES_POR_TOKEN, ya que no hay un tokenizador local
+de Cohere. El ahorro de cada consulta queda en el span 'ensamblado_contexto' y en el contador
+'tokens_contexto_ahorrados_total'.
+
+Dependencias:
+- langchain_core (Document): Fragmentos recuperados con sus metadatos.
+- app.config (obtener_parametro): Presupuesto de tokens y caracteres por token.
+- app.metricas (metricas): Span del ensamblado y tokens ahorrados.
+"""
+
+import math
+from dataclasses import dataclass
+from app.config import obtener_parametro
+from app.metricas import metricas
+
+PRESUPUESTO_TOKENS_CONTEXTO = obtener_parametro("PRESUPUESTO_TOKENS_CONTEXTO", 1024, int)
+CARACTERES_POR_TOKEN = obtener_parametro("CARACTERES_POR_TOKEN", 4.0, float)
+MIN_TOKENS_RECORTE = 32  # Por debajo de esto, un bloque recortado aporta más ruido que contexto
+
+
+def estimar_tokens(texto):
+    """
+    Estima los tokens de un texto a partir de su longitud.
+
+    Parameters:
+        texto (str): Texto a medir.
+
+    Returns:
+        int: Tokens estimados.
+    """
+    return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+
+
+@dataclass
+class Bloque:
+    """
+    Tramo continuo de una página formado por uno o más fragmentos recuperados.
+
+    Attributes:
+        documento (str): Documento de origen (None si el fragmento no tiene metadatos).
+        pagina (int): Página de origen.
+        inicio (int): Posición del primer carácter en la página (None si se desconoce).
+        texto (str): Texto del tramo, sin repeticiones.
+        posicion (int): Mejor posición en el ranking de sus fragmentos.
+        fragmentos (int): Fragmentos fusionados en el bloque.
+    """
+    documento: str
+    pagina: int
+    inicio: int
+    texto: str
+    posicion: int
+    fragmentos: int = 1
+
+    @property
+    def fin(self):
+        return self.inicio + len(self.texto)
+
+    def absorber(self, inicio, texto, posicion):
+        """
+        Fusiona un fragmento que empieza dentro del bloque o justo a continuación.
+
+        Returns:
+            bool: False si el texto compartido no coincide (metadatos inconsistentes) y no se fusionó.
+        """
+        compartido = self.texto[inicio - self.inicio:]
+        if texto[:len(compartido)] != compartido[:len(texto)]:
+            return False
+        self.texto += texto[len(compartido):]
+        self.posicion = min(self.posicion, posicion)
+        self.fragmentos += 1
+        return True
+
+
+def fusionar_vecinos(documentos):
+    """
+    Fusiona los fragmentos solapados o contiguos de una misma página.
+
+    Parameters:
+        documentos (list): Fragmentos (Document) en orden de relevancia.
+
+    Returns:
+        list: Bloques ordenados por la mejor posición de sus fragmentos.
+    """
+    bloques, por_pagina = [], {}
+    for posicion, doc in enumerate(documentos):
+        inicio = doc.metadata.get("start_index")
+        if inicio is None or inicio < 0:
+            bloques.append(Bloque(doc.metadata.get("document"), doc.metadata.get("page"), None, doc.page_content, posicion))
+        else:
+            clave = (doc.metadata.get("document"), doc.metadata.get("page"))
+            por_pagina.setdefault(clave, []).append((inicio, posicion, doc.page_content))
+
+    for (documento, pagina), fragmentos in por_pagina.items():
+        actual = None
+        for inicio, posicion, texto in sorted(fragmentos):
+            if actual is None or inicio > actual.fin or not actual.absorber(inicio, texto, posicion):
+                actual = Bloque(documento, pagina, inicio, texto, posicion)
+                bloques.append(actual)
+    return sorted(bloques, key=lambda bloque: bloque.posicion)
+
+
+def _recortar(texto, tokens):
+    # Corta en el último espacio dentro del presupuesto para no partir palabras
+    limite = int(tokens * CARACTERES_POR_TOKEN)
+    if len(texto) <= limite:
+        return texto
+    corte = texto.rfind(" ", 0, limite)
+    return texto[:corte if corte > 0 else limite].rstrip() + " …"
+
+
+def ensamblar_contexto(documentos, presupuesto_tokens=PRESUPUESTO_TOKENS_CONTEXTO):
+    """
+    Construye el contexto del prompt a partir de los fragmentos recuperados: fusiona vecinos,
+    ordena por relevancia y recorta al presupuesto de tokens.
+
+    Parameters:
+        documentos (list): Fragmentos (Document) en orden de relevancia.
+        presupuesto_tokens (int): Máximo de tokens estimados del contexto (0 = sin límite).
+
+    Returns:
+        list: Textos del contexto, del más relevante al menos relevante.
+    """
+    with metricas.span("ensamblado_contexto", fragmentos=len(documentos), presupuesto=presupuesto_tokens) as span:
+        bloques = fusionar_vecinos(documentos)
+        contexto, usados = [], 0
+        for bloque in bloques:
+            tokens = estimar_tokens(bloque.texto)
+            if presupuesto_tokens and usados + tokens > presupuesto_tokens:
+                restantes = presupuesto_tokens - usados
+                if restantes >= MIN_TOKENS_RECORTE or not contexto:
+                    recortado = _recortar(bloque.texto, restantes)
+                    contexto.append(recortado)
+                    usados += estimar_tokens(recortado)
+                span["recortado"] = True
+                break
+            contexto.append(bloque.texto)
+            usados += tokens
+
+        originales = sum(estimar_tokens(doc.page_content) for doc in documentos)
+        span["bloques"] = len(contexto)
+        span["tokens_originales"] = originales
+        span["tokens_contexto"] = usados
+    metricas.incrementar("tokens_contexto_ahorrados_total", originales - usados)
+    return contexto
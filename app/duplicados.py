@@ -0,0 +1,152 @@
+"""
+Módulo de detección de fragmentos casi duplicados.
+
+1. En la ingesta, cada fragmento se resume en una huella SimHash de 64 bits calculada sobre
+   sus trigramas de términos; dos fragmentos cuyas huellas difieren en a lo sumo
+   UMBRAL_SIMHASH bits se consideran casi duplicados (encabezados y pies de página repetidos,
+   párrafos copiados) y el segundo no se embebe ni se indexa. Las huellas se buscan por bandas:
+   con UMBRAL_SIMHASH + 1 bandas disjuntas, dos huellas a esa distancia coinciden en al menos
+   una banda completa.
+2. En la recuperación, los candidatos se seleccionan con Maximal Marginal Relevance (MMR):
+   cada elección equilibra la posición en el ranking con la similitud (Jaccard de términos)
+   respecto de los ya elegidos, y se descartan los casi idénticos (SIMILITUD_MAX_MMR) mientras
+   queden candidatos distintos.
+
+Dependencias:
+- hashlib: Hash de 64 bits de cada trigrama.
+- numpy: Suma ponderada de los bits de la huella.
+- app.bm25 (tokenizar): Mismos términos que el índice léxico.
+- app.config (obtener_parametro): Umbrales de duplicados y parámetro de MMR.
+"""
+
+import hashlib
+import numpy as np
+from app.bm25 import tokenizar
+from app.config import obtener_parametro
+
+DEDUP_FRAGMENTOS = obtener_parametro("DEDUP_FRAGMENTOS", True, bool)
+# Bits distintos (de 64) para considerar duplicado. En fragmentos de 512 caracteres, los que solo
+# difieren en una línea corta (número de página) quedan a 2-10 bits y los no relacionados a más de 20.
+UMBRAL_SIMHASH = obtener_parametro("UMBRAL_SIMHASH", 7, int)
+LAMBDA_MMR = obtener_parametro("LAMBDA_MMR", 0.7, float)  # 1 = solo relevancia, 0 = solo diversidad
+SIMILITUD_MAX_MMR = obtener_parametro("SIMILITUD_MAX_MMR", 0.8, float)
+
+_PESOS_BITS = np.left_shift(np.uint64(1), np.arange(64, dtype=np.uint64))
+
+
+def _trigramas(terminos):
+    if len(terminos) < 3:
+        return [" ".join(terminos)] if terminos else []
+    return [" ".join(terminos[i:i + 3]) for i in range(len(terminos) - 2)]
+
+
+def huella_simhash(texto):
+    """
+    Calcula la huella SimHash de 64 bits de un texto.
+
+    Parameters:
+        texto (str): Texto del fragmento.
+
+    Returns:
+        int: Huella (0 si el texto no tiene términos).
+    """
+    trigramas = _trigramas(tokenizar(texto))
+    if not trigramas:
+        return 0
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest(), "little") for t in trigramas],
+        dtype=np.uint64,
+    )
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votos = bits.sum(axis=0, dtype=np.int64) * 2 - len(trigramas)
+    return int(_PESOS_BITS[votos > 0].sum(dtype=np.uint64))
+
+
+def distancia_hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class IndiceSimHash:
+    """
+    Índice de huellas para encontrar casi duplicados sin comparar contra todas.
+
+    Parameters:
+        umbral (int): Máximo de bits distintos para considerar dos huellas duplicadas.
+    """
+
+    def __init__(self, umbral=UMBRAL_SIMHASH):
+        self.umbral = umbral
+        self._bandas = [{} for _ in range(umbral + 1)]
+        self._bits_banda = 64 // len(self._bandas)
+
+    def _claves(self, huella):
+        mascara = (1 << self._bits_banda) - 1
+        return [(huella >> (banda * self._bits_banda)) & mascara for banda in range(len(self._bandas))]
+
+    def buscar(self, huella):
+        """
+        Busca una huella registrada a distancia menor o igual que el umbral.
+
+        Returns:
+            Identificador asociado a la huella duplicada, o None.
+        """
+        for banda, clave in zip(self._bandas, self._claves(huella)):
+            for otra, identificador in banda.get(clave, ()):
+                if distancia_hamming(huella, otra) <= self.umbral:
+                    return identificador
+        return None
+
+    def agregar(self, huella, identificador):
+        for banda, clave in zip(self._bandas, self._claves(huella)):
+            banda.setdefault(clave, []).append((huella, identificador))
+
+
+def similitud_jaccard(a, b):
+    """
+    Similitud de Jaccard entre dos conjuntos de términos.
+    """
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def seleccionar_mmr(documentos, k, lambda_mmr=LAMBDA_MMR, similitud_max=SIMILITUD_MAX_MMR, completar=True):
+    """
+    Elige k fragmentos de un ranking con Maximal Marginal Relevance.
+
+    La relevancia de cada candidato decrece linealmente con su posición en el ranking y la
+    redundancia es su mayor similitud de Jaccard con los ya elegidos. Los candidatos con
+    similitud mayor o igual que `similitud_max` solo se usan si no quedan otros y `completar`.
+
+    Parameters:
+        documentos (list): Candidatos (Document) ordenados por relevancia, sin duplicados exactos.
+        k (int): Fragmentos a elegir.
+        lambda_mmr (float): Peso de la relevancia frente a la diversidad.
+        similitud_max (float): Similitud a partir de la cual un candidato se considera repetido.
+        completar (bool): Si es False, devuelve solo los fragmentos distintos aunque sean menos de k.
+
+    Returns:
+        list: Hasta k fragmentos, en el orden en que se eligieron.
+    """
+    if len(documentos) <= 1 or k <= 0:
+        return documentos[:k]
+    terminos = [set(tokenizar(doc.page_content)) for doc in documentos]
+    relevancia = [1 - posicion / len(documentos) for posicion in range(len(documentos))]
+    redundancia = [0.0] * len(documentos)
+    restantes = list(range(len(documentos)))
+    elegidos, repetidos = [], []
+
+    while restantes and len(elegidos) < k:
+        mejor = max(restantes, key=lambda i: lambda_mmr * relevancia[i] - (1 - lambda_mmr) * redundancia[i])
+        restantes.remove(mejor)
+        if redundancia[mejor] >= similitud_max:
+            repetidos.append(mejor)
+            continue
+        elegidos.append(mejor)
+        for i in restantes:
+            redundancia[i] = max(redundancia[i], similitud_jaccard(terminos[mejor], terminos[i]))
+
+    # Solo si no hay suficientes candidatos distintos se completan con los repetidos
+    if completar:
+        elegidos += repetidos[:k - len(elegidos)]
+    return [documentos[i] for i in elegidos]
@@ -0,0 +1,186 @@
+"""
+Módulo de enrutamiento de documentos a colecciones (y shards) de Chroma.
+
+Mantiene en memoria un índice documento -> directorio de persistencia, construido al arrancar
+a partir de los manifiestos de ingesta de cada colección y actualizado en cada ingesta. La
+recuperación resuelve así el store de un documento en O(1), sin revisar el sistema de archivos.
+
+Si un mismo nombre de documento está en varias colecciones, gana la que aparece después en
+COLECCIONES (las cargas reemplazan a los precargados), tanto al construir el índice como al
+actualizarlo tras una ingesta.
+
+Un origen de documentos puede repartirse en N shards (subdirectorios `shard_<i>`), asignando
+cada documento a un shard por el hash de su nombre. Cambiar el número de shards requiere
+re-indexar el origen.
+
+Dependencias:
+- hashlib: Asignación estable de documentos a shards.
+- app.manifiesto (ManifiestoIngesta): Fuente de los documentos indexados en cada colección.
+- app.config (obtener_parametro): Número de shards configurado.
+"""
+
+import hashlib
+import os
+import threading
+from app.config import obtener_parametro
+from app.manifiesto import ManifiestoIngesta
+
+# Orígenes de documentos y su directorio de persistencia base, de menor a mayor prioridad
+COLECCIONES = {
+    "preprocessed": "chroma_db/preprocessed",
+    "uploaded": "chroma_db/uploaded",
+}
+
+# Número de shards por origen (1 = sin particionar)
+NUM_SHARDS = {
+    "preprocessed": 1,
+    "uploaded": obtener_parametro("NUM_SHARDS_UPLOADED", 1, int),
+}
+
+
+def _normalizar(ruta):
+    return os.path.abspath(ruta)
+
+
+class IndiceEnrutamiento:
+    """
+    Índice en memoria que asigna cada documento al directorio de persistencia que lo contiene.
+
+    Parameters:
+        colecciones (dict): Directorio base de cada origen.
+        num_shards (dict): Número de shards de cada origen.
+    """
+
+    def __init__(self, colecciones=COLECCIONES, num_shards=NUM_SHARDS):
+        self._shards_por_base = {}
+        self._prioridades = {}  # Shard -> posición de su origen en `colecciones`
+        for posicion, (origen, base) in enumerate(colecciones.items()):
+            self._shards_por_base[_normalizar(base)] = self._rutas_shards(base, num_shards.get(origen, 1))
+            for ruta in self._shards_por_base[_normalizar(base)]:
+                self._prioridades[_normalizar(ruta)] = posicion
+        self._destinos = {}
+        self._construido = False
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _rutas_shards(base, cantidad):
+        if cantidad <= 1:
+            return [base]
+        return [os.path.join(base, f"shard_{i}") for i in range(cantidad)]
+
+    def shards(self, persist_directory):
+        """
+        Devuelve los directorios de persistencia (shards) de un directorio base.
+
+        Parameters:
+            persist_directory (str): Directorio base de una colección.
+
+        Returns:
+            list: Un único elemento si la colección no está particionada.
+        """
+        return self._shards_por_base.get(_normalizar(persist_directory), [persist_directory])
+
+    def elegir_shard(self, documento, persist_directory):
+        """
+        Elige de forma estable el shard donde se indexa un documento.
+
+        Parameters:
+            documento (str): Nombre del documento.
+            persist_directory (str): Directorio base de la colección.
+
+        Returns:
+            str: Directorio de persistencia del shard.
+        """
+        shards = self.shards(persist_directory)
+        if len(shards) == 1:
+            return shards[0]
+        indice = int(hashlib.sha1(documento.encode("utf-8")).hexdigest()[:8], 16) % len(shards)
+        return shards[indice]
+
+    def _prioridad(self, persist_directory):
+        # Los directorios fuera de las colecciones configuradas tienen la mayor prioridad
+        return self._prioridades.get(_normalizar(persist_directory), len(self._shards_por_base))
+
+    def _asignar(self, documento, persist_directory):
+        # Se llama con el lock tomado
+        actual = self._destinos.get(documento)
+        if actual is None or self._prioridad(persist_directory) >= self._prioridad(actual):
+            self._destinos[documento] = persist_directory
+
+    def construir(self):
+        """
+        Construye el índice leyendo los manifiestos de todas las colecciones configuradas.
+        """
+        with self._lock:
+            for shards in self._shards_por_base.values():
+                for ruta in shards:
+                    for documento in ManifiestoIngesta(ruta).archivos:
+                        self._asignar(documento, ruta)
+            self._construido = True
+
+    def asignar(self, documento, persist_directory):
+        """
+        Registra el directorio de persistencia de un documento (por ejemplo, tras indexarlo),
+        salvo que ya esté asignado a una colección de mayor prioridad.
+        """
+        with self._lock:
+            self._asignar(documento, persist_directory)
+
+    def eliminar(self, documento, persist_directory=None):
+        """
+        Quita un documento del índice. Si se indica un directorio, solo si está asignado a él; en
+        ese caso, si otra colección también tiene el documento, pasa a resolverse allí.
+        """
+        with self._lock:
+            actual = self._destinos.get(documento)
+            if actual is None:
+                return
+            if persist_directory is None:
+                del self._destinos[documento]
+                return
+            if _normalizar(actual) != _normalizar(persist_directory):
+                return
+            del self._destinos[documento]
+            for shards in self._shards_por_base.values():
+                for ruta in shards:
+                    if _normalizar(ruta) != _normalizar(persist_directory) and documento in ManifiestoIngesta(ruta):
+                        self._asignar(documento, ruta)
+
+    def resolver(self, documento):
+        """
+        Devuelve el directorio de persistencia donde está indexado un documento.
+
+        Parameters:
+            documento (str): Nombre del documento.
+
+        Returns:
+            str: Directorio de persistencia.
+
+        Raises:
+            FileNotFoundError: Si el documento no está indexado en ninguna colección.
+        """
+        if not self._construido:
+            self.construir()
+        ruta = self._destinos.get(documento)
+        if ruta is None:
+            raise FileNotFoundError(f"El documento {documento} no se encuentra en las colecciones indexadas.")
+        return ruta
+
+    def agrupar(self, documentos):
+        """
+        Agrupa una lista de documentos por el directorio de persistencia que los contiene.
+
+        Parameters:
+            documentos (list): Nombres de documentos.
+
+        Returns:
+            dict: Directorio de persistencia -> lista de documentos.
+        """
+        grupos = {}
+        for documento in documentos:
+            grupos.setdefault(self.resolver(documento), []).append(documento)
+        return grupos
+
+
+# Índice único del proceso
+enrutador = IndiceEnrutamiento()
@@ -0,0 +1,252 @@
+"""
+Módulo de detección de idioma para las consultas de los usuarios.
+
+Este módulo define una interfaz común para los detectores de idioma y tres implementaciones:
+1. DetectorPerfiles: detector local, sin llamadas al LLM, basado en perfiles de palabras
+   vacías (stopwords) y rasgos ortográficos de cada idioma.
+2. DetectorLLM: detector que consulta a un modelo de lenguaje con ejemplos few-shot.
+3. DetectorConRespaldo: usa un detector principal y solo recurre al de respaldo
+   cuando la confianza queda por debajo de un umbral.
+
+Todos los detectores devuelven un código ISO 639-1 normalizado y una confianza entre 0 y 1.
+
+Dependencias:
+- re: Tokenización y normalización de texto.
+- dataclasses: Definición del resultado de la detección.
+- abc: Interfaz abstracta de los detectores.
+"""
+
+import logging
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# Idiomas que el pipeline sabe tratar y valor usado cuando no se puede determinar
+IDIOMAS_SOPORTADOS = ("es", "en", "pt")
+IDIOMA_POR_DEFECTO = "es"
+
+# Nombres de idioma que un LLM puede devolver en lugar del código ISO
+_NOMBRES_IDIOMA = {
+    "spanish": "es", "español": "es", "espanol": "es", "espanhol": "es",
+    "english": "en", "inglés": "en", "ingles": "en", "inglês": "en",
+    "portuguese": "pt", "portugués": "pt", "portugues": "pt", "português": "pt",
+}
+
+# Palabras frecuentes de cada idioma. Las compartidas suman a ambos idiomas y se compensan.
+_STOPWORDS = {
+    "es": set("""
+        de la que el en y los se del las un por con una su para es al lo como más pero sus le ya
+        o este sí porque esta entre cuando muy sin sobre también me hasta hay donde quien desde
+        todo nos durante todos uno les ni contra otros ese eso ante ellos esto mí antes algunos
+        qué unos yo otro otras otra él tanto esa estos mucho quienes nada muchos cual poco ella
+        estar estas algunas algo nosotros cómo cuál cuáles cuándo dónde quién cuántos cuántas
+        cuánto hola está están son fue fueron tiene tienen hace puede pueden gracias dime
+        explica personaje principal historia documento usted ustedes hizo hay según algún alguna
+    """.split()),
+    "en": set("""
+        the of and to in is it you that he was for on are with as his they at be this have from
+        or one had by what but not all were we when your can said there an which she do how
+        their if will who does did why where about main story character hello my me i whom
+        these those than then them its our would could should been being has into after before
+        tell explain please thanks document according
+    """.split()),
+    "pt": set("""
+        o a os as um uma do da dos das no na nos nas em é são não com por para que se mais mas
+        como foi ao ele ela isso este esta essa esse seu sua também quando muito já eu você
+        qual quais quem onde porque sobre até ou olá obrigado obrigada pelo pela pelos pelas tem
+        têm ser está estão há nós eles elas meu minha depois sem mesmo aos seus suas numa num
+        quanto quantos então história personagem principal documento fala explique diga fez
+        segundo algum alguma alguns algumas
+    """.split()),
+}
+
+# Palabras vacías de todos los idiomas, reutilizadas por la búsqueda léxica (BM25)
+PALABRAS_VACIAS = frozenset().union(*_STOPWORDS.values())
+
+# Rasgos ortográficos (n-gramas de caracteres) característicos de cada idioma
+_RASGOS = {
+    "es": {"ñ": 1.5, "¿": 2.0, "¡": 2.0, "ción": 1.0, "cione": 1.0, "ll": 0.3},
+    "en": {"th": 0.5, "ing ": 0.7, "w": 0.4, "k": 0.2, "'s": 0.7, "sh": 0.3},
+    "pt": {"ã": 1.5, "õ": 1.5, "ç": 1.0, "ção": 1.0, "ções": 1.0, "lh": 0.5, "nh": 0.5},
+}
+
+_PATRON_PALABRA = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+
+@dataclass(frozen=True)
+class ResultadoIdioma:
+    """
+    Resultado de una detección de idioma.
+
+    Attributes:
+        idioma (str): Código ISO 639-1 normalizado.
+        confianza (float): Confianza de la detección entre 0 y 1.
+        fuente (str): Detector que produjo el resultado ('perfiles', 'llm', 'defecto').
+    """
+    idioma: str
+    confianza: float
+    fuente: str
+
+
+def normalizar_codigo_idioma(texto):
+    """
+    Normaliza la salida libre de un modelo a un código ISO 639-1 soportado.
+
+    Parameters:
+        texto (str): Texto devuelto por el detector (por ejemplo, ' es\\n' o 'Respuesta: English').
+
+    Returns:
+        str | None: Código normalizado ('es', 'en' o 'pt') o None si no se reconoce.
+    """
+    if not texto:
+        return None
+    palabras = _PATRON_PALABRA.findall(texto.lower())
+    # Un nombre de idioma es más explícito que un código suelto ('es' también es un verbo)
+    for palabra in palabras:
+        if palabra in _NOMBRES_IDIOMA:
+            return _NOMBRES_IDIOMA[palabra]
+    for palabra in palabras:
+        if palabra in IDIOMAS_SOPORTADOS:
+            return palabra
+    return None
+
+
+class DetectorIdioma(ABC):
+    """
+    Interfaz base de los detectores de idioma.
+    """
+
+    @abstractmethod
+    def detectar(self, texto):
+        """
+        Detecta el idioma de un texto.
+
+        Parameters:
+            texto (str): Texto a analizar.
+
+        Returns:
+            ResultadoIdioma: Idioma normalizado y confianza.
+        """
+
+
+class DetectorPerfiles(DetectorIdioma):
+    """
+    Detector local basado en perfiles de stopwords y rasgos ortográficos.
+
+    Parameters:
+        evidencia_minima (float): Puntaje a partir del cual la evidencia se considera completa.
+            Textos muy cortos quedan con una confianza proporcionalmente menor.
+    """
+
+    def __init__(self, evidencia_minima=2.0):
+        self.evidencia_minima = evidencia_minima
+
+    def puntuar(self, texto):
+        """
+        Calcula el puntaje de cada idioma soportado para un texto.
+
+        Parameters:
+            texto (str): Texto a analizar.
+
+        Returns:
+            dict: Puntaje acumulado por código de idioma.
+        """
+        texto = texto.lower()
+        palabras = _PATRON_PALABRA.findall(texto)
+        puntajes = {}
+        for idioma in IDIOMAS_SOPORTADOS:
+            stopwords = _STOPWORDS[idioma]
+            puntaje = sum(1.0 for palabra in palabras if palabra in stopwords)
+            puntaje += sum(peso * texto.count(rasgo) for rasgo, peso in _RASGOS[idioma].items())
+            puntajes[idioma] = puntaje
+        return puntajes
+
+    def detectar(self, texto):
+        puntajes = self.puntuar(texto or "")
+        total = sum(puntajes.values())
+        if total == 0:
+            return ResultadoIdioma(IDIOMA_POR_DEFECTO, 0.0, "defecto")
+
+        idioma = max(puntajes, key=puntajes.get)
+        mejor = puntajes[idioma]
+        # Proporción del puntaje ganador, atenuada cuando hay poca evidencia
+        confianza = (mejor / total) * min(1.0, mejor / self.evidencia_minima)
+        return ResultadoIdioma(idioma, round(confianza, 4), "perfiles")
+
+
+class DetectorLLM(DetectorIdioma):
+    """
+    Detector que consulta a un modelo de lenguaje con ejemplos few-shot.
+
+    Parameters:
+        invocar (callable): Función que recibe un prompt y devuelve un mensaje con atributo
+            `content` o un string.
+    """
+
+    few_shot_examples = """
+    Ejemplo 1:
+    Pregunta: ¿Cómo estás?
+    Respuesta: es
+
+    Ejemplo 2:
+    Question: How are you?
+    Answer: en
+
+    Exemplo 3:
+    Pergunta: Como você está?
+    Resposta: pt
+    """
+
+    def __init__(self, invocar):
+        self.invocar = invocar
+
+    def detectar(self, texto):
+        prompt = f"""
+    {self.few_shot_examples}
+    Eres un asistente especializado en detectar idiomas.
+    Genera la respuesta en el formato mencionado en los ejemplos.
+    Si no puedes determinarlo con certeza, responde 'es' por defecto.
+
+    Pregunta: {texto}
+
+    Respuesta:
+    """
+        response = self.invocar(prompt)
+        contenido = getattr(response, "content", response)
+        codigo = normalizar_codigo_idioma(contenido)
+        if codigo is None:
+            return ResultadoIdioma(IDIOMA_POR_DEFECTO, 0.0, "defecto")
+        return ResultadoIdioma(codigo, 1.0, "llm")
+
+
+class DetectorConRespaldo(DetectorIdioma):
+    """
+    Combina un detector principal rápido con un detector de respaldo más costoso.
+
+    Parameters:
+        principal (DetectorIdioma): Detector que se consulta siempre.
+        respaldo (DetectorIdioma): Detector usado solo si la confianza es insuficiente.
+        umbral (float): Confianza mínima para aceptar el resultado del detector principal.
+    """
+
+    def __init__(self, principal, respaldo, umbral=0.6):
+        self.principal = principal
+        self.respaldo = respaldo
+        self.umbral = umbral
+
+    def detectar(self, texto):
+        resultado = self.principal.detectar(texto)
+        if resultado.confianza >= self.umbral or self.respaldo is None:
+            return resultado
+
+        try:
+            resultado_respaldo = self.respaldo.detectar(texto)
+        except Exception as e:
+            logger.warning("Error al detectar idioma con el detector de respaldo: %s", e)
+            return resultado
+
+        if resultado_respaldo.confianza > resultado.confianza:
+            return resultado_respaldo
+        return resultado
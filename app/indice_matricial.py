@@ -0,0 +1,284 @@
+"""
+Módulo de índice vectorial en memoria por documento (backend de recuperación 'matricial').
+
+Guarda los embeddings de los fragmentos de cada documento en una matriz float32 contigua, con
+las filas ya normalizadas, persistida junto a la base Chroma (`<persist_directory>/matrices/`)
+y leída como memoria mapeada. El top-k se resuelve con un único producto matriz-vector y
+`argpartition`, sin pasar por el cliente de Chroma ni por el filtrado en SQLite.
+
+Cuando un documento supera UMBRAL_ANN fragmentos, el índice se construye como IVF (inverted
+file): las filas se agrupan con k-means esférico y se reordenan para que cada lista quede
+contigua en disco; la búsqueda solo recorre las NPROBE listas con centroide más cercano.
+
+Formato en disco (por documento):
+- <hash>.json: documento, IDs de los fragmentos en el orden de las filas, dimensión, versión
+  de los archivos de datos y, si es IVF, los desplazamientos de cada lista.
+- <hash>.<version>.f32: matriz float32 de filas normalizadas (ordenadas por lista si es IVF).
+- <hash>.<version>.centroides.npy: centroides del IVF (solo si aplica).
+
+Cada reconstrucción escribe archivos de datos con una versión nueva y luego reemplaza el JSON,
+de modo que las búsquedas en curso sobre la matriz mapeada anterior no se ven afectadas.
+
+Dependencias:
+- numpy: Álgebra matricial y lectura mapeada en memoria.
+- app.config (obtener_parametro): Umbral del índice aproximado y número de listas exploradas.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+import numpy as np
+from app.config import obtener_parametro
+
+# Backend de la búsqueda vectorial: 'chroma' (por defecto) o 'matricial'
+BACKEND_RECUPERACION = obtener_parametro("BACKEND_RECUPERACION", "chroma")
+UMBRAL_ANN = obtener_parametro("UMBRAL_ANN", 5000, int)
+NPROBE = obtener_parametro("NPROBE", 8, int)
+
+
+def normalizar_filas(matriz):
+    """
+    Normaliza cada fila de una matriz a norma 1 (las filas nulas quedan en cero).
+
+    Parameters:
+        matriz (np.ndarray): Matriz de vectores.
+
+    Returns:
+        np.ndarray: Matriz float32 de filas normalizadas.
+    """
+    matriz = np.asarray(matriz, dtype=np.float32)
+    normas = np.linalg.norm(matriz, axis=-1, keepdims=True)
+    return matriz / np.where(normas == 0, 1, normas)
+
+
+def _top_k(similitudes, k):
+    # argpartition selecciona los k mejores en O(n); solo esos k se ordenan
+    if k >= len(similitudes):
+        return np.argsort(-similitudes)
+    candidatos = np.argpartition(-similitudes, k - 1)[:k]
+    return candidatos[np.argsort(-similitudes[candidatos])]
+
+
+def kmeans_esferico(matriz, listas, iteraciones=10, semilla=0):
+    """
+    Agrupa filas normalizadas con k-means sobre similitud coseno.
+
+    Parameters:
+        matriz (np.ndarray): Filas normalizadas.
+        listas (int): Número de grupos.
+        iteraciones (int): Iteraciones de asignación y actualización.
+        semilla (int): Semilla para elegir los centroides iniciales.
+
+    Returns:
+        tuple: (centroides normalizados, grupo asignado a cada fila).
+    """
+    aleatorio = np.random.default_rng(semilla)
+    centroides = matriz[aleatorio.choice(len(matriz), listas, replace=False)].copy()
+    for _ in range(iteraciones):
+        asignacion = np.argmax(matriz @ centroides.T, axis=1)
+        for lista in range(listas):
+            miembros = matriz[asignacion == lista]
+            if len(miembros):
+                centroides[lista] = miembros.sum(axis=0)
+        centroides = normalizar_filas(centroides)
+    return centroides, np.argmax(matriz @ centroides.T, axis=1)
+
+
+class IndiceMatricial:
+    """
+    Índice exacto (o IVF, si se indican centroides) sobre las filas normalizadas de un documento.
+
+    Parameters:
+        ids (list): IDs de los fragmentos, en el orden de las filas.
+        matriz (np.ndarray): Filas normalizadas (puede ser un np.memmap).
+        centroides (np.ndarray, optional): Centroides del IVF.
+        desplazamientos (list, optional): Fila inicial de cada lista, más el total al final.
+    """
+
+    def __init__(self, ids, matriz, centroides=None, desplazamientos=None):
+        self.ids = list(ids)
+        self.matriz = matriz
+        self.centroides = centroides
+        self.desplazamientos = desplazamientos
+
+    @property
+    def aproximado(self):
+        return self.centroides is not None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def buscar(self, vector, k, nprobe=NPROBE):
+        """
+        Devuelve los k fragmentos más similares a un vector.
+
+        Parameters:
+            vector (list): Embedding de la consulta.
+            k (int): Número de resultados.
+            nprobe (int): Listas exploradas si el índice es IVF.
+
+        Returns:
+            list: Tuplas (id, distancia coseno) ordenadas de menor a mayor distancia.
+        """
+        consulta = normalizar_filas(vector)
+        if not self.aproximado:
+            similitudes = self.matriz @ consulta
+            filas = _top_k(similitudes, k)
+            return [(self.ids[fila], float(1 - similitudes[fila])) for fila in filas]
+
+        # IVF: solo se recorren las listas de los centroides más cercanos, contiguas en disco
+        listas = _top_k(self.centroides @ consulta, min(nprobe, len(self.centroides)))
+        filas = np.concatenate([
+            np.arange(self.desplazamientos[lista], self.desplazamientos[lista + 1]) for lista in listas
+        ])
+        similitudes = np.concatenate([
+            self.matriz[self.desplazamientos[lista]:self.desplazamientos[lista + 1]] @ consulta for lista in listas
+        ])
+        mejores = _top_k(similitudes, k)
+        return [(self.ids[filas[posicion]], float(1 - similitudes[posicion])) for posicion in mejores]
+
+    def buscar_lote(self, vectores, k, nprobe=NPROBE):
+        """
+        Versión por lotes de buscar. En el índice exacto resuelve todas las consultas con un
+        único producto matriz-matriz.
+
+        Parameters:
+            vectores (list): Embeddings de las consultas.
+            k (int): Número de resultados por consulta.
+            nprobe (int): Listas exploradas si el índice es IVF.
+
+        Returns:
+            list: Por cada consulta, tuplas (id, distancia coseno) de menor a mayor distancia.
+        """
+        if self.aproximado or not self.ids:
+            return [self.buscar(vector, k, nprobe) if self.ids else [] for vector in vectores]
+        similitudes = normalizar_filas(vectores) @ self.matriz.T
+        return [
+            [(self.ids[fila], float(1 - fila_similitudes[fila])) for fila in _top_k(fila_similitudes, k)]
+            for fila_similitudes in similitudes
+        ]
+
+
+class AlmacenMatrices:
+    """
+    Persistencia y caché en memoria de los índices matriciales de cada documento.
+
+    Parameters:
+        umbral_ann (int): Fragmentos a partir de los cuales se construye un índice IVF.
+        max_en_memoria (int): Número máximo de índices abiertos a la vez.
+    """
+
+    def __init__(self, umbral_ann=UMBRAL_ANN, max_en_memoria=64):
+        self.umbral_ann = umbral_ann
+        self.max_en_memoria = max_en_memoria
+        self._cargados = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def ruta(persist_directory, documento):
+        nombre = hashlib.sha1(documento.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(persist_directory, "matrices", nombre)
+
+    @staticmethod
+    def _archivos_datos(ruta):
+        directorio, prefijo = os.path.split(ruta)
+        return [
+            os.path.join(directorio, nombre) for nombre in os.listdir(directorio)
+            if nombre.startswith(prefijo + ".") and nombre.endswith((".f32", ".npy"))
+        ]
+
+    def _recordar(self, ruta, indice):
+        with self._lock:
+            self._cargados[ruta] = indice
+            self._cargados.move_to_end(ruta)
+            while len(self._cargados) > self.max_en_memoria:
+                self._cargados.popitem(last=False)
+
+    def construir(self, persist_directory, documento, ids, vectores):
+        """
+        Construye y persiste el índice matricial de un documento.
+
+        Parameters:
+            persist_directory (str): Directorio de persistencia de la colección.
+            documento (str): Nombre del documento.
+            ids (list): IDs de los fragmentos.
+            vectores (list): Embeddings de los fragmentos, en el mismo orden que los IDs.
+
+        Returns:
+            IndiceMatricial: Índice construido.
+        """
+        ids = list(ids)
+        matriz = normalizar_filas(vectores) if ids else np.zeros((0, 0), dtype=np.float32)
+        centroides, desplazamientos = None, None
+        if len(ids) > self.umbral_ann:
+            centroides, asignacion = kmeans_esferico(matriz, int(np.sqrt(len(ids))))
+            orden = np.argsort(asignacion, kind="stable")
+            matriz, ids = matriz[orden], [ids[fila] for fila in orden]
+            conteos = np.bincount(asignacion, minlength=len(centroides))
+            desplazamientos = [0] + np.cumsum(conteos).tolist()
+
+        ruta = self.ruta(persist_directory, documento)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        anteriores = self._archivos_datos(ruta)
+        version = uuid.uuid4().hex[:8]
+        np.ascontiguousarray(matriz).tofile(f"{ruta}.{version}.f32")
+        if centroides is not None:
+            np.save(f"{ruta}.{version}.centroides.npy", centroides)
+        # El JSON se escribe al final: un índice a medio escribir no se considera existente
+        temporal = ruta + ".json.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({"documento": documento, "ids": ids, "dimension": int(matriz.shape[1]) if ids else 0,
+                       "version": version, "desplazamientos": desplazamientos}, f, ensure_ascii=False)
+        os.replace(temporal, ruta + ".json")
+        for archivo in anteriores:
+            os.remove(archivo)
+
+        indice = IndiceMatricial(ids, matriz, centroides, desplazamientos)
+        self._recordar(ruta, indice)
+        return indice
+
+    def obtener(self, persist_directory, documento):
+        """
+        Devuelve el índice matricial de un documento, mapeando su matriz desde el disco si hace falta.
+
+        Returns:
+            IndiceMatricial | None: Índice del documento, o None si no existe.
+        """
+        ruta = self.ruta(persist_directory, documento)
+        with self._lock:
+            if ruta in self._cargados:
+                self._cargados.move_to_end(ruta)
+                return self._cargados[ruta]
+        if not os.path.exists(ruta + ".json"):
+            return None
+        with open(ruta + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        datos = f"{ruta}.{meta['version']}"
+        if meta["ids"]:
+            matriz = np.memmap(datos + ".f32", dtype=np.float32, mode="r", shape=(len(meta["ids"]), meta["dimension"]))
+        else:
+            matriz = np.zeros((0, 0), dtype=np.float32)
+        centroides = np.load(datos + ".centroides.npy") if meta["desplazamientos"] is not None else None
+        indice = IndiceMatricial(meta["ids"], matriz, centroides, meta["desplazamientos"])
+        self._recordar(ruta, indice)
+        return indice
+
+    def eliminar(self, persist_directory, documento):
+        """
+        Elimina el índice matricial de un documento (del disco y de la memoria).
+        """
+        ruta = self.ruta(persist_directory, documento)
+        with self._lock:
+            self._cargados.pop(ruta, None)
+        if os.path.exists(ruta + ".json"):
+            os.remove(ruta + ".json")
+        if os.path.isdir(os.path.dirname(ruta)):
+            for archivo in self._archivos_datos(ruta):
+                os.remove(archivo)
+
+
+# Almacén único del proceso
+almacen_matrices = AlmacenMatrices()
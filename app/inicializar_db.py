@@ -1,30 +1,78 @@
-from app.cargar_en_chroma_db import cargar_documentos_en_chroma_db
+import logging
+import os
+from app.bloqueos import bloqueo_archivo
 from app.config import load_env_vars
+from app.enrutador import enrutador
+from app.manifiesto import ManifiestoIngesta
+
+# Directorios de documentos y de persistencia de cada origen
+ORIGENES = [
+    ("documents/preprocessed/", "chroma_db/preprocessed/"),
+    ("documents/uploaded/", "chroma_db/uploaded/"),
+]
+
+# Bloqueo entre procesos de la sincronización de documents/ con Chroma
+RUTA_BLOQUEO_INICIALIZACION = "chroma_db/.inicializacion.lock"
+
+logger = logging.getLogger(__name__)
+
+def bloqueo_inicializacion(ruta=RUTA_BLOQUEO_INICIALIZACION):
+    """
+    Serializa la inicialización entre procesos (por ejemplo, los workers de uvicorn): el primero
+    indexa y los siguientes encuentran los manifiestos al día. Sin fcntl (Windows) no bloquea.
+    """
+    return bloqueo_archivo(ruta)
 
 # Inicialización de documentos combinados
 def inicializar_documentos():
     """
     Carga los documentos precargados y los previamente subidos.
+
+    En un contenedor nuevo, los índices se toman del paquete precalculado (ver
+    app.paquete_indices) y solo se indexan los documentos que no coinciden con él. Si varios
+    procesos arrancan a la vez, la sincronización se hace de a uno (bloqueo_inicializacion).
     """
+    # Importación diferida: el pipeline de ingesta arrastra Chroma y los loaders de Langchain
+    from app.cargar_en_chroma_db import cargar_documentos_en_chroma_db
+    from app.paquete_indices import PaqueteInvalido, instalar_paquete
+
     load_env_vars()
+    with bloqueo_inicializacion():
+        try:
+            instalar_paquete()
+        except PaqueteInvalido as e:
+            logger.warning("Se ignora el paquete de índices y se indexan los documentos: %s", e)
 
-    preprocessed_dir = "documents/preprocessed/"
-    uploaded_dir = "documents/uploaded/"
-    persist_preprocessed = "chroma_db/preprocessed/"
-    persist_uploaded = "chroma_db/uploaded/"
+        documentos = []
+        for directorio, persist_directory in ORIGENES:
+            # Cargar documentos desde las carpetas predefinidas
+            documentos += cargar_documentos_en_chroma_db(
+                directory=directorio,
+                persist_directory=persist_directory,
+                flag_nuevo=False
+            )
 
-    # Cargar documentos desde las carpetas predefinidas
-    documentos_preprocesados = cargar_documentos_en_chroma_db(
-        directory=preprocessed_dir,
-        persist_directory=persist_preprocessed,
-        flag_nuevo=False
-    )
+    # Combinar ambas listas y devolver
+    return documentos
 
-    documentos_cargados = cargar_documentos_en_chroma_db(
-        directory=uploaded_dir,
-        persist_directory=persist_uploaded,
-        flag_nuevo=False
-    )
+def documentos_en_cache():
+    """
+    Lista los documentos disponibles sin abrir Chroma ni importar el pipeline de ingesta: los
+    registrados en los manifiestos de ingesta de cada origen o, si un origen aún no tiene
+    manifiesto (primer arranque), los archivos soportados de su directorio, que
+    inicializar_documentos indexará.
 
-    # Combinar ambas listas y devolver
-    return documentos_preprocesados + documentos_cargados
\ No newline at end of file
+    Returns:
+        list: Nombres de los documentos, en el mismo orden que inicializar_documentos.
+    """
+    documentos = []
+    for directorio, persist_directory in ORIGENES:
+        manifiestos = [ManifiestoIngesta(ruta) for ruta in enrutador.shards(persist_directory)]
+        if any(manifiesto.existe for manifiesto in manifiestos):
+            nombres = {nombre for manifiesto in manifiestos for nombre in manifiesto.archivos}
+        elif os.path.isdir(directorio):
+            nombres = {nombre for nombre in os.listdir(directorio) if nombre.endswith((".docx", ".pdf"))}
+        else:
+            nombres = set()
+        documentos += sorted(nombres)
+    return documentos
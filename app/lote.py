@@ -0,0 +1,318 @@
+"""
+Módulo de consultas por lotes: evalúa muchas preguntas contra un documento.
+
+Pensado para las baterías de preguntas de regresión. En lugar de recorrer procesar_consulta una
+a una, el lote:
+1. Calcula los embeddings de todas las preguntas en una sola llamada.
+2. Resuelve las búsquedas de todas las preguntas a la vez (retrieve_lote).
+3. Genera (y traduce, si hace falta) las respuestas con concurrencia acotada, reintentando con
+   espera exponencial cuando el proveedor responde con límite de tasa (HTTP 429/503). Cada
+   rechazo reduce a la mitad las llamadas simultáneas al modelo, que vuelven a crecer de a una
+   con las respuestas exitosas (AIMD). El plazo, los reintentos ante errores de red y el
+   circuito de cada llamada los aplica el cliente del modelo (app.cliente_llm).
+
+Las respuestas del lote no pasan por la caché de respuestas.
+
+Uso desde la línea de comandos (JSONL de entrada y de salida, una pregunta por línea):
+    python -m app.lote --documento story_amarok.pdf --entrada preguntas.jsonl --salida resultados.jsonl
+
+Cada línea de entrada es un objeto con `question` y, opcionalmente, `user_name` e `id`.
+
+Dependencias:
+- concurrent.futures: Pool de hilos para la generación concurrente.
+- app.services: Recuperación por lotes, detección de idioma, generación y traducción.
+- app.config (obtener_parametro): Concurrencia y política de reintentos.
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from app import services
+from app.config import configurar_logging, obtener_parametro
+from app.models import SolicitudConsulta
+
+logger = logging.getLogger(__name__)
+
+# Parámetros del procesamiento por lotes
+MAX_CONCURRENCIA_LOTE = obtener_parametro("MAX_CONCURRENCIA_LOTE", 4, int)
+MAX_REINTENTOS_LOTE = obtener_parametro("MAX_REINTENTOS_LOTE", 5, int)
+ESPERA_BASE_REINTENTO = obtener_parametro("ESPERA_BASE_REINTENTO", 1.0, float)
+ESPERA_MAXIMA_REINTENTO = 30.0
+
+# Códigos HTTP que indican saturación del proveedor y justifican reintentar
+_CODIGOS_REINTENTABLES = (429, 503)
+
+
+@dataclass
+class ResultadoLote:
+    """
+    Resultado de un lote de consultas.
+
+    Attributes:
+        resultados (list): Un diccionario por pregunta, en el orden de entrada.
+        segundos_embeddings (float): Tiempo de cálculo de los embeddings de las preguntas.
+        segundos_recuperacion (float): Tiempo de las búsquedas de todas las preguntas.
+        segundos_generacion (float): Tiempo de la etapa de generación (y traducción).
+        segundos (float): Duración total del lote.
+    """
+    resultados: list = field(default_factory=list)
+    segundos_embeddings: float = 0.0
+    segundos_recuperacion: float = 0.0
+    segundos_generacion: float = 0.0
+    segundos: float = 0.0
+
+    @property
+    def errores(self):
+        return sum(1 for resultado in self.resultados if resultado["error"])
+
+    @property
+    def reintentos(self):
+        return sum(resultado["reintentos"] for resultado in self.resultados)
+
+    def __str__(self):
+        return (
+            f"Lote: {len(self.resultados)} preguntas en {self.segundos:.2f}s "
+            f"(embeddings {self.segundos_embeddings:.2f}s, recuperación {self.segundos_recuperacion:.2f}s, "
+            f"generación {self.segundos_generacion:.2f}s), {self.reintentos} reintentos, {self.errores} errores"
+        )
+
+
+class LimiteAdaptativo:
+    """
+    Límite de llamadas simultáneas que se adapta a los rechazos del proveedor: se reduce a la
+    mitad con cada límite de tasa y crece en una llamada por cada `limite` respuestas exitosas.
+
+    Parameters:
+        maximo (int): Máximo de llamadas simultáneas.
+    """
+
+    def __init__(self, maximo):
+        self.maximo = max(1, maximo)
+        self.limite = self.maximo
+        self.en_curso = 0
+        self._credito = 0.0
+        self._condicion = threading.Condition()
+
+    def __enter__(self):
+        with self._condicion:
+            while self.en_curso >= self.limite:
+                self._condicion.wait()
+            self.en_curso += 1
+        return self
+
+    def __exit__(self, *excepcion):
+        with self._condicion:
+            self.en_curso -= 1
+            self._condicion.notify_all()
+
+    def reducir(self):
+        with self._condicion:
+            self.limite = max(1, self.limite // 2)
+            self._credito = 0.0
+
+    def aumentar(self):
+        with self._condicion:
+            if self.limite >= self.maximo:
+                return
+            self._credito += 1 / self.limite
+            if self._credito >= 1:
+                self._credito = 0.0
+                self.limite += 1
+                self._condicion.notify_all()
+
+
+def es_limite_de_tasa(error):
+    """
+    Indica si un error del proveedor corresponde a un límite de tasa o saturación temporal.
+
+    Parameters:
+        error (Exception): Error lanzado por el cliente del modelo.
+
+    Returns:
+        bool: True si conviene reintentar la llamada.
+    """
+    return getattr(error, "status_code", None) in _CODIGOS_REINTENTABLES
+
+
+def _espera_sugerida(error):
+    # Cohere (y la mayoría de las APIs) indican en Retry-After cuántos segundos esperar
+    encabezados = getattr(error, "headers", None) or {}
+    valor = {clave.lower(): v for clave, v in encabezados.items()}.get("retry-after")
+    try:
+        return float(valor) if valor is not None else None
+    except ValueError:
+        return None
+
+
+def invocar_con_reintentos(funcion, *args, max_reintentos=MAX_REINTENTOS_LOTE,
+                           espera_base=ESPERA_BASE_REINTENTO, dormir=time.sleep, limitador=None):
+    """
+    Ejecuta una función reintentando los errores de límite de tasa con espera exponencial.
+
+    Se espera `espera_base * 2^intento` con variación aleatoria, para no sincronizar los
+    reintentos de las llamadas concurrentes, y nunca menos de lo que indique el encabezado
+    Retry-After del proveedor.
+
+    Parameters:
+        funcion (callable): Función a ejecutar.
+        *args: Argumentos de la función.
+        max_reintentos (int): Reintentos máximos antes de propagar el error.
+        espera_base (float): Espera inicial en segundos.
+        dormir (callable): Función de espera.
+        limitador (LimiteAdaptativo, optional): Límite de llamadas simultáneas a respetar y ajustar.
+
+    Returns:
+        tuple: (resultado de la función, número de reintentos realizados).
+
+    Raises:
+        Exception: El último error si no es reintentable o se agotan los reintentos.
+    """
+    contexto = limitador if limitador is not None else contextlib.nullcontext()
+    for intento in range(max_reintentos + 1):
+        try:
+            with contexto:
+                resultado = funcion(*args)
+        except Exception as error:
+            if not es_limite_de_tasa(error):
+                raise
+            if limitador is not None:
+                limitador.reducir()
+            if intento == max_reintentos:
+                raise
+            espera = max(_espera_sugerida(error) or 0.0, espera_base * 2 ** intento * random.uniform(0.5, 1.5))
+            dormir(min(espera, ESPERA_MAXIMA_REINTENTO))
+            continue
+        if limitador is not None:
+            limitador.aumentar()
+        return resultado, intento
+
+
+def _traducir(texto, idioma):
+    return services.cliente_llm.invocar(services.construir_prompt_traduccion(texto, idioma), "traduccion").content
+
+
+def _responder(state, contexto, temperature, modo_unica_llamada, max_reintentos, limitador, inicio_lote):
+    inicio = time.perf_counter()
+    resultado = {
+        "user_name": state.user_name, "question": state.question, "answer": None, "idioma": None,
+        "error": None, "reintentos": 0,
+        "tiempos": {"cola_s": inicio - inicio_lote, "generacion_s": 0.0, "traduccion_s": 0.0},
+    }
+    try:
+        idioma = services.detectar_idioma(state)
+        resultado["idioma"] = idioma
+
+        marca = time.perf_counter()
+        respuesta, reintentos = invocar_con_reintentos(
+            services.generar_respuesta, state, contexto, temperature, idioma if modo_unica_llamada else None,
+            max_reintentos=max_reintentos, limitador=limitador
+        )
+        resultado["reintentos"] += reintentos
+        resultado["tiempos"]["generacion_s"] = time.perf_counter() - marca
+
+        if idioma != "es" and not modo_unica_llamada:
+            marca = time.perf_counter()
+            try:
+                respuesta, reintentos = invocar_con_reintentos(
+                    _traducir, respuesta, idioma, max_reintentos=max_reintentos, limitador=limitador
+                )
+                resultado["reintentos"] += reintentos
+            except Exception as e:
+                logger.warning("Error al traducir con el modelo: %s", e)  # Se conserva la respuesta sin traducir
+            resultado["tiempos"]["traduccion_s"] = time.perf_counter() - marca
+        resultado["answer"] = respuesta
+    except Exception as e:
+        resultado["error"] = f"{type(e).__name__}: {e}"
+
+    resultado["tiempos"]["total_s"] = time.perf_counter() - inicio
+    return resultado
+
+
+def procesar_lote(solicitudes, doc_seleccionado, temperature=0, max_concurrencia=MAX_CONCURRENCIA_LOTE,
+                  max_reintentos=MAX_REINTENTOS_LOTE, modo_unica_llamada=False, k=3):
+    """
+    Procesa un lote de consultas sobre un documento.
+
+    Parameters:
+        solicitudes (list): Consultas (SolicitudConsulta).
+        doc_seleccionado (str | list): Documento (o documentos) a consultar.
+        temperature (float): Temperatura de la generación.
+        max_concurrencia (int): Máximo de preguntas generándose a la vez.
+        max_reintentos (int): Reintentos por llamada ante límites de tasa.
+        modo_unica_llamada (bool): Si es True, genera en el idioma detectado y omite la traducción.
+        k (int): Fragmentos de contexto por pregunta.
+
+    Returns:
+        ResultadoLote: Respuestas (una por consulta, en orden) y tiempos del lote.
+
+    Raises:
+        FileNotFoundError: Si el documento no está indexado en ninguna colección.
+    """
+    inicio = time.perf_counter()
+    lote = ResultadoLote()
+    if not solicitudes:
+        return lote
+
+    embeddings = services.embeber_preguntas([state.question for state in solicitudes])
+    lote.segundos_embeddings = time.perf_counter() - inicio
+
+    marca = time.perf_counter()
+    contextos = services.retrieve_lote(solicitudes, doc_seleccionado, embeddings, k=k)
+    lote.segundos_recuperacion = time.perf_counter() - marca
+
+    marca = time.perf_counter()
+    limitador = LimiteAdaptativo(max_concurrencia)
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrencia)) as pool:
+        futuros = [
+            pool.submit(_responder, state, contexto["context"], temperature, modo_unica_llamada,
+                        max_reintentos, limitador, marca)
+            for state, contexto in zip(solicitudes, contextos)
+        ]
+        lote.resultados = [futuro.result() for futuro in futuros]
+    lote.segundos_generacion = time.perf_counter() - marca
+    lote.segundos = time.perf_counter() - inicio
+    return lote
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Evalúa un lote de preguntas (JSONL) contra un documento.")
+    parser.add_argument("--documento", required=True, help="Nombre del documento indexado a consultar")
+    parser.add_argument("--entrada", default="-", help="Archivo JSONL de preguntas ('-' para la entrada estándar)")
+    parser.add_argument("--salida", default="-", help="Archivo JSONL de resultados ('-' para la salida estándar)")
+    parser.add_argument("--temperatura", type=float, default=0.0)
+    parser.add_argument("--concurrencia", type=int, default=MAX_CONCURRENCIA_LOTE)
+    parser.add_argument("--reintentos", type=int, default=MAX_REINTENTOS_LOTE)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--modo-unica-llamada", action="store_true")
+    args = parser.parse_args(argumentos)
+    configurar_logging()
+
+    entrada = sys.stdin if args.entrada == "-" else open(args.entrada, encoding="utf-8")
+    with entrada:
+        items = [json.loads(linea) for linea in entrada if linea.strip()]
+    solicitudes = [SolicitudConsulta(user_name=item.get("user_name", "lote"), question=item["question"]) for item in items]
+
+    # Los mensajes de estado van a stderr para no mezclarse con los resultados
+    with contextlib.redirect_stdout(sys.stderr):
+        lote = procesar_lote(solicitudes, args.documento, args.temperatura, args.concurrencia,
+                             args.reintentos, args.modo_unica_llamada, args.k)
+
+    salida = sys.stdout if args.salida == "-" else open(args.salida, "w", encoding="utf-8")
+    try:
+        for posicion, (item, resultado) in enumerate(zip(items, lote.resultados)):
+            salida.write(json.dumps({"id": item.get("id", posicion), **resultado}, ensure_ascii=False) + "\n")
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+    print(lote, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
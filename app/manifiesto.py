@@ -0,0 +1,141 @@
+"""
+Módulo del manifiesto de ingesta de una base de vectores.
+
+El manifiesto es un archivo JSON guardado junto a la base Chroma (`manifiesto.json`) que registra,
+por cada archivo indexado, su hash de contenido, fecha de modificación, tamaño, los IDs de sus
+fragmentos en Chroma y los parámetros del divisor de texto usados. Permite decidir qué archivos
+cambiaron revisando solo el sistema de archivos (O(archivos)), sin leer los metadatos de todos
+los fragmentos de la colección.
+
+Dependencias:
+- hashlib: Hash SHA-256 del contenido de los archivos.
+- json: Serialización del manifiesto.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+NOMBRE_MANIFIESTO = "manifiesto.json"
+
+
+def hash_archivo(ruta, tamano_bloque=1 << 20):
+    """
+    Calcula el hash SHA-256 del contenido de un archivo leyéndolo por bloques.
+
+    Parameters:
+        ruta (str): Ruta del archivo.
+        tamano_bloque (int): Bytes leídos por iteración.
+
+    Returns:
+        str: Hash en hexadecimal.
+    """
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(tamano_bloque), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+class ManifiestoIngesta:
+    """
+    Manifiesto de los archivos indexados en una base de vectores.
+
+    Parameters:
+        persist_directory (str): Directorio de persistencia de la base Chroma.
+    """
+
+    def __init__(self, persist_directory):
+        self.ruta = os.path.join(persist_directory, NOMBRE_MANIFIESTO)
+        self.archivos = {}
+        # Hay cambios en memoria sin guardar
+        self.modificado = False
+        self._lock = threading.Lock()
+        self.existe = os.path.exists(self.ruta)
+        if self.existe:
+            with open(self.ruta, encoding="utf-8") as f:
+                self.archivos = json.load(f).get("archivos", {})
+
+    def __contains__(self, filename):
+        return filename in self.archivos
+
+    def obtener(self, filename):
+        return self.archivos.get(filename)
+
+    def registrar(self, filename, hash_contenido, mtime, tamano, chunk_ids, splitter):
+        """
+        Registra (o reemplaza) la entrada de un archivo indexado.
+
+        Parameters:
+            filename (str): Nombre del archivo.
+            hash_contenido (str): Hash SHA-256 del contenido.
+            mtime (float): Fecha de modificación del archivo.
+            tamano (int): Tamaño del archivo en bytes.
+            chunk_ids (list): IDs de los fragmentos escritos en Chroma.
+            splitter (dict): Parámetros del divisor de texto usados.
+        """
+        with self._lock:
+            self.archivos[filename] = {
+                "hash": hash_contenido,
+                "mtime": mtime,
+                "tamano": tamano,
+                "chunk_ids": list(chunk_ids),
+                "splitter": dict(splitter),
+            }
+            self.modificado = True
+
+    def eliminar(self, filename):
+        """
+        Elimina la entrada de un archivo.
+
+        Returns:
+            dict | None: La entrada eliminada, si existía.
+        """
+        with self._lock:
+            entrada = self.archivos.pop(filename, None)
+            self.modificado = self.modificado or entrada is not None
+            return entrada
+
+    def sin_cambios(self, filename, ruta, splitter):
+        """
+        Indica si un archivo sigue igual que cuando se indexó.
+
+        Primero compara fecha de modificación y tamaño; solo si difieren calcula el hash, y si el
+        contenido es el mismo actualiza la fecha registrada (y marca el manifiesto como
+        modificado) para no volver a calcularlo en el próximo arranque.
+
+        Parameters:
+            filename (str): Nombre del archivo.
+            ruta (str): Ruta del archivo en disco.
+            splitter (dict): Parámetros actuales del divisor de texto.
+
+        Returns:
+            bool: True si el archivo no necesita re-indexarse.
+        """
+        entrada = self.archivos.get(filename)
+        if entrada is None or entrada.get("splitter") != splitter:
+            return False
+        estado = os.stat(ruta)
+        if entrada["mtime"] == estado.st_mtime and entrada["tamano"] == estado.st_size:
+            return True
+        if hash_archivo(ruta) != entrada["hash"]:
+            return False
+        with self._lock:
+            entrada["mtime"] = estado.st_mtime
+            entrada["tamano"] = estado.st_size
+            self.modificado = True
+        return True
+
+    def guardar(self):
+        """
+        Guarda el manifiesto de forma atómica (archivo temporal + reemplazo).
+        """
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        temporal = self.ruta + ".tmp"
+        with self._lock:
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "archivos": self.archivos}, f, ensure_ascii=False, indent=1)
+            os.replace(temporal, self.ruta)
+            self.modificado = False
+        self.existe = True
@@ -0,0 +1,392 @@
+"""
+Módulo de métricas de rendimiento del pipeline RAG.
+
+Registra la duración de cada etapa del pipeline (recuperación, embeddings, detección de idioma,
+generación, traducción, ingesta) como spans con atributos (tokens, resultado de la caché, número
+de fragmentos). Las observaciones se agregan en histogramas con percentiles sobre una ventana
+reciente y se exponen en formato de texto de Prometheus; cada span se escribe además como una
+línea JSON en un archivo de trazas rotativo.
+
+Funcionalidades principales:
+- RegistroMetricas: Histogramas y contadores con etiquetas, spans y exportación a Prometheus.
+- configurar_trazas(): Escritura de los spans en un JSONL rotativo desde un hilo aparte.
+- medir_solicitud(): Agrupa los spans de una solicitud HTTP (ID de traza y duración por etapa).
+- iniciar_servidor_metricas(): Endpoint HTTP /metrics en un hilo en segundo plano.
+
+Dependencias:
+- collections (deque): Ventana acotada de observaciones por métrica.
+- logging.handlers: Archivo rotativo y cola para escribir las trazas fuera del camino crítico.
+- http.server: Servidor del endpoint /metrics.
+- app.config (obtener_parametro): Puerto del endpoint y ubicación del archivo de trazas.
+"""
+
+import contextlib
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app.config import obtener_parametro
+
+TAMANO_VENTANA = 1000
+PUERTO_METRICAS = obtener_parametro("PUERTO_METRICAS", 9100, int)  # 0 desactiva el endpoint
+ARCHIVO_TRAZAS = obtener_parametro("ARCHIVO_TRAZAS", "logs/trazas.jsonl")  # Vacío desactiva las trazas
+TRAZAS_MAX_BYTES = obtener_parametro("TRAZAS_MAX_BYTES", 10 * 1024 * 1024, int)
+TRAZAS_RESPALDOS = obtener_parametro("TRAZAS_RESPALDOS", 5, int)
+
+# Límites superiores (en segundos) de los buckets de los histogramas
+LIMITES_HISTOGRAMA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PERCENTILES = (50, 95, 99)
+PREFIJO_PROMETHEUS = "rag_"
+
+# Traza en curso: los spans anidados (incluso en asyncio.to_thread) comparten su ID
+_traza_actual = contextvars.ContextVar("traza_actual", default=None)
+# Duración acumulada por etapa de la solicitud en curso (ver medir_solicitud)
+_etapas_solicitud = contextvars.ContextVar("etapas_solicitud", default=None)
+_logger_trazas = logging.getLogger("app.trazas")
+_logger_trazas.propagate = False
+_logger_trazas.setLevel(logging.INFO)
+
+
+def _percentil(valores_ordenados, percentil):
+    if not valores_ordenados:
+        return 0.0
+    indice = min(len(valores_ordenados) - 1, int(round(percentil / 100 * (len(valores_ordenados) - 1))))
+    return valores_ordenados[indice]
+
+
+def _clave(nombre, etiquetas):
+    return (nombre, tuple(sorted(etiquetas.items())))
+
+
+def _escapar_etiqueta(valor):
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatear_etiquetas(etiquetas, extra=()):
+    pares = [(k, str(v)) for k, v in etiquetas] + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar_etiqueta(v)}"' for k, v in pares) + "}"
+
+
+class _Histograma:
+    """
+    Observaciones de una serie: buckets acumulados desde el arranque y ventana reciente para percentiles.
+    """
+
+    def __init__(self, tamano_ventana):
+        self.ventana = deque(maxlen=tamano_ventana)
+        self.buckets = [0] * len(LIMITES_HISTOGRAMA)
+        self.suma = 0.0
+        self.cantidad = 0
+
+    def observar(self, valor):
+        self.ventana.append(valor)
+        self.suma += valor
+        self.cantidad += 1
+        for posicion, limite in enumerate(LIMITES_HISTOGRAMA):
+            if valor <= limite:
+                self.buckets[posicion] += 1
+                break
+
+
+class Span:
+    """
+    Medición de una etapa del pipeline. Se usa como context manager mediante RegistroMetricas.span;
+    los atributos se pueden agregar durante la etapa con span["atributo"] = valor.
+
+    Attributes:
+        etapa (str): Nombre de la etapa.
+        atributos (dict): Atributos que acompañan la traza (tokens, resultado de la caché, etc.).
+        duracion (float): Duración en segundos, disponible al terminar.
+    """
+
+    def __init__(self, registro, etapa, atributos):
+        self.registro = registro
+        self.etapa = etapa
+        self.atributos = atributos
+        self.duracion = None
+
+    def __setitem__(self, atributo, valor):
+        self.atributos[atributo] = valor
+
+    def __enter__(self):
+        self._traza_anterior = _traza_actual.get()
+        self.traza = self._traza_anterior or uuid.uuid4().hex[:16]
+        _traza_actual.set(self.traza)
+        self._inicio_reloj = time.time()
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_error, error, traceback):
+        self.duracion = time.perf_counter() - self._inicio
+        # Se restaura con set y no con un token: un generador puede cerrar el span desde otro contexto
+        _traza_actual.set(self._traza_anterior)
+        self.registro.observar("etapa_segundos", self.duracion, etapa=self.etapa)
+        etapas = _etapas_solicitud.get()
+        if etapas is not None:
+            etapas[self.etapa] = etapas.get(self.etapa, 0.0) + self.duracion
+        if error is not None:
+            self.registro.incrementar("errores_total", etapa=self.etapa, tipo=tipo_error.__name__)
+        if _logger_trazas.handlers:
+            registro_traza = {
+                "traza": self.traza, "etapa": self.etapa, "inicio": round(self._inicio_reloj, 6),
+                "duracion_ms": round(self.duracion * 1000, 3), "error": tipo_error.__name__ if error else None,
+            }
+            registro_traza.update(self.atributos)
+            _logger_trazas.info(json.dumps(registro_traza, ensure_ascii=False, default=str))
+        return False
+
+
+class RegistroMetricas:
+    """
+    Registro de histogramas y contadores por nombre de métrica y etiquetas.
+
+    Parameters:
+        tamano_ventana (int): Número de observaciones recientes que se conservan por serie
+            para calcular percentiles.
+    """
+
+    def __init__(self, tamano_ventana=TAMANO_VENTANA):
+        self.tamano_ventana = tamano_ventana
+        self._histogramas = {}
+        self._contadores = {}
+        self._colectores = {}
+        self._lock = threading.Lock()
+
+    def observar(self, nombre, valor, **etiquetas):
+        """
+        Registra una observación.
+
+        Parameters:
+            nombre (str): Nombre de la métrica.
+            valor (float): Valor observado.
+            **etiquetas: Etiquetas de la serie (por ejemplo, etapa="recuperacion").
+        """
+        clave = _clave(nombre, etiquetas)
+        with self._lock:
+            if clave not in self._histogramas:
+                self._histogramas[clave] = _Histograma(self.tamano_ventana)
+            self._histogramas[clave].observar(valor)
+
+    def incrementar(self, nombre, cantidad=1, **etiquetas):
+        """
+        Incrementa un contador.
+
+        Parameters:
+            nombre (str): Nombre del contador (por convención, terminado en _total).
+            cantidad (float): Incremento.
+            **etiquetas: Etiquetas de la serie.
+        """
+        clave = _clave(nombre, etiquetas)
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + cantidad
+
+    def contador(self, nombre, **etiquetas):
+        """
+        Devuelve el valor actual de un contador (0 si no existe).
+        """
+        with self._lock:
+            return self._contadores.get(_clave(nombre, etiquetas), 0)
+
+    def span(self, etapa, **atributos):
+        """
+        Crea un span que mide la duración de una etapa.
+
+        La duración se observa en la métrica 'etapa_segundos' con la etiqueta etapa, y el span
+        se escribe en el archivo de trazas si está configurado.
+
+        Parameters:
+            etapa (str): Nombre de la etapa.
+            **atributos: Atributos iniciales de la traza.
+
+        Returns:
+            Span: Context manager de la etapa.
+        """
+        return Span(self, etapa, atributos)
+
+    def registrar_colector(self, prefijo, funcion):
+        """
+        Registra una función que devuelve valores numéricos a exportar como gauges en cada
+        lectura del endpoint (por ejemplo, las estadísticas de una caché).
+
+        Parameters:
+            prefijo (str): Prefijo de los nombres de las métricas.
+            funcion (callable): Devuelve un dict {campo: valor}.
+        """
+        with self._lock:
+            self._colectores[prefijo] = funcion
+
+    def resumen(self, nombre, **etiquetas):
+        """
+        Resume las observaciones recientes de una métrica.
+
+        Parameters:
+            nombre (str): Nombre de la métrica.
+            **etiquetas: Etiquetas de la serie.
+
+        Returns:
+            dict: Cantidad, media y percentiles 50, 95 y 99.
+        """
+        with self._lock:
+            histograma = self._histogramas.get(_clave(nombre, etiquetas))
+            valores = sorted(histograma.ventana) if histograma else []
+        return {
+            "cantidad": len(valores),
+            "media": sum(valores) / len(valores) if valores else 0.0,
+            "p50": _percentil(valores, 50),
+            "p95": _percentil(valores, 95),
+            "p99": _percentil(valores, 99),
+        }
+
+    def exportar_prometheus(self):
+        """
+        Genera el texto de exposición de Prometheus con todas las métricas.
+
+        Cada histograma se exporta con sus buckets, suma y cantidad, y sus percentiles sobre la
+        ventana reciente como el gauge <nombre>_percentil. Los contadores se exportan como
+        counters y los colectores registrados como gauges.
+
+        Returns:
+            str: Texto en formato de exposición de Prometheus (versión 0.0.4).
+        """
+        with self._lock:
+            histogramas = [
+                (clave, list(h.buckets), h.suma, h.cantidad, sorted(h.ventana)) for clave, h in self._histogramas.items()
+            ]
+            contadores = list(self._contadores.items())
+            colectores = list(self._colectores.items())
+
+        lineas = []
+        for nombre in sorted({clave[0] for clave, *_ in histogramas}):
+            metrica = PREFIJO_PROMETHEUS + nombre
+            series = sorted(serie for serie in histogramas if serie[0][0] == nombre)
+            lineas.append(f"# TYPE {metrica} histogram")
+            for (_, etiquetas), buckets, suma, cantidad, _ventana in series:
+                acumulado = 0
+                for limite, conteo in zip(LIMITES_HISTOGRAMA, buckets):
+                    acumulado += conteo
+                    lineas.append(f"{metrica}_bucket{_formatear_etiquetas(etiquetas, [('le', str(limite))])} {acumulado}")
+                lineas.append(f"{metrica}_bucket{_formatear_etiquetas(etiquetas, [('le', '+Inf')])} {cantidad}")
+                lineas.append(f"{metrica}_sum{_formatear_etiquetas(etiquetas)} {suma}")
+                lineas.append(f"{metrica}_count{_formatear_etiquetas(etiquetas)} {cantidad}")
+            lineas.append(f"# TYPE {metrica}_percentil gauge")
+            for (_, etiquetas), _buckets, _suma, _cantidad, ventana in series:
+                for percentil in PERCENTILES:
+                    extra = [("percentil", f"p{percentil}")]
+                    lineas.append(f"{metrica}_percentil{_formatear_etiquetas(etiquetas, extra)} {_percentil(ventana, percentil)}")
+
+        for nombre in sorted({clave[0] for clave, _ in contadores}):
+            metrica = PREFIJO_PROMETHEUS + nombre
+            lineas.append(f"# TYPE {metrica} counter")
+            for (_, etiquetas), valor in sorted(serie for serie in contadores if serie[0][0] == nombre):
+                lineas.append(f"{metrica}{_formatear_etiquetas(etiquetas)} {valor}")
+
+        for prefijo, funcion in colectores:
+            try:
+                valores = funcion()
+            except Exception:
+                continue
+            for campo, valor in valores.items():
+                if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                    metrica = f"{PREFIJO_PROMETHEUS}{prefijo}_{campo}"
+                    lineas.append(f"# TYPE {metrica} gauge")
+                    lineas.append(f"{metrica} {valor}")
+        return "\n".join(lineas) + "\n"
+
+
+@contextlib.contextmanager
+def medir_solicitud():
+    """
+    Agrupa los spans de una solicitud: todos comparten un ID de traza nuevo y sus duraciones se
+    acumulan por etapa, también los que corren en otros hilos con asyncio.to_thread.
+
+    Yields:
+        tuple: (ID de traza, dict etapa -> segundos acumulados hasta el momento).
+    """
+    traza, etapas = uuid.uuid4().hex[:16], {}
+    token_traza, token_etapas = _traza_actual.set(traza), _etapas_solicitud.set(etapas)
+    try:
+        yield traza, etapas
+    finally:
+        _traza_actual.reset(token_traza)
+        _etapas_solicitud.reset(token_etapas)
+
+
+def configurar_trazas(archivo=ARCHIVO_TRAZAS, max_bytes=TRAZAS_MAX_BYTES, respaldos=TRAZAS_RESPALDOS):
+    """
+    Activa la escritura de los spans en un archivo JSONL rotativo.
+
+    Los spans se encolan en memoria y un hilo aparte los escribe, de modo que el pipeline no
+    espera la E/S del disco.
+
+    Parameters:
+        archivo (str): Ruta del archivo de trazas. Vacío para no escribir trazas.
+        max_bytes (int): Tamaño a partir del cual se rota el archivo.
+        respaldos (int): Archivos rotados que se conservan.
+
+    Returns:
+        logging.handlers.QueueListener | None: Hilo escritor (se detiene con stop()), o None si
+            las trazas quedan desactivadas.
+    """
+    if not archivo:
+        return None
+    directorio = os.path.dirname(archivo)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    manejador_archivo = logging.handlers.RotatingFileHandler(
+        archivo, maxBytes=max_bytes, backupCount=respaldos, encoding="utf-8"
+    )
+    manejador_archivo.setFormatter(logging.Formatter("%(message)s"))
+    cola = queue.SimpleQueue()
+    escritor = logging.handlers.QueueListener(cola, manejador_archivo)
+    escritor.start()
+    _logger_trazas.addHandler(logging.handlers.QueueHandler(cola))
+    return escritor
+
+
+def iniciar_servidor_metricas(puerto=PUERTO_METRICAS, host="0.0.0.0", registro=None):
+    """
+    Expone las métricas en http://<host>:<puerto>/metrics desde un hilo en segundo plano.
+
+    Parameters:
+        puerto (int): Puerto del endpoint. Si es 0, no se inicia.
+        host (str): Interfaz en la que escucha.
+        registro (RegistroMetricas, optional): Registro a exponer. Por defecto, el del proceso.
+
+    Returns:
+        ThreadingHTTPServer | None: Servidor iniciado (se detiene con shutdown()), o None.
+    """
+    if not puerto:
+        return None
+    registro = registro or metricas
+
+    class ManejadorMetricas(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            cuerpo = registro.exportar_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, formato, *args):
+            pass  # Sin una línea en la salida por cada lectura
+
+    servidor = ThreadingHTTPServer((host, puerto), ManejadorMetricas)
+    threading.Thread(target=servidor.serve_forever, name="metricas", daemon=True).start()
+    return servidor
+
+
+# Registro único del proceso
+metricas = RegistroMetricas()
@@ -0,0 +1,122 @@
+"""
+Modelos locales deterministas que sustituyen a ChatCohere y CohereEmbeddings.
+
+Permiten ejecutar la aplicación, los benchmarks y las pruebas de carga sin claves ni red
+(PROVEEDOR_MODELOS=simulado). El chat responde un texto fijo con una latencia configurable y
+admite streaming; los embeddings son vectores derivados del hash de cada palabra, de modo que
+textos con vocabulario común quedan cerca en el espacio vectorial.
+
+Dependencias:
+- langchain_core (AIMessage, Embeddings): Tipos de los modelos reales de Langchain.
+"""
+
+import copy
+import hashlib
+import time
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+
+class LLMSimulado:
+    """
+    Modelo de chat simulado con la misma interfaz mínima que ChatCohere (`invoke`, `stream` y
+    `model_copy` para fijar la temperatura de una llamada).
+
+    Parameters:
+        latencia (float): Segundos que tarda cada llamada completa.
+        idioma (str): Código devuelto cuando el prompt es de detección de idioma.
+        fraccion_primer_token (float): Fracción de la latencia que tarda el primer token en streaming.
+        eco (bool): Si es True, la respuesta termina con la temperatura usada en la llamada, para
+            comprobar que las consultas concurrentes no se mezclan.
+        latencia_por_token (float): Segundos adicionales por token del prompt (costo de procesar
+            la entrada), que se suman antes de la respuesta o del primer token.
+    """
+
+    respuesta = "Respuesta simulada con varias palabras para observar el streaming token a token. 🤖"
+
+    def __init__(self, latencia=0.3, idioma="en", fraccion_primer_token=0.2, eco=False, latencia_por_token=0.0):
+        self.latencia = latencia
+        self.idioma = idioma
+        self.fraccion_primer_token = fraccion_primer_token
+        self.eco = eco
+        self.latencia_por_token = latencia_por_token
+        self.temperature = 0
+        self.llamadas = 0
+
+    def model_copy(self, update=None):
+        copia = copy.copy(self)
+        for atributo, valor in (update or {}).items():
+            setattr(copia, atributo, valor)
+        return copia
+
+    def _contenido(self, prompt):
+        if "detectar idiomas" in prompt:
+            return self.idioma
+        return f"{self.respuesta} [temperatura={self.temperature}]" if self.eco else self.respuesta
+
+    @staticmethod
+    def _uso(prompt, contenido):
+        # Conteo aproximado de tokens por palabras, con el formato de usage_metadata de Langchain
+        entrada, salida = len(prompt.split()), len(contenido.split())
+        return {"input_tokens": entrada, "output_tokens": salida, "total_tokens": entrada + salida}
+
+    def _latencia_entrada(self, prompt):
+        return self.latencia_por_token * len(prompt.split())
+
+    def invoke(self, prompt):
+        self.llamadas += 1
+        time.sleep(self.latencia + self._latencia_entrada(prompt))
+        contenido = self._contenido(prompt)
+        return AIMessage(content=contenido, usage_metadata=self._uso(prompt, contenido))
+
+    def stream(self, prompt):
+        self.llamadas += 1
+        time.sleep(self.latencia * self.fraccion_primer_token + self._latencia_entrada(prompt))
+        tokens = self._contenido(prompt).split(" ")
+        espera = self.latencia * (1 - self.fraccion_primer_token) / len(tokens)
+        for posicion, token in enumerate(tokens):
+            if posicion:
+                time.sleep(espera)
+            yield AIMessageChunk(content=token if posicion == 0 else " " + token)
+        # Como en los modelos reales, el uso de tokens llega en el último fragmento
+        yield AIMessageChunk(content="", usage_metadata=self._uso(prompt, self._contenido(prompt)))
+
+
+class EmbeddingsSimulados(Embeddings):
+    """
+    Modelo de embeddings simulado: cada texto se convierte en un vector determinista
+    a partir de los hashes de sus palabras, de modo que textos con vocabulario común
+    quedan cerca en el espacio vectorial.
+
+    Parameters:
+        dimension (int): Dimensión de los vectores.
+        latencia (float): Segundos que tarda cada llamada al modelo.
+    """
+
+    def __init__(self, dimension=256, latencia=0.0):
+        self.dimension = dimension
+        self.latencia = latencia
+        self.llamadas = 0
+        self.textos_embebidos = 0
+
+    def _vector(self, texto):
+        vector = [0.0] * self.dimension
+        for palabra in texto.lower().split():
+            digest = hashlib.md5(palabra.encode("utf-8")).digest()
+            indice = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[indice] += 1.0 if digest[4] % 2 else -1.0
+        norma = sum(valor * valor for valor in vector) ** 0.5 or 1.0
+        return [valor / norma for valor in vector]
+
+    def embed_documents(self, texts):
+        self.llamadas += 1
+        self.textos_embebidos += len(texts)
+        time.sleep(self.latencia)
+        return [self._vector(texto) for texto in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def embed(self, texts, input_type=None):
+        # Misma firma que CohereEmbeddings.embed: una llamada para varios textos
+        return self.embed_documents(texts)
@@ -9,14 +9,42 @@ Funcionalidades principales:
 - Garantiza que las solicitudes contengan los campos requeridos.
 
 Dependencias:
-- pydantic (BaseModel): Framework para la validación y gestión de datos.
+- pydantic (BaseModel, Field): Framework para la validación y gestión de datos.
 """
 
-from pydantic import BaseModel
+from typing import Optional, Union
+from pydantic import BaseModel, Field
 
 class SolicitudConsulta(BaseModel):
     """
     Modelo de datos para las solicitudes de consulta.
     """
     user_name: str
-    question: str
\ No newline at end of file
+    question: str
+
+class ConsultaAPI(SolicitudConsulta):
+    """
+    Consulta recibida por la API HTTP (app.api).
+    """
+    user_name: str = "api"
+    documento: Union[str, list[str]]  # Un documento o varios a la vez
+    temperatura: float = Field(0.0, ge=0, le=1)
+    modo_unica_llamada: Optional[bool] = None  # Por defecto, MODO_UNICA_LLAMADA
+
+class LoteAPI(BaseModel):
+    """
+    Lote de preguntas sobre un documento recibido por la API HTTP (app.api).
+    """
+    user_name: str = "lote"
+    documento: Union[str, list[str]]
+    preguntas: list[str] = Field(min_length=1)
+    temperatura: float = Field(0.0, ge=0, le=1)
+    modo_unica_llamada: Optional[bool] = None  # Por defecto, MODO_UNICA_LLAMADA
+    k: int = Field(3, ge=1, le=20)
+
+class RespuestaConsulta(BaseModel):
+    """
+    Respuesta de la API a una consulta.
+    """
+    user_name: str
+    answer: str
@@ -0,0 +1,263 @@
+"""
+Módulo de paquetes de índices precalculados.
+
+Un paquete es una copia de los directorios de persistencia de cada origen (base Chroma con los
+vectores y metadatos de los fragmentos, manifiesto de ingesta, índices BM25 y matrices de
+embeddings) más un descriptor `paquete.json` con:
+- formato y versión del paquete (hash de su contenido);
+- identificador del modelo de embeddings y parámetros de indexado con que se construyó;
+- hash SHA-256 de cada documento fuente indexado, por origen;
+- suma de verificación SHA-256 de cada archivo del paquete.
+
+Se construye una vez, al construir la imagen Docker:
+    python -m app.paquete_indices construir --destino paquete_indices
+
+Al arrancar, inicializar_documentos instala el paquete de RUTA_PAQUETE_INDICES en los orígenes
+cuyo directorio de persistencia está vacío (contenedor nuevo): verifica las sumas, el modelo y
+los parámetros, y copia los archivos a `chroma_db/`. El paquete solo se lee, por lo que puede
+montarse en solo lectura. Los documentos fuente que no coinciden con los del paquete (nuevos,
+modificados o eliminados) se informan como desactualizados y la ingesta incremental re-indexa
+solo esos; el resto no vuelve a calcular embeddings.
+
+    python -m app.paquete_indices verificar --paquete paquete_indices
+
+Dependencias:
+- shutil: Copia de los directorios de persistencia.
+- app.manifiesto (ManifiestoIngesta, hash_archivo): Documentos indexados y sumas SHA-256.
+- app.enrutador (enrutador): Shards de cada origen.
+- app.inicializar_db (ORIGENES): Directorios de documentos y de persistencia de cada origen.
+- app.proveedores (identificador_embeddings): Modelo de embeddings con que se construyó.
+- app.metricas (metricas): Span de la instalación del paquete.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+from datetime import datetime, timezone
+from app.config import configurar_logging, load_env_vars, obtener_parametro
+from app.enrutador import enrutador
+from app.inicializar_db import ORIGENES
+from app.manifiesto import ManifiestoIngesta, hash_archivo
+from app.metricas import metricas
+from app.proveedores import identificador_embeddings
+from app.registro import MODELO_EMBEDDINGS
+
+RUTA_PAQUETE_INDICES = obtener_parametro("RUTA_PAQUETE_INDICES", "paquete_indices")
+FORMATO_PAQUETE = 1
+NOMBRE_DESCRIPTOR = "paquete.json"
+
+logger = logging.getLogger(__name__)
+
+
+class PaqueteInvalido(RuntimeError):
+    """
+    El paquete no existe, está dañado o se construyó con otro modelo, parámetros o shards.
+    """
+
+
+def _origen(persist_directory):
+    return os.path.basename(os.path.normpath(persist_directory))
+
+
+def _archivos(directorio):
+    rutas = []
+    for raiz, _, nombres in os.walk(directorio):
+        for nombre in nombres:
+            rutas.append(os.path.relpath(os.path.join(raiz, nombre), directorio).replace(os.sep, "/"))
+    return sorted(rutas)
+
+
+def _documentos_indexados(persist_directory):
+    documentos = {}
+    for ruta in enrutador.shards(persist_directory):
+        for nombre, entrada in ManifiestoIngesta(ruta).archivos.items():
+            documentos[nombre] = entrada["hash"]
+    return documentos
+
+
+def _documentos_fuente(directorio):
+    if not os.path.isdir(directorio):
+        return {}
+    return {
+        nombre: hash_archivo(os.path.join(directorio, nombre))
+        for nombre in sorted(os.listdir(directorio)) if nombre.endswith((".docx", ".pdf"))
+    }
+
+
+def construir_paquete(destino=RUTA_PAQUETE_INDICES, origenes=ORIGENES):
+    """
+    Indexa los documentos de cada origen y guarda sus directorios de persistencia como paquete.
+
+    El paquete se escribe en un directorio temporal y reemplaza al anterior solo al terminar.
+
+    Parameters:
+        destino (str): Directorio del paquete.
+        origenes (list): Tuplas (directorio de documentos, directorio de persistencia).
+
+    Returns:
+        dict: Descriptor del paquete.
+    """
+    # Importación diferida: el pipeline de ingesta arrastra Chroma y los loaders de Langchain
+    from app.cargar_en_chroma_db import indexar_documentos, parametros_indexado
+
+    temporal = os.path.normpath(destino) + ".tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+    descriptor = {
+        "formato": FORMATO_PAQUETE,
+        "modelo_embeddings": identificador_embeddings(MODELO_EMBEDDINGS),
+        "parametros": parametros_indexado(),
+        "origenes": {},
+        "shards": {},
+    }
+    for directorio, persist_directory in origenes:
+        indexar_documentos(directorio, persist_directory, flag_nuevo=False)
+        origen = _origen(persist_directory)
+        shutil.copytree(persist_directory, os.path.join(temporal, origen), ignore=shutil.ignore_patterns(".gitignore", "*.tmp", "*.lock"))
+        descriptor["origenes"][origen] = _documentos_indexados(persist_directory)
+        descriptor["shards"][origen] = len(enrutador.shards(persist_directory))
+
+    descriptor["archivos"] = {relativa: hash_archivo(os.path.join(temporal, relativa)) for relativa in _archivos(temporal)}
+    contenido = json.dumps([descriptor["modelo_embeddings"], descriptor["archivos"]], sort_keys=True)
+    descriptor["version"] = hashlib.sha256(contenido.encode("utf-8")).hexdigest()[:16]
+    descriptor["creado"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    with open(os.path.join(temporal, NOMBRE_DESCRIPTOR), "w", encoding="utf-8") as f:
+        json.dump(descriptor, f, ensure_ascii=False, indent=1)
+
+    shutil.rmtree(destino, ignore_errors=True)
+    os.replace(temporal, destino)
+    logger.info("Paquete de índices %s construido en %s (%d archivos).", descriptor["version"], destino, len(descriptor["archivos"]))
+    return descriptor
+
+
+def verificar_paquete(ruta=RUTA_PAQUETE_INDICES, origenes=ORIGENES):
+    """
+    Verifica la integridad de un paquete y lo compara con los documentos fuente actuales.
+
+    Parameters:
+        ruta (str): Directorio del paquete.
+        origenes (list): Tuplas (directorio de documentos, directorio de persistencia).
+
+    Returns:
+        tuple: (descriptor, desactualizados), donde desactualizados es un dict origen -> lista
+            de documentos nuevos, modificados o eliminados respecto del paquete.
+
+    Raises:
+        PaqueteInvalido: Si falta el descriptor o algún archivo, si una suma de verificación no
+            coincide, o si el formato, el modelo de embeddings, los parámetros de indexado o el
+            número de shards difieren de los actuales.
+    """
+    from app.cargar_en_chroma_db import parametros_indexado
+
+    ruta_descriptor = os.path.join(ruta, NOMBRE_DESCRIPTOR)
+    if not os.path.exists(ruta_descriptor):
+        raise PaqueteInvalido(f"No hay un paquete de índices en '{ruta}'.")
+    with open(ruta_descriptor, encoding="utf-8") as f:
+        descriptor = json.load(f)
+
+    if descriptor.get("formato") != FORMATO_PAQUETE:
+        raise PaqueteInvalido(f"Formato de paquete {descriptor.get('formato')} no soportado (se esperaba {FORMATO_PAQUETE}).")
+    modelo = identificador_embeddings(MODELO_EMBEDDINGS)
+    if descriptor["modelo_embeddings"] != modelo:
+        raise PaqueteInvalido(f"El paquete se construyó con el modelo {descriptor['modelo_embeddings']} y se usa {modelo}.")
+    if descriptor["parametros"] != parametros_indexado():
+        raise PaqueteInvalido("El paquete se construyó con otros parámetros de indexado.")
+    for _, persist_directory in origenes:
+        origen = _origen(persist_directory)
+        if origen in descriptor["origenes"] and descriptor["shards"][origen] != len(enrutador.shards(persist_directory)):
+            raise PaqueteInvalido(f"El origen {origen} del paquete tiene {descriptor['shards'][origen]} shards.")
+
+    for relativa, esperado in descriptor["archivos"].items():
+        completa = os.path.join(ruta, relativa)
+        if not os.path.exists(completa) or hash_archivo(completa) != esperado:
+            raise PaqueteInvalido(f"Suma de verificación incorrecta o archivo faltante: {relativa}")
+
+    desactualizados = {}
+    for directorio, persist_directory in origenes:
+        indexados = descriptor["origenes"].get(_origen(persist_directory), {})
+        actuales = _documentos_fuente(directorio)
+        distintos = sorted(nombre for nombre in set(indexados) | set(actuales) if indexados.get(nombre) != actuales.get(nombre))
+        if distintos:
+            desactualizados[_origen(persist_directory)] = distintos
+    return descriptor, desactualizados
+
+
+def instalar_paquete(ruta=RUTA_PAQUETE_INDICES, origenes=ORIGENES):
+    """
+    Copia el paquete en los orígenes cuyo directorio de persistencia aún no tiene manifiesto.
+
+    Parameters:
+        ruta (str): Directorio del paquete. Si no existe, no se hace nada.
+        origenes (list): Tuplas (directorio de documentos, directorio de persistencia).
+
+    Returns:
+        list: Orígenes instalados desde el paquete.
+
+    Raises:
+        PaqueteInvalido: Si el paquete no supera la verificación (ver verificar_paquete).
+    """
+    if not os.path.exists(os.path.join(ruta, NOMBRE_DESCRIPTOR)):
+        return []
+    vacios = [
+        (directorio, persist_directory) for directorio, persist_directory in origenes
+        if not any(ManifiestoIngesta(shard).existe for shard in enrutador.shards(persist_directory))
+    ]
+    if not vacios:
+        return []
+
+    with metricas.span("paquete_indices", ruta=ruta) as span:
+        descriptor, desactualizados = verificar_paquete(ruta, origenes)
+        instalados = []
+        for _, persist_directory in vacios:
+            origen = _origen(persist_directory)
+            if origen not in descriptor["origenes"]:
+                continue
+            # copyfile no copia los permisos: el paquete puede estar montado en solo lectura
+            shutil.copytree(os.path.join(ruta, origen), persist_directory, copy_function=shutil.copyfile, dirs_exist_ok=True)
+            instalados.append(origen)
+        span["version"], span["instalados"] = descriptor["version"], len(instalados)
+    enrutador.construir()
+
+    logger.info("Paquete de índices %s instalado en: %s", descriptor["version"], ", ".join(instalados) or "ningún origen")
+    for origen, documentos in desactualizados.items():
+        if origen in instalados:
+            logger.warning("Paquete desactualizado en %s; se re-indexarán: %s", origen, ", ".join(documentos))
+    return instalados
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Construye o verifica el paquete de índices precalculados.")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    construir = comandos.add_parser("construir", help="Indexa documents/ y guarda el paquete")
+    construir.add_argument("--destino", default=RUTA_PAQUETE_INDICES)
+    verificar = comandos.add_parser("verificar", help="Verifica sumas, modelo y documentos fuente")
+    verificar.add_argument("--paquete", default=RUTA_PAQUETE_INDICES)
+    args = parser.parse_args(argumentos)
+    configurar_logging()
+    load_env_vars()
+
+    if args.comando == "construir":
+        descriptor = construir_paquete(args.destino)
+        print(f"Paquete {descriptor['version']} ({descriptor['modelo_embeddings']}): "
+              f"{sum(len(documentos) for documentos in descriptor['origenes'].values())} documentos, "
+              f"{len(descriptor['archivos'])} archivos en {args.destino}")
+        return
+
+    try:
+        descriptor, desactualizados = verificar_paquete(args.paquete)
+    except PaqueteInvalido as e:
+        print(f"Paquete inválido: {e}", file=sys.stderr)
+        sys.exit(2)
+    print(f"Paquete {descriptor['version']} ({descriptor['modelo_embeddings']}, {descriptor['creado']}): sumas correctas")
+    for origen, documentos in desactualizados.items():
+        print(f"Desactualizado en {origen}: {', '.join(documentos)}", file=sys.stderr)
+    if desactualizados:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
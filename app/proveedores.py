@@ -0,0 +1,175 @@
+"""
+Módulo de selección del proveedor de modelos (chat y embeddings).
+
+Con PROVEEDOR_MODELOS=cohere (por defecto) se usan ChatCohere y CohereEmbeddings; con
+PROVEEDOR_MODELOS=simulado, los modelos locales deterministas de `app.modelos_simulados`, que
+no requieren claves ni red y tienen latencias configurables. El cliente de Cohere solo se
+importa si se usa.
+
+Los parámetros de generación se aplican por llamada con `con_temperatura`, que devuelve una copia
+liviana del modelo (comparte el cliente HTTP) en lugar de modificar el modelo compartido por
+todas las sesiones. Del mismo modo, `con_plazo` fija el timeout HTTP de una llamada al plazo
+restante de su etapa, para que una llamada abandonada por el ClienteLLM no siga ocupando un
+hilo y una conexión hasta el timeout por defecto de Cohere.
+
+Los modelos de Cohere del proceso (chat, respaldo y embeddings) comparten un único pool de
+conexiones HTTP con keep-alive (cliente_http), de modo que las llamadas consecutivas reutilizan
+las conexiones TLS abiertas en lugar de abrir una por cliente.
+
+Dependencias:
+- langchain_cohere (ChatCohere, CohereEmbeddings): Modelos de Cohere.
+- httpx: Pool de conexiones compartido por los clientes de Cohere.
+- app.modelos_simulados (LLMSimulado, EmbeddingsSimulados): Modelos locales.
+- app.config (obtener_parametro): Proveedor, latencias de los modelos simulados y pool HTTP.
+"""
+
+import threading
+from app.config import obtener_parametro
+
+MODELO_CHAT = "command-r-plus-04-2024"  # Modelo más optimizado para RAG según documentación y testeos
+PROVEEDORES = ("cohere", "simulado")
+MAX_CONEXIONES_HTTP = obtener_parametro("MAX_CONEXIONES_HTTP", 64, int)
+KEEPALIVE_HTTP = obtener_parametro("KEEPALIVE_HTTP", 60.0, float)  # Segundos que una conexión ociosa sigue abierta
+
+_cliente_http = None
+_lock_cliente_http = threading.Lock()
+
+
+def proveedor_modelos():
+    """
+    Devuelve el proveedor configurado en PROVEEDOR_MODELOS.
+
+    Returns:
+        str: 'cohere' o 'simulado'.
+
+    Raises:
+        ValueError: Si el proveedor no es uno de los soportados.
+    """
+    proveedor = obtener_parametro("PROVEEDOR_MODELOS", "cohere").strip().lower()
+    if proveedor not in PROVEEDORES:
+        raise ValueError(f"PROVEEDOR_MODELOS debe ser uno de {PROVEEDORES}, no '{proveedor}'")
+    return proveedor
+
+
+def crear_llm(modelo=MODELO_CHAT, temperature=0):
+    """
+    Crea el modelo de chat del proveedor configurado.
+
+    Parameters:
+        modelo (str): Modelo de chat de Cohere (ignorado por el simulado).
+        temperature (float): Temperatura inicial.
+
+    Returns:
+        ChatCohere | LLMSimulado: Modelo con los métodos invoke y stream.
+    """
+    if proveedor_modelos() == "simulado":
+        from app.modelos_simulados import LLMSimulado
+        return LLMSimulado(latencia=obtener_parametro("LATENCIA_LLM_SIMULADO", 0.3, float))
+    from langchain_cohere import ChatCohere
+    llm = ChatCohere(model=modelo, temperature=temperature)
+    return _conectar(llm, llm.timeout_seconds)
+
+
+def cliente_http():
+    """
+    Devuelve el cliente HTTP del proceso, compartido por todos los clientes de Cohere.
+
+    Returns:
+        httpx.Client: Cliente con hasta MAX_CONEXIONES_HTTP conexiones que se mantienen abiertas
+            KEEPALIVE_HTTP segundos sin uso.
+    """
+    global _cliente_http
+    with _lock_cliente_http:
+        if _cliente_http is None:
+            import httpx
+            limites = httpx.Limits(max_connections=MAX_CONEXIONES_HTTP, max_keepalive_connections=MAX_CONEXIONES_HTTP,
+                                   keepalive_expiry=KEEPALIVE_HTTP)
+            _cliente_http = httpx.Client(limits=limites, follow_redirects=True)
+        return _cliente_http
+
+
+def _conectar(modelo, timeout):
+    # Langchain crea un cliente de Cohere (con su propio pool) por modelo; se reemplaza por uno
+    # que usa el pool compartido
+    import cohere
+    modelo.client = cohere.Client(
+        modelo.cohere_api_key.get_secret_value(), timeout=timeout, client_name=modelo.user_agent,
+        base_url=modelo.base_url, httpx_client=cliente_http()
+    )
+    return modelo
+
+
+def identificador_embeddings(modelo):
+    """
+    Devuelve el identificador de un modelo de embeddings en el proveedor configurado, con el
+    que se etiquetan los vectores guardados (caché de embeddings y paquetes de índices).
+
+    Parameters:
+        modelo (str): Modelo de embeddings de Cohere.
+
+    Returns:
+        str: El nombre del modelo, o 'simulado-<modelo>' con el proveedor simulado.
+    """
+    return f"simulado-{modelo}" if proveedor_modelos() == "simulado" else modelo
+
+
+def crear_embeddings(modelo):
+    """
+    Crea el modelo de embeddings del proveedor configurado.
+
+    Parameters:
+        modelo (str): Modelo de embeddings de Cohere.
+
+    Returns:
+        tuple: (modelo de embeddings, identificador para la caché de embeddings). Los vectores
+            simulados se guardan bajo otro identificador para no mezclarse con los de Cohere.
+    """
+    if proveedor_modelos() == "simulado":
+        from app.modelos_simulados import EmbeddingsSimulados
+        embeddings = EmbeddingsSimulados(
+            dimension=obtener_parametro("DIMENSION_EMBEDDINGS_SIMULADOS", 768, int),
+            latencia=obtener_parametro("LATENCIA_EMBEDDINGS_SIMULADOS", 0.0, float)
+        )
+        return embeddings, identificador_embeddings(modelo)
+    from langchain_cohere import CohereEmbeddings
+    embeddings = CohereEmbeddings(model=modelo)
+    return _conectar(embeddings, embeddings.request_timeout), identificador_embeddings(modelo)
+
+
+def con_temperatura(llm, temperature):
+    """
+    Devuelve el modelo de chat con la temperatura indicada, sin modificar el compartido.
+
+    ChatCohere no admite la temperatura como argumento de invoke/stream (ya la envía desde sus
+    parámetros por defecto), así que se crea una copia superficial que comparte el cliente; con
+    la temperatura del modelo base se devuelve el mismo objeto.
+
+    Parameters:
+        llm (ChatCohere | LLMSimulado): Modelo compartido.
+        temperature (float): Temperatura de esta llamada.
+
+    Returns:
+        ChatCohere | LLMSimulado: Modelo a usar en la llamada.
+    """
+    if llm.temperature == temperature:
+        return llm
+    return llm.model_copy(update={"temperature": temperature})
+
+
+def con_plazo(llm, timeout):
+    """
+    Devuelve el modelo de chat con el timeout HTTP indicado, sin modificar el compartido.
+
+    La copia tiene su propio cliente de Cohere sobre el pool HTTP compartido (cliente_http).
+    Los modelos simulados se devuelven sin cambios.
+
+    Parameters:
+        llm (ChatCohere | LLMSimulado): Modelo compartido.
+        timeout (float): Segundos que puede esperar la llamada (el plazo restante de su etapa).
+
+    Returns:
+        ChatCohere | LLMSimulado: Modelo a usar en la llamada.
+    """
+    if getattr(llm, "cohere_api_key", None) is None:
+        return llm
+    return _conectar(llm.model_copy(), max(0.1, timeout))
@@ -0,0 +1,118 @@
+"""
+Módulo de registro de vector stores y modelos de embeddings compartidos por el proceso.
+
+La ingesta y la recuperación obtienen sus clientes desde aquí, de modo que existe un único
+cliente Chroma por colección y un único modelo de embeddings por modelo. Así se evita abrir
+varias conexiones a la misma base SQLite (con vistas potencialmente desactualizadas) y se
+ahorra tiempo de arranque y memoria.
+
+Funcionalidades principales:
+- Creación perezosa y segura entre hilos de clientes Chroma y modelos de embeddings.
+- Un bloqueo de escritura por colección para serializar las ingestas concurrentes, también
+  entre procesos (workers de la API o la interfaz sobre el mismo `chroma_db/`).
+
+Dependencias:
+- langchain_chroma (Chroma): Base de vectores.
+- app.cache_embeddings (crear_embeddings_cacheados): Embeddings con caché persistente.
+- app.bloqueos (BloqueoEntreProcesos): Bloqueo de escritura entre hilos y procesos.
+"""
+
+import os
+import threading
+from app.bloqueos import BloqueoEntreProcesos
+from app.cache_embeddings import crear_embeddings_cacheados
+
+MODELO_EMBEDDINGS = "embed-multilingual-v2.0"
+NOMBRE_COLECCION = "documentos"
+
+
+class RegistroVectores:
+    """
+    Registro de clientes Chroma (uno por colección) y modelos de embeddings (uno por modelo).
+
+    Parameters:
+        fabrica_embeddings (callable): Función que recibe el nombre del modelo y crea el
+            modelo de embeddings. Por defecto, Cohere con caché persistente.
+    """
+
+    def __init__(self, fabrica_embeddings=crear_embeddings_cacheados):
+        self.fabrica_embeddings = fabrica_embeddings
+        self._embeddings = {}
+        self._stores = {}
+        self._bloqueos_escritura = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _clave(persist_directory, collection_name):
+        return (os.path.abspath(persist_directory), collection_name)
+
+    def embeddings(self, modelo=MODELO_EMBEDDINGS):
+        """
+        Devuelve el modelo de embeddings compartido para un modelo dado.
+
+        Parameters:
+            modelo (str): Nombre del modelo de embeddings.
+
+        Returns:
+            Embeddings: Instancia única por modelo.
+        """
+        with self._lock:
+            if modelo not in self._embeddings:
+                self._embeddings[modelo] = self.fabrica_embeddings(modelo)
+            return self._embeddings[modelo]
+
+    def store(self, persist_directory, collection_name=NOMBRE_COLECCION, modelo=MODELO_EMBEDDINGS):
+        """
+        Devuelve el cliente Chroma compartido de una colección, creándolo si no existe.
+
+        Parameters:
+            persist_directory (str): Directorio de persistencia de la base.
+            collection_name (str): Nombre de la colección.
+            modelo (str): Modelo de embeddings usado por la colección.
+
+        Returns:
+            Chroma: Cliente único por colección.
+        """
+        clave = self._clave(persist_directory, collection_name)
+        with self._lock:
+            if clave not in self._stores:
+                from langchain_chroma import Chroma  # Importación diferida: solo al abrir la primera colección
+                self._stores[clave] = Chroma(
+                    collection_name=collection_name,
+                    embedding_function=self.embeddings(modelo),
+                    persist_directory=persist_directory
+                )
+            return self._stores[clave]
+
+    def bloqueo_escritura(self, persist_directory, collection_name=NOMBRE_COLECCION):
+        """
+        Devuelve el bloqueo que serializa las escrituras sobre una colección.
+
+        Parameters:
+            persist_directory (str): Directorio de persistencia de la base.
+            collection_name (str): Nombre de la colección.
+
+        Returns:
+            BloqueoEntreProcesos: Bloqueo reentrante de la colección, con un archivo de bloqueo
+                en el directorio de persistencia.
+        """
+        clave = self._clave(persist_directory, collection_name)
+        with self._lock:
+            if clave not in self._bloqueos_escritura:
+                ruta = os.path.join(persist_directory, f".escritura_{collection_name}.lock")
+                self._bloqueos_escritura[clave] = BloqueoEntreProcesos(ruta)
+            return self._bloqueos_escritura[clave]
+
+    def stores_abiertos(self):
+        """
+        Lista las colecciones con cliente abierto.
+
+        Returns:
+            list: Tuplas (directorio absoluto, colección).
+        """
+        with self._lock:
+            return list(self._stores)
+
+
+# Registro único del proceso
+registro = RegistroVectores()
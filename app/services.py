@@ -2,73 +2,108 @@
 Módulo de procesamiento de consultas mediante recuperación de contexto y generación de respuestas.
 
 Este módulo realiza las siguientes operaciones:
-1. Recupera documentos relacionados con la consulta del usuario desde un vector store utilizando Chroma.
-2. Detecta el idioma de la consulta mediante un modelo de lenguaje.
-3. Genera una respuesta basada en los fragmentos de contexto recuperados.
-4. Traduce la respuesta generada al idioma detectado o especificado.
+1. Sirve desde caché las preguntas repetidas o casi idénticas (solo con temperatura 0).
+2. Recupera documentos relacionados con la consulta del usuario combinando la búsqueda vectorial
+   en Chroma con la búsqueda léxica BM25 (Reciprocal Rank Fusion), elige k fragmentos
+   distintos entre los candidatos con MMR y ensambla el contexto fusionando los fragmentos
+   solapados dentro de un presupuesto de tokens.
+3. Detecta el idioma de la consulta localmente, recurriendo al modelo de lenguaje solo si hay dudas.
+4. Genera una respuesta basada en los fragmentos de contexto recuperados.
+5. Traduce la respuesta generada al idioma detectado o especificado.
 
 Dependencias:
-- langchain_chroma (Chroma): Para búsqueda de similitud en documentos.
-- langchain_cohere (ChatCohere): Para generación de texto y tareas de procesamiento del lenguaje.
+- app.proveedores (crear_llm): Modelo de chat (Cohere o simulado) para generación, traducción y
+  detección, y modelo de respaldo opcional para la generación (MODELO_RESPALDO_LLM).
+- app.cliente_llm (ClienteLLM): Plazo por etapa, reintentos, cobertura y circuito de cada llamada
+  al modelo; la temperatura se fija por llamada sin modificar el modelo compartido.
+- app.admision (admision): Límite de consultas concurrentes con cola de espera acotada.
+- app.idioma: Detectores de idioma local y basado en LLM.
+- app.cache_respuestas: Caché de respuestas exactas y semánticas por documento.
+- app.registro: Clientes Chroma y embeddings compartidos con la ingesta.
+- app.enrutador: Índice documento -> colección/shard para resolver el store en O(1).
+- app.bm25: Índices BM25 por documento y fusión RRF para la recuperación híbrida.
+- app.indice_matricial: Backend opcional de búsqueda vectorial en memoria por documento.
+- app.duplicados (seleccionar_mmr): Selección diversa (MMR) de los fragmentos recuperados.
+- app.contexto (ensamblar_contexto): Fusión de fragmentos vecinos y recorte al presupuesto de tokens.
+- app.metricas: Spans por etapa (recuperación, embeddings, idioma, generación, traducción),
+  tokens y resultados de la caché; también el tiempo hasta el primer token.
 - app.models (SolicitudConsulta): Modelo Pydantic que define la estructura de la consulta.
 
 Funciones principales:
+- consultar_cache(): Busca una respuesta previa para la misma pregunta o una casi idéntica.
 - retrieve(): Recupera documentos relevantes basados en la consulta.
+- retrieve_lote(): Recupera el contexto de varias preguntas con búsquedas por lotes.
 - detectar_idioma(): Detecta el idioma de la consulta del usuario.
 - generar_respuesta(): Genera una respuesta utilizando el contexto recuperado.
 - traducir_respuesta(): Traduce la respuesta generada al idioma especificado.
 - procesar_consulta(): Orquesta todo el flujo: recuperación, generación y traducción.
+- aprocesar_consulta(): Versión asíncrona que solapa la recuperación con la detección de idioma.
+- procesar_consulta_stream(): Versión en streaming que entrega la respuesta token a token.
 """
-import os
-from langchain_chroma import Chroma
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.documents import Document
 from app.models import SolicitudConsulta
-from langchain_cohere import ChatCohere
-from app.config import load_env_vars
+from app.proveedores import crear_llm
+from app.cliente_llm import MODELO_RESPALDO_LLM, ClienteLLM, LLMNoDisponible
+from app.config import load_env_vars, obtener_parametro
+from app.idioma import DetectorConRespaldo, DetectorLLM, DetectorPerfiles
+from app.cache_respuestas import cache_respuestas
 #from langchain_ollama import ChatOllama
-from langchain_cohere import CohereEmbeddings
+from app.registro import registro
+from app.enrutador import enrutador
+from app.bm25 import (
+    K_CANDIDATOS, K_RRF, PESO_BM25, PESO_VECTORIAL, RECUPERACION_HIBRIDA, almacen_bm25, fusionar_rrf
+)
+from app.indice_matricial import BACKEND_RECUPERACION, almacen_matrices
+from app.duplicados import seleccionar_mmr
+from app.contexto import ensamblar_contexto
+from app.metricas import metricas
+from app.admision import admision
 
 load_env_vars()
 
-# Inicialización del modelo Cohere
-llm = ChatCohere(model="command-r-plus-04-2024", temperature=0) # Modelo más optimizado para RAG según documentación y testeos
-#llm = ChatOllama(model="llama3.2", temperature=0)
+logger = logging.getLogger(__name__)
 
-chroma_preprocessed = Chroma(
-    collection_name="documentos",
-    embedding_function=CohereEmbeddings(model="embed-multilingual-v2.0"), 
-    persist_directory="chroma_db/preprocessed"
-)
-
-chroma_uploaded = Chroma(
-    collection_name="documentos",
-    embedding_function=CohereEmbeddings(model="embed-multilingual-v2.0"), 
-    persist_directory="chroma_db/uploaded"
+# Inicialización del modelo de chat (Cohere, o el simulado con PROVEEDOR_MODELOS=simulado).
+# Es compartido por todas las sesiones: nunca se modifica, la temperatura va en cada llamada
+llm = crear_llm(temperature=0)
+#llm = ChatOllama(model="llama3.2", temperature=0)
+llm_respaldo = crear_llm(MODELO_RESPALDO_LLM, temperature=0) if MODELO_RESPALDO_LLM else None
+
+# Todas las llamadas pasan por el cliente resiliente; los modelos se resuelven en cada llamada
+cliente_llm = ClienteLLM(lambda: llm, respaldo=(lambda: llm_respaldo) if llm_respaldo else None)
+
+# Estadísticas de las cachés expuestas en /metrics
+metricas.registrar_colector("cache_respuestas", cache_respuestas.estadisticas)
+metricas.registrar_colector("cache_embeddings", lambda: registro.embeddings().estadisticas())
+metricas.registrar_colector("admision", admision.estadisticas)
+metricas.registrar_colector("llm", cliente_llm.estadisticas)
+
+# Detector de idioma local; el LLM solo se consulta si la confianza queda bajo el umbral
+detector_idioma = DetectorConRespaldo(
+    principal=DetectorPerfiles(),
+    respaldo=DetectorLLM(lambda prompt: cliente_llm.invocar(prompt, "deteccion_idioma")),
+    umbral=obtener_parametro("UMBRAL_CONFIANZA_IDIOMA", 0.6, float)
 )
 
 def obtener_origen_documento(doc_seleccionado):
     """
-    Determina el origen del documento (preprocesado o cargado) basado en su ubicación.
+    Determina el directorio de persistencia (colección o shard) donde está indexado el documento,
+    consultando el índice de enrutamiento en memoria.
     
     Parameters:
         doc_seleccionado (str): Nombre del documento seleccionado.
 
     Returns:
-        str: El origen del documento ('preprocessed' o 'uploaded').
+        str: Directorio de persistencia de la colección que contiene el documento.
 
     Raises:
-        FileNotFoundError: Si el documento no se encuentra en las carpetas predefinidas.
+        FileNotFoundError: Si el documento no está indexado en ninguna colección.
     """
-    preprocessed_dir = "documents/preprocessed/"
-    uploaded_dir = "documents/uploaded/"
-
-    if os.path.exists(os.path.join(preprocessed_dir, doc_seleccionado)):
-        #print("Encontré el archivo en preprocesados")
-        return "preprocessed"
-    elif os.path.exists(os.path.join(uploaded_dir, doc_seleccionado)):
-        #print("Encontré el archivo en uploaded")
-        return "uploaded"
-    else:
-        raise FileNotFoundError(f"El documento {doc_seleccionado} no se encuentra en las carpetas predefinidas.")
+    return enrutador.resolver(doc_seleccionado)
 
 def preprocess_docs(docs):
     """
@@ -88,84 +123,309 @@ def preprocess_docs(docs):
             seen.add(doc.page_content)
     return unique_docs
 
-def retrieve(state: SolicitudConsulta, doc_seleccionado:str):
+def obtener_chroma(doc_seleccionado):
     """
-    Recupera documentos relacionados con la consulta del usuario desde el vector store.
+    Devuelve el vector store donde está indexado el documento seleccionado.
 
     Parameters:
-        state (SolicitudConsulta): Contiene la pregunta y el nombre del usuario.
         doc_seleccionado (str): Nombre del documento seleccionado.
 
     Returns:
-        dict: Contexto con los fragmentos de documentos relevantes.
-    """
-    origen = obtener_origen_documento(doc_seleccionado) 
-    if origen == "preprocessed":
-        chroma_local = chroma_preprocessed
-    elif origen == "uploaded": 
-        chroma_local = chroma_uploaded
-    else: raise ValueError("Documento seleccionado no tiene un origen válido.")
-    retrieved_docs = chroma_local.similarity_search(query=state.question, k=3, filter={"document": doc_seleccionado})
-    filtered_docs = preprocess_docs(retrieved_docs)
-    print(filtered_docs)
-    return {"context": [doc.page_content for doc in filtered_docs]}
+        Chroma: Vector store correspondiente al origen del documento.
+    """
+    return registro.store(obtener_origen_documento(doc_seleccionado))
+
+def _filtro_documentos(documentos):
+    if len(documentos) == 1:
+        return {"document": documentos[0]}
+    return {"document": {"$in": documentos}}
+
+def _buscar_vectorial_lote(persist_directory, documentos, embeddings, k):
+    """
+    Búsqueda vectorial en una colección para varias consultas en una sola llamada. Consulta la
+    colección de Chroma directamente para conservar los IDs de los fragmentos, necesarios para
+    la fusión con BM25.
+
+    Returns:
+        list: Por cada consulta, tuplas (Document, distancia) de menor a mayor distancia.
+    """
+    resultado = registro.store(persist_directory)._collection.query(
+        query_embeddings=list(embeddings), n_results=k, where=_filtro_documentos(documentos),
+        include=["documents", "metadatas", "distances"]
+    )
+    return [
+        [
+            (Document(id=chunk_id, page_content=texto, metadata=metadatos or {}), distancia)
+            for chunk_id, texto, metadatos, distancia in zip(ids, textos, lista_metadatos, distancias)
+        ]
+        for ids, textos, lista_metadatos, distancias in zip(
+            resultado["ids"], resultado["documents"], resultado["metadatas"], resultado["distances"]
+        )
+    ]
+
+def _buscar_vectorial(persist_directory, documentos, embedding, k):
+    return _buscar_vectorial_lote(persist_directory, documentos, [embedding], k)[0]
+
+def _indice_bm25(persist_directory, documento):
+    indice = almacen_bm25.obtener(persist_directory, documento)
+    if indice is None:
+        # Documentos indexados antes de la recuperación híbrida: el índice se construye una sola vez
+        datos = registro.store(persist_directory)._collection.get(
+            where={"document": documento}, include=["documents", "metadatas"]
+        )
+        indice = almacen_bm25.construir(persist_directory, documento, datos["ids"], datos["documents"], datos["metadatas"])
+    return indice
+
+def _indice_matricial(persist_directory, documento):
+    indice = almacen_matrices.obtener(persist_directory, documento)
+    if indice is None:
+        # Documentos indexados antes del backend matricial: la matriz se construye una sola vez
+        datos = registro.store(persist_directory)._collection.get(where={"document": documento}, include=["embeddings"])
+        indice = almacen_matrices.construir(persist_directory, documento, datos["ids"], datos["embeddings"])
+    return indice
+
+def _buscar_matricial_lote(persist_directory, documentos, embeddings, k):
+    """
+    Búsqueda vectorial con el backend matricial: un producto matriz-matriz por documento para
+    todas las consultas, sin pasar por Chroma. El contenido de los fragmentos se lee del índice
+    BM25 del documento.
 
-def detectar_idioma(state: SolicitudConsulta):
+    Returns:
+        list: Por cada consulta, tuplas (Document, distancia) de menor a mayor distancia.
+    """
+    por_consulta = [[] for _ in embeddings]
+    for documento in documentos:
+        fragmentos = _indice_bm25(persist_directory, documento)
+        resultados = _indice_matricial(persist_directory, documento).buscar_lote(embeddings, k)
+        for candidatos, resultado in zip(por_consulta, resultados):
+            for chunk_id, distancia in resultado:
+                texto, metadatos = fragmentos.fragmento(chunk_id)
+                candidatos.append((Document(id=chunk_id, page_content=texto, metadata=metadatos), distancia))
+    for candidatos in por_consulta:
+        candidatos.sort(key=lambda par: par[1])
+    return [candidatos[:k] for candidatos in por_consulta]
+
+def _buscar_matricial(persist_directory, documentos, embedding, k):
+    return _buscar_matricial_lote(persist_directory, documentos, [embedding], k)[0]
+
+def _buscar_bm25(grupos, pregunta, k):
     """
-    Detecta el idioma de la consulta utilizando un modelo de lenguaje.
+    Búsqueda léxica BM25 sobre los documentos de cada colección.
+
+    Returns:
+        list: Documentos ordenados de mayor a menor puntaje BM25.
+    """
+    candidatos = []
+    for persist_directory, documentos in grupos.items():
+        for documento in documentos:
+            for chunk_id, texto, metadatos, puntaje in _indice_bm25(persist_directory, documento).buscar(pregunta, k):
+                candidatos.append((Document(id=chunk_id, page_content=texto, metadata=metadatos), puntaje))
+    candidatos.sort(key=lambda par: par[1], reverse=True)
+    return [doc for doc, _ in candidatos[:k]]
+
+def embeber_preguntas(preguntas: list):
+    """
+    Calcula los embeddings de varias preguntas con una sola llamada al modelo, si lo admite.
 
     Parameters:
-        state (SolicitudConsulta): Contiene la pregunta del usuario.
+        preguntas (list): Textos de las preguntas.
 
     Returns:
-        str: Código del idioma detectado (por ejemplo, 'es' para español).
+        list: Un embedding por pregunta.
     """
-    # Incluir ejemplos para el modelo de detección de idioma
-    few_shot_examples = """
-    Ejemplo 1:
-    Pregunta: ¿Cómo estás?
-    Respuesta: es
+    embeddings = registro.embeddings()
+    with metricas.span("embedding", preguntas=len(preguntas)):
+        if hasattr(embeddings, "embed_queries"):
+            return embeddings.embed_queries(preguntas)
+        return [embeddings.embed_query(pregunta) for pregunta in preguntas]
+
+def _recuperar(preguntas, doc_seleccionado, embeddings, k, hibrida, backend):
+    documentos = [doc_seleccionado] if isinstance(doc_seleccionado, str) else list(doc_seleccionado)
+    grupos = enrutador.agrupar(documentos)
+    if embeddings is None:
+        embeddings = embeber_preguntas(preguntas)
+
+    # Se piden candidatos de más para que queden k fragmentos distintos tras descartar duplicados
+    # y casi duplicados (MMR)
+    candidatos_k = max(2 * k, K_CANDIDATOS) if hibrida else 3 * k
+    buscar = _buscar_matricial_lote if (backend or BACKEND_RECUPERACION) == "matricial" else _buscar_vectorial_lote
+    recuperados = [None] * len(preguntas)
+    pendientes = list(range(len(preguntas)))
+    while pendientes:
+        vectores = [embeddings[posicion] for posicion in pendientes]
+        if len(grupos) == 1:
+            (persist_directory, docs_grupo), = grupos.items()
+            por_grupo = [buscar(persist_directory, docs_grupo, vectores, candidatos_k)]
+        else:
+            # Fan-out: una búsqueda por colección en paralelo y fusión por distancia
+            with ThreadPoolExecutor(max_workers=len(grupos)) as pool:
+                por_grupo = list(pool.map(lambda grupo: buscar(grupo[0], grupo[1], vectores, candidatos_k), grupos.items()))
+
+        incompletas = []
+        for indice, posicion in enumerate(pendientes):
+            vectoriales = sorted((par for resultados in por_grupo for par in resultados[indice]), key=lambda par: par[1])
+            ranking_vectorial = [doc for doc, _ in vectoriales[:candidatos_k]]
+
+            if hibrida:
+                ranking_bm25 = _buscar_bm25(grupos, preguntas[posicion], candidatos_k)
+                por_id = {doc.id: doc for doc in ranking_bm25}
+                por_id.update({doc.id: doc for doc in ranking_vectorial})
+                ids = fusionar_rrf(
+                    [[doc.id for doc in ranking_vectorial], [doc.id for doc in ranking_bm25]],
+                    [PESO_VECTORIAL, PESO_BM25], K_RRF
+                )
+                ranking = [por_id[chunk_id] for chunk_id in ids]
+            else:
+                ranking = ranking_vectorial
+            unicos = preprocess_docs(ranking)
+            distintos = seleccionar_mmr(unicos, k, completar=False)
+            if len(distintos) == k:
+                recuperados[posicion] = distintos
+            elif len(vectoriales) >= candidatos_k:
+                # Los duplicados y casi duplicados dejaron menos de k distintos y el índice tiene más
+                incompletas.append(posicion)
+            else:
+                recuperados[posicion] = seleccionar_mmr(unicos, k)
+        pendientes, candidatos_k = incompletas, 2 * candidatos_k
+    return recuperados
+
+def retrieve(state: SolicitudConsulta, doc_seleccionado, embedding: list = None, k: int = 3,
+             hibrida: bool = RECUPERACION_HIBRIDA, backend: str = None):
+    """
+    Recupera documentos relacionados con la consulta del usuario.
 
-    Ejemplo 2:
-    Question: How are you?
-    Answer: en
+    En modo híbrido se obtienen K_CANDIDATOS fragmentos por búsqueda vectorial y otros tantos
+    por BM25, y ambos rankings se combinan con Reciprocal Rank Fusion (pesos PESO_VECTORIAL y
+    PESO_BM25, constante K_RRF). De los candidatos se eligen k con Maximal Marginal Relevance,
+    descartando los casi idénticos a uno ya elegido mientras queden otros. Si se indican varios documentos repartidos en distintas
+    colecciones o shards, la búsqueda vectorial se lanza en paralelo en cada una y los
+    resultados se combinan por distancia. Con el backend 'matricial' la búsqueda vectorial se
+    resuelve en memoria sobre la matriz de embeddings de cada documento.
+
+    Parameters:
+        state (SolicitudConsulta): Contiene la pregunta y el nombre del usuario.
+        doc_seleccionado (str | list): Nombre del documento seleccionado, o lista de documentos.
+        embedding (list, optional): Embedding de la pregunta ya calculado, para no volver a calcularlo.
+        k (int): Número de fragmentos a recuperar.
+        hibrida (bool): Si es True, fusiona la búsqueda vectorial con BM25.
+        backend (str, optional): 'chroma' o 'matricial'. Por defecto, BACKEND_RECUPERACION.
 
-    Exemplo 3:
-    Pergunta: Como você está?
-    Resposta: pt
+    Returns:
+        dict: Contexto con los fragmentos de documentos relevantes, ya fusionados con sus vecinos
+            solapados y recortados a PRESUPUESTO_TOKENS_CONTEXTO (ver app.contexto).
+    """
+    embeddings = None if embedding is None else [embedding]
+    with metricas.span("recuperacion", documentos=doc_seleccionado, k=k, hibrida=hibrida,
+                       backend=backend or BACKEND_RECUPERACION) as span:
+        filtered_docs, = _recuperar([state.question], doc_seleccionado, embeddings, k, hibrida, backend)
+        span["fragmentos"] = len(filtered_docs)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Fragmentos recuperados: %s", [doc.id for doc in filtered_docs])
+    return {"context": ensamblar_contexto(filtered_docs)}
+
+def retrieve_lote(states: list, doc_seleccionado, embeddings: list = None, k: int = 3,
+                  hibrida: bool = RECUPERACION_HIBRIDA, backend: str = None):
     """
+    Versión por lotes de retrieve: embebe todas las preguntas en una llamada y resuelve las
+    búsquedas vectoriales de todas ellas con una sola consulta por colección (o un producto
+    matricial con el backend 'matricial').
 
-    prompt = f"""
-    {few_shot_examples}
-    Eres un asistente especializado en detectar idiomas. 
-    Genera la respuesta en el formato mencionado en los ejemplos. 
-    Si no puedes determinarlo con certeza, responde 'es' por defecto.
+    Parameters:
+        states (list): Consultas (SolicitudConsulta).
+        doc_seleccionado (str | list): Nombre del documento seleccionado, o lista de documentos.
+        embeddings (list, optional): Embeddings de las preguntas ya calculados.
+        k (int): Número de fragmentos a recuperar por pregunta.
+        hibrida (bool): Si es True, fusiona la búsqueda vectorial con BM25.
+        backend (str, optional): 'chroma' o 'matricial'. Por defecto, BACKEND_RECUPERACION.
 
-    Pregunta: {state.question}
-     
-    Respuesta:
+    Returns:
+        list: Un contexto por consulta, con el mismo formato que retrieve.
     """
-    response = llm.invoke(prompt)
-    print(f'Idioma detectado: {response.content}')
-    return response.content
+    with metricas.span("recuperacion", documentos=doc_seleccionado, k=k, hibrida=hibrida,
+                       backend=backend or BACKEND_RECUPERACION, preguntas=len(states)):
+        recuperados = _recuperar([state.question for state in states], doc_seleccionado, embeddings, k, hibrida, backend)
+    return [{"context": ensamblar_contexto(docs)} for docs in recuperados]
 
-def generar_respuesta(state: SolicitudConsulta, context: list, temperature: float):
+def consultar_cache(state: SolicitudConsulta, doc_seleccionado: str):
     """
-    Genera una respuesta utilizando el contexto recuperado de los documentos.
+    Busca la respuesta en la caché: primero por coincidencia exacta y luego por similitud.
+
+    Parameters:
+        state (SolicitudConsulta): Contiene la pregunta del usuario.
+        doc_seleccionado (str): Nombre del documento seleccionado.
+
+    Returns:
+        tuple: (respuesta o None, embedding de la pregunta o None si no se calculó).
+    """
+    with metricas.span("cache_respuestas", documento=doc_seleccionado) as span:
+        respuesta = cache_respuestas.buscar_exacta(doc_seleccionado, state.question)
+        if respuesta is not None:
+            span["resultado"] = "exacta"
+            metricas.incrementar("cache_respuestas_total", resultado="exacta")
+            return respuesta, None
+
+        with metricas.span("embedding", preguntas=1):
+            embedding = obtener_chroma(doc_seleccionado).embeddings.embed_query(state.question)
+        idioma = detector_idioma.principal.detectar(state.question).idioma
+        respuesta = cache_respuestas.buscar_similar(doc_seleccionado, embedding, idioma)
+        span["resultado"] = "fallo" if respuesta is None else "semantica"
+        metricas.incrementar("cache_respuestas_total", resultado=span.atributos["resultado"])
+        return respuesta, embedding
+
+def guardar_en_cache(state: SolicitudConsulta, doc_seleccionado: str, embedding: list, respuesta: str):
+    """
+    Almacena la respuesta final en la caché para servir preguntas repetidas.
+    """
+    idioma = detector_idioma.principal.detectar(state.question).idioma
+    cache_respuestas.guardar(doc_seleccionado, state.question, embedding, respuesta, idioma)
+
+def detectar_idioma(state: SolicitudConsulta):
+    """
+    Detecta el idioma de la consulta con el detector local y, solo si la confianza
+    es baja, con el modelo de lenguaje.
+
+    Parameters:
+        state (SolicitudConsulta): Contiene la pregunta del usuario.
+
+    Returns:
+        str: Código del idioma detectado y normalizado (por ejemplo, 'es' para español).
+    """
+    with metricas.span("deteccion_idioma") as span:
+        resultado = detector_idioma.detectar(state.question)
+        span["idioma"], span["confianza"], span["fuente"] = resultado.idioma, resultado.confianza, resultado.fuente
+    logger.debug("Idioma detectado: %s (confianza=%s, fuente=%s)", resultado.idioma, resultado.confianza, resultado.fuente)
+    return resultado.idioma
+
+def _registrar_tokens(span, mensaje):
+    """
+    Agrega al span y al contador 'tokens_total' los tokens informados por el modelo, si los hay.
+    """
+    uso = getattr(mensaje, "usage_metadata", None)
+    if not uso:
+        return
+    for tipo, campo in (("entrada", "input_tokens"), ("salida", "output_tokens")):
+        if uso.get(campo) is not None:
+            span[f"tokens_{tipo}"] = span.atributos.get(f"tokens_{tipo}", 0) + uso[campo]
+            metricas.incrementar("tokens_total", uso[campo], etapa=span.etapa, tipo=tipo)
+
+def construir_prompt_respuesta(state: SolicitudConsulta, context: list, idioma: str = None):
+    """
+    Construye el prompt de generación de respuesta a partir del contexto recuperado.
 
     Parameters:
         state (SolicitudConsulta): Contiene la pregunta del usuario.
         context (list): Lista de fragmentos de documentos relacionados.
+        idioma (str, optional): Código ISO 639-1 en el que se debe responder.
 
     Returns:
-        str: Respuesta generada.
+        str: Prompt listo para enviar al modelo.
     """
     prompt = """
     Eres un asistente de preguntas y respuestas diseñado para proporcionar respuestas precisas y breves.
     Usa los fragmentos de contexto recuperados para generar la respuesta. 
     Si no conoces la respuesta, indica claramente que no la sabes. 
     Mantén las respuestas en un máximo de una oración y sé conciso.
-    Detecta el idioma en el que se formula la pregunta y responde en el mismo idioma.
+    {instruccion_idioma}
     Añade un emoji al final que resuma o complemente la respuesta.
     Responde siempre en tercera persona.
 
@@ -175,26 +435,82 @@ def generar_respuesta(state: SolicitudConsulta, context: list, temperature: floa
 
     Respuesta:
     """
-    formatted_prompt = prompt.format(
+    if idioma:
+        instruccion_idioma = f"Responde únicamente en el idioma con código ISO 639-1 '{idioma}'."
+    else:
+        instruccion_idioma = "Detecta el idioma en el que se formula la pregunta y responde en el mismo idioma."
+
+    return prompt.format(
         question=state.question, 
-        context="\n\n".join(context)
+        context="\n\n".join(context),
+        instruccion_idioma=instruccion_idioma
     )
-    #print(context)
-    llm.temperature = temperature
-    response = llm.invoke(formatted_prompt)
+
+def generar_respuesta(state: SolicitudConsulta, context: list, temperature: float, idioma: str = None):
+    """
+    Genera una respuesta utilizando el contexto recuperado de los documentos.
+
+    Parameters:
+        state (SolicitudConsulta): Contiene la pregunta del usuario.
+        context (list): Lista de fragmentos de documentos relacionados.
+        temperature (float): Parámetro para ajustar la aleatoriedad de las respuestas generadas.
+        idioma (str, optional): Código ISO 639-1 en el que se debe responder. Si se indica,
+            la respuesta se genera directamente en ese idioma y no requiere traducción.
+
+    Returns:
+        str: Respuesta generada.
+
+    Raises:
+        LLMNoDisponible: Si ni el modelo principal ni el de respaldo respondieron a tiempo.
+    """
+    formatted_prompt = construir_prompt_respuesta(state, context, idioma)
+    with metricas.span("generacion", caracteres_prompt=len(formatted_prompt), fragmentos=len(context)) as span:
+        response = cliente_llm.invocar(formatted_prompt, "generacion", temperature, respaldo=True)
+        _registrar_tokens(span, response)
     return response.content
 
-def traducir_respuesta(state: SolicitudConsulta, texto: str, idioma_destino: str):
+def generar_respuesta_stream(state: SolicitudConsulta, context: list, temperature: float, idioma: str = None):
     """
-    Traduce la respuesta generada al idioma deseado.
+    Versión en streaming de generar_respuesta: entrega los tokens a medida que llegan.
+
+    Parameters:
+        state (SolicitudConsulta): Contiene la pregunta del usuario.
+        context (list): Lista de fragmentos de documentos relacionados.
+        temperature (float): Parámetro para ajustar la aleatoriedad de las respuestas generadas.
+        idioma (str, optional): Código ISO 639-1 en el que se debe responder.
+
+    Yields:
+        str: Fragmentos de texto de la respuesta. Si el modelo se interrumpe después de emitir
+            texto, la respuesta queda truncada.
+
+    Raises:
+        LLMNoDisponible: Si ningún modelo respondió antes de emitir texto.
+    """
+    formatted_prompt = construir_prompt_respuesta(state, context, idioma)
+    emitido = False
+    with metricas.span("generacion", caracteres_prompt=len(formatted_prompt), fragmentos=len(context), stream=True) as span:
+        try:
+            for chunk in cliente_llm.transmitir(formatted_prompt, "generacion", temperature, respaldo=True):
+                _registrar_tokens(span, chunk)
+                if chunk.content:
+                    emitido = True
+                    yield chunk.content
+        except LLMNoDisponible as e:
+            if not emitido:
+                raise
+            span["truncada"] = True
+            logger.warning("Respuesta truncada: %s", e)
+
+def construir_prompt_traduccion(texto: str, idioma_destino: str):
+    """
+    Construye el prompt few-shot de traducción.
 
     Parameters:
-        state (SolicitudConsulta): Contiene el nombre del usuario.
         texto (str): El texto que se desea traducir.
-        idioma_destino (str): El idioma de destino (código ISO 639-1, como 'es' para español).
+        idioma_destino (str): El idioma de destino (código ISO 639-1).
 
     Returns:
-        dict: Contiene el nombre del usuario y la respuesta traducida.
+        str: Prompt listo para enviar al modelo.
     """
     few_shot_examples = """
     Ejemplo 1:
@@ -213,7 +529,7 @@ def traducir_respuesta(state: SolicitudConsulta, texto: str, idioma_destino: str
     Traducción: Emma decidiu compartilhar seu dia extra com o povo. 🌟🤸‍♀️
     """
 
-    prompt = f"""
+    return f"""
     {few_shot_examples}
     Solo traduce el siguiente texto al idioma indicado manteniendo los emojis al final.
 
@@ -222,13 +538,57 @@ def traducir_respuesta(state: SolicitudConsulta, texto: str, idioma_destino: str
 
     Traducción:
     """
-    try:
-        response = llm.invoke(prompt)
-        return response.content
-    
-    except Exception as e:
-        print(f"Error al traducir con el modelo: {e}")
-        return texto  # Devuelve el texto original si hay un fallo
+
+def traducir_respuesta(state: SolicitudConsulta, texto: str, idioma_destino: str):
+    """
+    Traduce la respuesta generada al idioma deseado.
+
+    Parameters:
+        state (SolicitudConsulta): Contiene el nombre del usuario.
+        texto (str): El texto que se desea traducir.
+        idioma_destino (str): El idioma de destino (código ISO 639-1, como 'es' para español).
+
+    Returns:
+        str: La respuesta traducida, o el texto original si la traducción falla.
+    """
+    prompt = construir_prompt_traduccion(texto, idioma_destino)
+    with metricas.span("traduccion", idioma=idioma_destino) as span:
+        try:
+            response = cliente_llm.invocar(prompt, "traduccion")
+            _registrar_tokens(span, response)
+            return response.content
+
+        except Exception as e:
+            span["fallida"] = True
+            logger.warning("Error al traducir con el modelo: %s", e)
+            return texto  # Devuelve el texto original si hay un fallo
+
+def traducir_respuesta_stream(state: SolicitudConsulta, texto: str, idioma_destino: str):
+    """
+    Versión en streaming de traducir_respuesta.
+
+    Parameters:
+        state (SolicitudConsulta): Contiene el nombre del usuario.
+        texto (str): El texto que se desea traducir.
+        idioma_destino (str): El idioma de destino (código ISO 639-1).
+
+    Yields:
+        str: Fragmentos de la traducción. Si falla antes de emitir texto, el texto original completo.
+    """
+    prompt = construir_prompt_traduccion(texto, idioma_destino)
+    emitido = False
+    with metricas.span("traduccion", idioma=idioma_destino, stream=True) as span:
+        try:
+            for chunk in cliente_llm.transmitir(prompt, "traduccion"):
+                _registrar_tokens(span, chunk)
+                if chunk.content:
+                    emitido = True
+                    yield chunk.content
+        except Exception as e:
+            span["fallida"] = True
+            logger.warning("Error al traducir con el modelo: %s", e)
+            if not emitido:
+                yield texto  # Devuelve el texto original si hay un fallo
 
 def procesar_consulta(state: SolicitudConsulta, doc_seleccionado: str, temperature: float):
     """
@@ -236,25 +596,166 @@ def procesar_consulta(state: SolicitudConsulta, doc_seleccionado: str, temperatu
 
     Parameters:
         state (SolicitudConsulta): Contiene la consulta del usuario.
-        doc_seleccionado (str): Nombre del documento seleccionado.
+        doc_seleccionado (str | list): Nombre del documento seleccionado, o lista de documentos
+            para consultar varios a la vez (sin caché).
         temperature (float): Parámetro para ajustar la aleatoriedad de las respuestas generadas.
 
     Returns:
         dict: Contiene la respuesta generada, ya traducida si es necesario.
+
+    Raises:
+        ColaLlena: Si se alcanzó el límite de consultas concurrentes y la cola de espera está llena.
+        LLMNoDisponible: Si ningún modelo pudo generar la respuesta.
     """
-    context_data = retrieve(state, doc_seleccionado)
-    print(context_data)
-    idioma_detectado = detectar_idioma(state)
-    respuesta_base = generar_respuesta(state, context_data["context"], temperature)
+    with admision, metricas.span("consulta", documento=doc_seleccionado, temperatura=temperature) as span:
+        # La caché solo aplica a respuestas deterministas (temperatura 0)
+        usar_cache = temperature == 0 and cache_respuestas.habilitada and isinstance(doc_seleccionado, str)
+        embedding = None
+        if usar_cache:
+            respuesta_cache, embedding = consultar_cache(state, doc_seleccionado)
+            if respuesta_cache is not None:
+                span["cache"] = True
+                return {"user_name": state.user_name, "answer": respuesta_cache}
+
+        context_data = retrieve(state, doc_seleccionado, embedding)
+        idioma_detectado = detectar_idioma(state)
+        span["idioma"] = idioma_detectado
+        respuesta_base = generar_respuesta(state, context_data["context"], temperature)
     
-    if idioma_detectado == "es":
-        respuesta_final = respuesta_base
-    else:
-        respuesta_final = traducir_respuesta(state, respuesta_base, idioma_detectado)
-
-    respuesta_final = {
-        "user_name": state.user_name,
-        "answer": respuesta_final,
-    }
+        if idioma_detectado == "es":
+            respuesta_final = respuesta_base
+        else:
+            respuesta_final = traducir_respuesta(state, respuesta_base, idioma_detectado)
+
+        if usar_cache and embedding is not None:
+            guardar_en_cache(state, doc_seleccionado, embedding, respuesta_final)
+
+        respuesta_final = {
+            "user_name": state.user_name,
+            "answer": respuesta_final,
+        }
     
-    return respuesta_final
+        return respuesta_final
+
+async def aprocesar_consulta(state: SolicitudConsulta, doc_seleccionado: str, temperature: float, modo_unica_llamada: bool = False):
+    """
+    Versión asíncrona de procesar_consulta que evita esperar llamadas innecesarias.
+
+    La recuperación de contexto y la detección de idioma se lanzan a la vez. En el modo
+    por defecto la generación arranca apenas termina la recuperación, mientras la detección
+    sigue en curso, y solo se traduce si el idioma detectado no es español. En el modo de
+    llamada única la generación espera al idioma detectado y responde directamente en él,
+    sin paso de traducción.
+
+    Parameters:
+        state (SolicitudConsulta): Contiene la consulta del usuario.
+        doc_seleccionado (str | list): Nombre del documento seleccionado, o lista de documentos
+            para consultar varios a la vez (sin caché).
+        temperature (float): Parámetro para ajustar la aleatoriedad de las respuestas generadas.
+        modo_unica_llamada (bool): Si es True, genera la respuesta en el idioma detectado y omite la traducción.
+
+    Returns:
+        dict: Contiene la respuesta generada, ya traducida si es necesario.
+
+    Raises:
+        ColaLlena: Si se alcanzó el límite de consultas concurrentes y la cola de espera está llena.
+        LLMNoDisponible: Si ningún modelo pudo generar la respuesta.
+    """
+    async with admision.aadmitir():
+        with metricas.span("consulta", documento=doc_seleccionado, temperatura=temperature) as span:
+            # La caché solo aplica a respuestas deterministas (temperatura 0)
+            usar_cache = temperature == 0 and cache_respuestas.habilitada and isinstance(doc_seleccionado, str)
+            embedding = None
+            if usar_cache:
+                respuesta_cache, embedding = await asyncio.to_thread(consultar_cache, state, doc_seleccionado)
+                if respuesta_cache is not None:
+                    span["cache"] = True
+                    return {"user_name": state.user_name, "answer": respuesta_cache}
+
+            tarea_idioma = asyncio.create_task(asyncio.to_thread(detectar_idioma, state))
+            try:
+                context_data = await asyncio.to_thread(retrieve, state, doc_seleccionado, embedding)
+
+                if modo_unica_llamada:
+                    idioma_detectado = await tarea_idioma
+                    respuesta_final = await asyncio.to_thread(
+                        generar_respuesta, state, context_data["context"], temperature, idioma_detectado
+                    )
+                else:
+                    respuesta_base = await asyncio.to_thread(
+                        generar_respuesta, state, context_data["context"], temperature
+                    )
+                    idioma_detectado = await tarea_idioma
+                    if idioma_detectado == "es":
+                        respuesta_final = respuesta_base
+                    else:
+                        respuesta_final = await asyncio.to_thread(
+                            traducir_respuesta, state, respuesta_base, idioma_detectado
+                        )
+            finally:
+                # Evitar tareas huérfanas si la recuperación o la generación fallan
+                if not tarea_idioma.done():
+                    tarea_idioma.cancel()
+
+            span["idioma"] = idioma_detectado
+            if usar_cache and embedding is not None:
+                guardar_en_cache(state, doc_seleccionado, embedding, respuesta_final)
+
+            return {
+                "user_name": state.user_name,
+                "answer": respuesta_final,
+            }
+
+def procesar_consulta_stream(state: SolicitudConsulta, doc_seleccionado, temperature: float, modo_unica_llamada: bool = False):
+    """
+    Versión en streaming de procesar_consulta para mostrar la respuesta a medida que se genera.
+
+    Si la pregunta está en español (o en modo de llamada única) se transmite directamente la
+    generación. Si requiere traducción, la respuesta base se genera completa y se transmite
+    la traducción. El tiempo hasta el primer token se registra en la métrica
+    'tiempo_primer_token_segundos'.
+
+    Parameters:
+        state (SolicitudConsulta): Contiene la consulta del usuario.
+        doc_seleccionado (str | list): Nombre del documento seleccionado, o lista de documentos.
+        temperature (float): Parámetro para ajustar la aleatoriedad de las respuestas generadas.
+        modo_unica_llamada (bool): Si es True, genera la respuesta en el idioma detectado y omite la traducción.
+
+    Yields:
+        str: Respuesta acumulada hasta el momento.
+
+    Raises:
+        ColaLlena: Si se alcanzó el límite de consultas concurrentes y la cola de espera está llena.
+        LLMNoDisponible: Si ningún modelo pudo generar la respuesta.
+    """
+    with admision, metricas.span("consulta", documento=doc_seleccionado, temperatura=temperature, stream=True) as span:
+        inicio = time.perf_counter()
+        usar_cache = temperature == 0 and cache_respuestas.habilitada and isinstance(doc_seleccionado, str)
+        embedding = None
+        if usar_cache:
+            respuesta_cache, embedding = consultar_cache(state, doc_seleccionado)
+            if respuesta_cache is not None:
+                span["cache"] = True
+                metricas.observar("tiempo_primer_token_segundos", time.perf_counter() - inicio)
+                yield respuesta_cache
+                return
+
+        context_data = retrieve(state, doc_seleccionado, embedding)
+        idioma_detectado = detectar_idioma(state)
+
+        if idioma_detectado == "es" or modo_unica_llamada:
+            tokens = generar_respuesta_stream(state, context_data["context"], temperature, idioma_detectado)
+        else:
+            respuesta_base = generar_respuesta(state, context_data["context"], temperature)
+            tokens = traducir_respuesta_stream(state, respuesta_base, idioma_detectado)
+
+        respuesta = ""
+        for token in tokens:
+            if not respuesta:
+                span["idioma"] = idioma_detectado
+                metricas.observar("tiempo_primer_token_segundos", time.perf_counter() - inicio)
+            respuesta += token
+            yield respuesta
+
+        if usar_cache and embedding is not None:
+            guardar_en_cache(state, doc_seleccionado, embedding, respuesta)
@@ -0,0 +1,178 @@
+"""
+Prueba de carga de la API HTTP (app.api) frente a la interfaz de Gradio.
+
+Levanta cada servidor en un proceso aparte, con los modelos simulados, sobre una copia de
+`documents/`, y lanza consultas concurrentes desde clientes HTTP con keep-alive:
+1. Gradio: la interfaz de `main.py`, mediante su API REST de eventos
+   (POST /gradio_api/call/consultar_llm y lectura del stream SSE del evento).
+2. API con 1 worker de uvicorn: POST /consultas.
+3. API con --workers N.
+Para cada uno mide consultas/s, latencia p50/p95 y errores; para la API, además, el tiempo del
+pipeline informado en Server-Timing (la diferencia con la latencia es el costo del servidor).
+
+Uso:
+    python -m benchmarks.benchmark_api --consultas 200 --concurrencia 16 --workers 4
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from benchmarks.stubs import preparar_entorno_aislado
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOCUMENTO = "story_amarok.pdf"
+
+# La interfaz de main.py servida por uvicorn en el puerto indicado (igual que demo.launch, pero
+# sin enlace público ni la comprobación de la página principal)
+SCRIPT_GRADIO = """
+import runpy
+import gradio as gr, uvicorn
+from fastapi import FastAPI
+modulo = runpy.run_path({main!r}, run_name="benchmark")
+modulo["calentamiento"].iniciar()
+uvicorn.run(gr.mount_gradio_app(FastAPI(), modulo["demo"], path=""), port={puerto}, log_level="warning")
+"""
+
+
+def esperar_servidor(url, timeout=180):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            if httpx.get(url, timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"El servidor no respondió en {url}")
+
+
+def consultar_gradio(cliente, base, pregunta):
+    respuesta = cliente.post(f"{base}/gradio_api/call/consultar_llm", json={"data": [pregunta, DOCUMENTO, [], 0]})
+    respuesta.raise_for_status()
+    evento = respuesta.json()["event_id"]
+    with cliente.stream("GET", f"{base}/gradio_api/call/consultar_llm/{evento}") as flujo:
+        tipo = None
+        for linea in flujo.iter_lines():
+            if linea.startswith("event:"):
+                tipo = linea.split(":", 1)[1].strip()
+            elif linea.startswith("data:") and tipo in ("complete", "error"):
+                if tipo == "error":
+                    raise RuntimeError(linea)
+                historial = json.loads(linea[5:])[0]
+                return historial[-1]["content"], None
+    raise RuntimeError("El evento terminó sin respuesta")
+
+
+def consultar_api(cliente, base, pregunta):
+    respuesta = cliente.post(f"{base}/consultas", json={"question": pregunta, "documento": DOCUMENTO})
+    respuesta.raise_for_status()
+    tiempos = dict(
+        parte.split(";dur=") for parte in respuesta.headers["server-timing"].split(", ") if ";dur=" in parte
+    )
+    return respuesta.json()["answer"], float(tiempos.get("consulta", "nan")) / 1000
+
+
+def cargar(consultar, base, consultas, concurrencia):
+    """
+    Lanza `consultas` consultas con `concurrencia` clientes (uno por hilo, con keep-alive).
+
+    Returns:
+        dict: Consultas/s, latencias p50/p95 en ms, errores y mediana del pipeline (Server-Timing).
+    """
+    locales = threading.local()
+
+    def una(posicion):
+        if not hasattr(locales, "cliente"):
+            locales.cliente = httpx.Client(timeout=120)
+        inicio = time.perf_counter()
+        try:
+            _, pipeline = consultar(locales.cliente, base, f"¿Qué ocurre en la parte {posicion} del relato?")
+            return time.perf_counter() - inicio, pipeline, None
+        except Exception as e:
+            return time.perf_counter() - inicio, None, f"{type(e).__name__}: {e}"
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        resultados = list(pool.map(una, range(consultas)))
+    segundos = time.perf_counter() - inicio
+    latencias = sorted(latencia * 1000 for latencia, _, error in resultados if error is None)
+    pipelines = [pipeline * 1000 for _, pipeline, error in resultados if error is None and pipeline is not None]
+    errores = [error for _, _, error in resultados if error is not None]
+    return {
+        "consultas_por_s": len(latencias) / segundos,
+        "p50_ms": statistics.median(latencias) if latencias else float("nan"),
+        "p95_ms": latencias[int(0.95 * (len(latencias) - 1))] if latencias else float("nan"),
+        "pipeline_ms": statistics.median(pipelines) if pipelines else None,
+        "errores": len(errores),
+        "primer_error": errores[0] if errores else None,
+    }
+
+
+def levantar(comando, directorio, entorno):
+    return subprocess.Popen(comando, cwd=directorio, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latencia-llm", type=float, default=0.05)
+    parser.add_argument("--puerto", type=int, default=8765)
+    args = parser.parse_args()
+
+    base = preparar_entorno_aislado()
+    shutil.copytree(os.path.join(RAIZ, "documents"), os.path.join(base, "documents"))
+    entorno = {
+        **os.environ, "PYTHONPATH": RAIZ, "LATENCIA_LLM_SIMULADO": str(args.latencia_llm), "CACHE_RESPUESTAS_MAX": "0",
+        "PUERTO_METRICAS": "0", "ARCHIVO_TRAZAS": "", "NIVEL_LOG": "WARNING", "ANONYMIZED_TELEMETRY": "False",
+        "GRADIO_ANALYTICS_ENABLED": "False",
+    }
+
+    escenarios = [
+        ("Gradio", [sys.executable, "-c", SCRIPT_GRADIO.format(puerto=args.puerto, main=os.path.join(RAIZ, "main.py"))],
+         consultar_gradio, "/config"),
+        ("API, 1 worker", [sys.executable, "-m", "uvicorn", "app.api:app", "--port", str(args.puerto), "--log-level", "warning"],
+         consultar_api, "/salud"),
+        (f"API, {args.workers} workers", [sys.executable, "-m", "uvicorn", "app.api:app", "--port", str(args.puerto),
+                                          "--workers", str(args.workers), "--log-level", "warning"],
+         consultar_api, "/salud"),
+    ]
+
+    print(f"{args.consultas} consultas, {args.concurrencia} clientes concurrentes, LLM simulado de "
+          f"{args.latencia_llm * 1000:.0f} ms por llamada\n")
+    print(f"{'Servidor':<18}{'consultas/s':>13}{'p50 (ms)':>10}{'p95 (ms)':>10}{'pipeline (ms)':>15}{'errores':>9}")
+    resultados = {}
+    for nombre, comando, consultar, salud in escenarios:
+        url = f"http://127.0.0.1:{args.puerto}"
+        proceso = levantar(comando, base, entorno)
+        try:
+            esperar_servidor(url + salud)
+            # Calentamiento: la primera consulta de cada proceso espera la inicialización
+            cargar(consultar, url, 2 * args.workers, 2 * args.workers)
+            resultados[nombre] = fila = cargar(consultar, url, args.consultas, args.concurrencia)
+        finally:
+            proceso.terminate()
+            proceso.wait(timeout=30)
+        pipeline = f"{fila['pipeline_ms']:.0f}" if fila["pipeline_ms"] is not None else "-"
+        print(f"{nombre:<18}{fila['consultas_por_s']:>13.1f}{fila['p50_ms']:>10.0f}{fila['p95_ms']:>10.0f}"
+              f"{pipeline:>15}{fila['errores']:>9}")
+        if fila["primer_error"]:
+            print(f"  primer error: {fila['primer_error']}")
+
+    gradio, api = resultados["Gradio"], resultados["API, 1 worker"]
+    assert api["errores"] == 0 and gradio["errores"] == 0
+    assert api["consultas_por_s"] > gradio["consultas_por_s"], "La API debería superar a la cola de Gradio"
+    print("\nOK: la API atiende más consultas por segundo que la interfaz con la misma lógica de consulta.")
+
+
+if __name__ == "__main__":
+    main()
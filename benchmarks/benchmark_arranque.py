@@ -0,0 +1,85 @@
+"""
+Benchmark del arranque de la aplicación: tiempo hasta que la interfaz está lista para servir y
+hasta la primera respuesta.
+
+Ejecuta `main.py` en un proceso nuevo (con los modelos simulados y `demo.launch` anulado) sobre
+una copia de `documents/`, dos veces: con la base vacía (primer arranque del contenedor) y con
+la base ya construida (reinicio). En cada caso mide:
+- interfaz_s: desde el inicio del proceso hasta que `demo` está construido y se lanzaría.
+- primera_respuesta_s: lo que tarda después la primera consulta en completarse.
+- modulos: módulos importados cuando la interfaz está lista.
+
+Uso:
+    python -m benchmarks.benchmark_arranque --repeticiones 3
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+from benchmarks.stubs import preparar_entorno_aislado
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import time
+inicio = time.perf_counter()
+import json, runpy, sys
+import gradio as gr
+gr.Blocks.launch = lambda self, *args, **kwargs: None
+modulo = runpy.run_path({main!r}, run_name="__main__")
+interfaz = time.perf_counter() - inicio
+modulos = len(sys.modules)
+
+inicio = time.perf_counter()
+for _ in modulo["consultar_llm"]("¿Quién es el protagonista?", "story_amarok.pdf", [], 0):
+    pass
+primera_respuesta = time.perf_counter() - inicio
+print(json.dumps({{"interfaz_s": interfaz, "primera_respuesta_s": primera_respuesta, "modulos": modulos}}))
+"""
+
+
+def arrancar(directorio, entorno):
+    proceso = subprocess.run([sys.executable, "-c", SCRIPT.format(main=os.path.join(RAIZ, "main.py"))],
+                             cwd=directorio, env=entorno, capture_output=True, text=True)
+    if proceso.returncode != 0:
+        raise RuntimeError(proceso.stderr[-2000:])
+    return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--latencia-llm", type=float, default=0.05)
+    parser.add_argument("--latencia-embeddings", type=float, default=0.02)
+    args = parser.parse_args()
+
+    base = preparar_entorno_aislado()
+    entorno = dict(
+        os.environ, PYTHONPATH=RAIZ, PROVEEDOR_MODELOS="simulado", PUERTO_METRICAS="0", ARCHIVO_TRAZAS="",
+        LATENCIA_LLM_SIMULADO=str(args.latencia_llm), LATENCIA_EMBEDDINGS_SIMULADOS=str(args.latencia_embeddings),
+        NIVEL_LOG="WARNING",
+    )
+
+    resultados = {"en_frio": [], "reinicio": []}
+    for repeticion in range(args.repeticiones):
+        directorio = os.path.join(base, f"arranque_{repeticion}")
+        shutil.copytree(os.path.join(RAIZ, "documents"), os.path.join(directorio, "documents"))
+        shutil.copytree(os.path.join(RAIZ, "images"), os.path.join(directorio, "images"))
+        resultados["en_frio"].append(arrancar(directorio, entorno))
+        resultados["reinicio"].append(arrancar(directorio, entorno))
+
+    print(f"{'Escenario':<12}{'interfaz (s)':>14}{'1ª respuesta (s)':>18}{'total (s)':>12}{'módulos':>10}")
+    for escenario, mediciones in resultados.items():
+        interfaz = statistics.median(m["interfaz_s"] for m in mediciones)
+        respuesta = statistics.median(m["primera_respuesta_s"] for m in mediciones)
+        total = statistics.median(m["interfaz_s"] + m["primera_respuesta_s"] for m in mediciones)
+        modulos = statistics.median(m["modulos"] for m in mediciones)
+        print(f"{escenario:<12}{interfaz:>14.2f}{respuesta:>18.2f}{total:>12.2f}{modulos:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
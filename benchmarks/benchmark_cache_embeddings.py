@@ -0,0 +1,48 @@
+"""
+Verifica la caché persistente de embeddings durante la ingesta.
+
+Indexa los documentos de `documents/preprocessed/` con un modelo de embeddings simulado
+envuelto en CacheEmbeddings y luego reconstruye la base Chroma desde cero con una nueva
+instancia (mismo directorio de caché). La segunda ingesta no debe llamar al modelo.
+
+Uso:
+    python -m benchmarks.benchmark_cache_embeddings
+"""
+
+import os
+import time
+from benchmarks.stubs import EmbeddingsSimulados, preparar_entorno_aislado
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def ingestar(directorio_documentos, directorio_chroma, modelo):
+    from app.cache_embeddings import CacheEmbeddings
+    from app.cargar_en_chroma_db import cargar_documentos_en_chroma_db
+
+    embeddings = EmbeddingsSimulados()
+    cacheados = CacheEmbeddings(embeddings, modelo, directorio="cache_embeddings")
+
+    inicio = time.perf_counter()
+    cargar_documentos_en_chroma_db(directorio_documentos, directorio_chroma, flag_nuevo=False, embeddings=cacheados)
+    duracion = time.perf_counter() - inicio
+    return embeddings, cacheados.estadisticas(), duracion
+
+
+def main():
+    directorio_documentos = os.path.join(RAIZ, "documents", "preprocessed")
+    preparar_entorno_aislado()
+    modelo = "simulado-v1"
+
+    # Cada ingesta usa una base Chroma vacía distinta; solo la caché de embeddings se comparte
+    for numero, etiqueta in enumerate(("ingesta inicial", "re-ingesta")):
+        embeddings, estadisticas, duracion = ingestar(directorio_documentos, f"chroma_{numero}", modelo)
+        print(f"{etiqueta:<16} llamadas_modelo={embeddings.llamadas:4d} textos={embeddings.textos_embebidos:5d} "
+              f"tasa_aciertos={estadisticas['tasa_aciertos']:.2f} duracion={duracion:.2f}s")
+
+    assert embeddings.llamadas == 0, "La re-ingesta no debería llamar al modelo de embeddings"
+    print("OK: la re-ingesta no realizó llamadas de embeddings.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark de la carga de archivos: indexación dentro del request frente a tareas en segundo plano.
+
+Con embeddings simulados con latencia por llamada, mide:
+1. Cuánto tarda en responder una carga que indexa dentro del request (flujo anterior).
+2. Cuánto tarda en responder la carga encolada y cuánto después queda lista la tarea.
+3. Cargas concurrentes sobre la misma colección (incluido el mismo archivo dos veces): todas
+   terminan y cada documento queda indexado una sola vez.
+
+Uso:
+    python -m benchmarks.benchmark_carga --copias 4 --latencia-embeddings 0.2
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.stubs import EmbeddingsSimulados, preparar_entorno_aislado
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ORIGEN = os.path.join(RAIZ, "documents", "uploaded", "HowtoStartAStartUp.pdf")
+
+
+def esperar(tareas):
+    while any(tarea.activa for tarea in tareas):
+        time.sleep(0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copias", type=int, default=4, help="Archivos subidos de forma concurrente")
+    parser.add_argument("--latencia-embeddings", type=float, default=0.2)
+    args = parser.parse_args()
+
+    preparar_entorno_aislado()
+    os.makedirs("subidos")
+    for copia in range(args.copias + 2):
+        shutil.copy2(ORIGEN, f"subidos/archivo_{copia}.pdf")
+
+    from app.registro import registro
+    from app.manifiesto import ManifiestoIngesta
+    from app.cargar_en_chroma_db import cargar_documentos_en_chroma_db
+    from app.cola_indexacion import cola_indexacion
+
+    registro.fabrica_embeddings = lambda modelo: EmbeddingsSimulados(latencia=args.latencia_embeddings)
+    salida = io.StringIO()
+
+    # 1. Flujo anterior: copia e indexación dentro del request
+    os.makedirs("documents/sincrono")
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(salida):
+        shutil.copy2("subidos/archivo_0.pdf", "documents/sincrono/archivo_0.pdf")
+        cargar_documentos_en_chroma_db("documents/sincrono", "chroma_db/sincrono", flag_nuevo=True)
+    print(f"Indexación en el request: respuesta en {(time.perf_counter() - inicio) * 1000:8.1f} ms")
+
+    # 2. Carga encolada
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(salida):
+        tarea = cola_indexacion.encolar(["subidos/archivo_1.pdf"], "documents/cola", "chroma_db/cola")
+        respuesta = time.perf_counter() - inicio
+        esperar([tarea])
+    print(f"Tarea en segundo plano:   respuesta en {respuesta * 1000:8.1f} ms, lista en "
+          f"{(time.perf_counter() - inicio) * 1000:.1f} ms ({tarea.descripcion()})")
+
+    # 3. Cargas concurrentes sobre la misma colección, una de ellas repetida
+    rutas = [[f"subidos/archivo_{copia + 2}.pdf"] for copia in range(args.copias)] + [["subidos/archivo_2.pdf"]]
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(salida), ThreadPoolExecutor(max_workers=len(rutas)) as pool:
+        tareas = list(pool.map(lambda archivos: cola_indexacion.encolar(archivos, "documents/concurrente", "chroma_db/concurrente"), rutas))
+        esperar(tareas)
+    print(f"{len(tareas)} cargas concurrentes terminadas en {time.perf_counter() - inicio:.2f}s:")
+    for tarea in tareas:
+        print(f"  {tarea.descripcion()}")
+
+    manifiesto = ManifiestoIngesta("chroma_db/concurrente")
+    fragmentos = registro.store("chroma_db/concurrente")._collection.count()
+    esperados = sum(len(entrada["chunk_ids"]) for entrada in manifiesto.archivos.values())
+    print(f"Documentos en el manifiesto: {len(manifiesto.archivos)}, fragmentos en Chroma: {fragmentos} "
+          f"(esperados {esperados}) -> {'OK' if fragmentos == esperados else 'DUPLICADOS'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Prueba de carga de consultas concurrentes con un LLM simulado.
+
+Cada sesión hace varias consultas en streaming (procesar_consulta_stream) con su propia
+temperatura; el LLM simulado termina cada respuesta con la temperatura que recibió, así que
+una respuesta con otra temperatura indica que las sesiones se mezclaron. Mide:
+1. Escalado: consultas/s y latencia p95 según el número de sesiones simultáneas, con una
+   consulta a la vez (el límite por defecto de la cola de Gradio) y con --max-concurrentes.
+2. Mezclas: respuestas con una temperatura ajena, con la temperatura por llamada y, como
+   referencia, modificando el modelo compartido (el comportamiento anterior).
+3. Backpressure: ráfaga de consultas simultáneas contra una cola acotada; las que exceden
+   la cola se rechazan de inmediato con ColaLlena.
+
+Uso:
+    python -m benchmarks.benchmark_concurrencia --sesiones 1 2 4 8 16 --max-concurrentes 8
+"""
+
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.stubs import LLMSimulado, preparar_entorno_aislado
+
+PREGUNTA = "¿Qué ocurre al final del relato?"
+
+
+def medir_sesiones(services, sesiones, consultas_por_sesion):
+    """
+    Lanza `sesiones` hilos que consultan a la vez, cada uno con su temperatura.
+
+    Returns:
+        dict: Consultas/s, latencia p95 y número de respuestas con una temperatura ajena.
+    """
+    from app.models import SolicitudConsulta
+
+    def sesion(numero):
+        temperatura = round((numero % 10 + 1) / 10, 1)
+        latencias, mezclas = [], 0
+        for _ in range(consultas_por_sesion):
+            state = SolicitudConsulta(user_name=f"sesion{numero}", question=PREGUNTA)
+            inicio = time.perf_counter()
+            respuesta = ""
+            for respuesta in services.procesar_consulta_stream(state, "doc.pdf", temperatura, True):
+                pass
+            latencias.append(time.perf_counter() - inicio)
+            mezclas += not respuesta.endswith(f"[temperatura={temperatura}]")
+        return latencias, mezclas
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sesiones) as pool:
+        resultados = list(pool.map(sesion, range(sesiones)))
+    total = time.perf_counter() - inicio
+
+    latencias = sorted(valor for resultado, _ in resultados for valor in resultado)
+    return {
+        "consultas_por_s": len(latencias) / total,
+        "p95_ms": latencias[min(len(latencias) - 1, int(round(0.95 * (len(latencias) - 1))))] * 1000,
+        "mezclas": sum(mezclas for _, mezclas in resultados),
+    }
+
+
+def medir_rafaga(services, ControlAdmision, ColaLlena, consultas, max_concurrentes, max_cola):
+    """
+    Lanza `consultas` consultas a la vez contra un control con cola acotada.
+
+    Returns:
+        tuple: (atendidas, rechazadas, mediana en ms del tiempo hasta el rechazo).
+    """
+    from app.models import SolicitudConsulta
+
+    services.admision = ControlAdmision(max_concurrentes, max_cola)
+
+    def consulta(numero):
+        inicio = time.perf_counter()
+        try:
+            services.procesar_consulta(SolicitudConsulta(user_name=f"rafaga{numero}", question=PREGUNTA), "doc.pdf", 0)
+            return True, time.perf_counter() - inicio
+        except ColaLlena:
+            return False, time.perf_counter() - inicio
+
+    with ThreadPoolExecutor(max_workers=consultas) as pool:
+        resultados = list(pool.map(consulta, range(consultas)))
+    rechazos = [segundos for atendida, segundos in resultados if not atendida]
+    return len(resultados) - len(rechazos), len(rechazos), statistics.median(rechazos) * 1000 if rechazos else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sesiones", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--consultas-por-sesion", type=int, default=4)
+    parser.add_argument("--max-concurrentes", type=int, default=8)
+    parser.add_argument("--latencia-llm", type=float, default=0.2)
+    parser.add_argument("--latencia-recuperacion", type=float, default=0.02)
+    args = parser.parse_args()
+
+    preparar_entorno_aislado()
+    os.environ["CACHE_RESPUESTAS_MAX"] = "0"  # Medir el pipeline completo, sin caché
+    from app import cliente_llm, proveedores, services
+    from app.admision import ColaLlena, ControlAdmision
+
+    services.llm = LLMSimulado(latencia=args.latencia_llm, eco=True)
+
+    def retrieve_simulado(state, doc_seleccionado, embedding=None):
+        time.sleep(args.latencia_recuperacion)
+        return {"context": ["Fragmento de contexto simulado."]}
+
+    services.retrieve = retrieve_simulado
+
+    def con_temperatura_compartida(llm, temperature):
+        # Comportamiento anterior: cada consulta cambia la temperatura del modelo compartido
+        llm.temperature = temperature
+        return llm
+
+    print(f"{'Sesiones':>8}{'1 a la vez (c/s)':>18}{f'{args.max_concurrentes} a la vez (c/s)':>18}"
+          f"{'p95 (ms)':>10}{'mezclas':>9}{'mezclas antes':>15}")
+    for sesiones in args.sesiones:
+        services.admision = ControlAdmision(1, sesiones)
+        serie = medir_sesiones(services, sesiones, args.consultas_por_sesion)
+        services.admision = ControlAdmision(args.max_concurrentes, sesiones)
+        concurrente = medir_sesiones(services, sesiones, args.consultas_por_sesion)
+        cliente_llm.con_temperatura = con_temperatura_compartida
+        compartido = medir_sesiones(services, sesiones, args.consultas_por_sesion)
+        cliente_llm.con_temperatura = proveedores.con_temperatura
+        print(f"{sesiones:>8}{serie['consultas_por_s']:>18.1f}{concurrente['consultas_por_s']:>18.1f}"
+              f"{concurrente['p95_ms']:>10.0f}{concurrente['mezclas']:>9}{compartido['mezclas']:>15}")
+        assert concurrente["mezclas"] == 0 and serie["mezclas"] == 0, "Respuestas con la temperatura de otra sesión"
+
+    max_cola = args.max_concurrentes
+    rafaga = args.max_concurrentes * 4
+    atendidas, rechazadas, espera_rechazo = medir_rafaga(
+        services, ControlAdmision, ColaLlena, rafaga, args.max_concurrentes, max_cola
+    )
+    print(f"\nRáfaga de {rafaga} consultas con {args.max_concurrentes} a la vez y cola de {max_cola}: "
+          f"{atendidas} atendidas, {rechazadas} rechazadas (mediana hasta el rechazo {espera_rechazo:.1f} ms)")
+    assert atendidas == args.max_concurrentes + max_cola, "La cola acotada debería atender exactamente max_concurrentes + max_cola"
+    print("OK: sin mezclas entre sesiones y con rechazo inmediato al llenarse la cola.")
+
+
+if __name__ == "__main__":
+    main()
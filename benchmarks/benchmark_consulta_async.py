@@ -0,0 +1,74 @@
+"""
+Benchmark de latencia de procesar_consulta frente a aprocesar_consulta con un LLM simulado.
+
+Mide el tiempo de la ruta crítica de una consulta en inglés (que requiere traducción en el
+flujo secuencial) usando latencias fijas para la recuperación y para cada llamada al modelo.
+
+El solapamiento de aprocesar_consulta oculta la detección de idioma detrás de la recuperación,
+por lo que solo ahorra tiempo cuando la detección llama al LLM. Se mide con el detector local
+(la pregunta se resuelve sin llamar al modelo) y forzando el respaldo del LLM (preguntas
+ambiguas o muy cortas, por debajo de UMBRAL_CONFIANZA_IDIOMA).
+
+Uso:
+    python -m benchmarks.benchmark_consulta_async --latencia-llm 0.3 --latencia-recuperacion 0.2
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from benchmarks.stubs import LLMSimulado, preparar_entorno_aislado
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latencia-llm", type=float, default=0.3)
+    parser.add_argument("--latencia-recuperacion", type=float, default=0.2)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    preparar_entorno_aislado()
+    os.environ["CACHE_RESPUESTAS_MAX"] = "0"  # Medir el pipeline completo, sin caché
+    from app import services
+    from app.models import SolicitudConsulta
+
+    services.llm = LLMSimulado(latencia=args.latencia_llm, idioma="en")
+
+    def retrieve_simulado(state, doc_seleccionado, embedding=None):
+        time.sleep(args.latencia_recuperacion)
+        return {"context": ["Fragmento de contexto simulado."]}
+
+    services.retrieve = retrieve_simulado
+    state = SolicitudConsulta(user_name="bench", question="What is the story about?")
+    umbral_local = services.detector_idioma.umbral
+
+    # Con un umbral inalcanzable, toda detección pasa al LLM
+    for deteccion, umbral in (("detector local", umbral_local), ("detección por LLM", 1.01)):
+        services.detector_idioma.umbral = umbral
+        resultados = {
+            "secuencial": medir(lambda: services.procesar_consulta(state, "doc.pdf", 0), args.repeticiones),
+            "asincrono": medir(lambda: asyncio.run(services.aprocesar_consulta(state, "doc.pdf", 0)), args.repeticiones),
+            "asincrono_unica_llamada": medir(
+                lambda: asyncio.run(services.aprocesar_consulta(state, "doc.pdf", 0, modo_unica_llamada=True)),
+                args.repeticiones,
+            ),
+        }
+
+        print(f"{deteccion}:")
+        base = resultados["secuencial"]
+        for nombre, mediana in resultados.items():
+            print(f"  {nombre:<26} mediana={mediana * 1000:8.1f} ms  ahorro={(base - mediana) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
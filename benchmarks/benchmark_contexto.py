@@ -0,0 +1,114 @@
+"""
+Benchmark del ensamblado de contexto: tokens del prompt y latencia de generación por consulta,
+uniendo los fragmentos tal cual frente a fusionarlos con sus vecinos y recortarlos al presupuesto.
+
+Indexa una copia de `documents/` con embeddings simulados y usa las consultas sintéticas de
+benchmark_hibrida. Para cada consulta recupera los mismos fragmentos (recuperación híbrida) y
+construye el prompt de generación de las dos formas. Los tokens se estiman como en
+app.contexto; la generación usa el LLM simulado con un costo por token de entrada.
+
+Uso:
+    python -m benchmarks.benchmark_contexto --consultas 40 --k 3 6 --presupuesto 1024
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import time
+from benchmarks.benchmark_hibrida import RAIZ, generar_consultas
+from benchmarks.stubs import EmbeddingsSimulados, LLMSimulado, preparar_entorno_aislado
+
+
+def medir(consultas, k, presupuesto, llm, detalle):
+    from app import services
+    from app.contexto import ensamblar_contexto, estimar_tokens
+    from app.models import SolicitudConsulta
+
+    filas = []
+    for documento, pregunta, _ in consultas:
+        state = SolicitudConsulta(user_name="bench", question=pregunta)
+        fragmentos, = services._recuperar([pregunta], documento, None, k, True, None)
+
+        inicio = time.perf_counter()
+        contexto = ensamblar_contexto(fragmentos, presupuesto)
+        ensamblado_us = (time.perf_counter() - inicio) * 1e6
+
+        fila = {"documento": documento, "fragmentos": len(fragmentos), "bloques": len(contexto), "ensamblado_us": ensamblado_us}
+        for nombre, textos in (("antes", [doc.page_content for doc in fragmentos]), ("despues", contexto)):
+            prompt = services.construir_prompt_respuesta(state, textos)
+            inicio = time.perf_counter()
+            llm.invoke(prompt)
+            fila[f"generacion_{nombre}_ms"] = (time.perf_counter() - inicio) * 1000
+            fila[f"tokens_{nombre}"] = estimar_tokens(prompt)
+        filas.append(fila)
+
+    if detalle:
+        print(f"\nk={k}, presupuesto={presupuesto or 'sin límite'}")
+        print(f"{'Documento':<28}{'frag':>5}{'bloq':>5}{'tokens antes':>14}{'después':>9}{'ahorro':>8}"
+              f"{'ensamblado (µs)':>17}{'gen. antes (ms)':>17}{'después (ms)':>14}")
+        for fila in filas:
+            ahorro = 1 - fila["tokens_despues"] / fila["tokens_antes"]
+            print(f"{fila['documento'][:27]:<28}{fila['fragmentos']:>5}{fila['bloques']:>5}{fila['tokens_antes']:>14}"
+                  f"{fila['tokens_despues']:>9}{ahorro:>8.1%}{fila['ensamblado_us']:>17.0f}"
+                  f"{fila['generacion_antes_ms']:>17.1f}{fila['generacion_despues_ms']:>14.1f}")
+    return filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--consultas", type=int, default=40)
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 6])
+    parser.add_argument("--presupuesto", type=int, default=1024, help="Presupuesto de tokens del contexto (0 = sin límite)")
+    parser.add_argument("--latencia-llm", type=float, default=0.05)
+    parser.add_argument("--latencia-por-token", type=float, default=0.0005, help="Segundos por token de entrada")
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--detalle", action="store_true", help="Mostrar cada consulta")
+    args = parser.parse_args()
+
+    preparar_entorno_aislado()
+    os.environ["CACHE_RESPUESTAS_MAX"] = "0"
+    shutil.copytree(os.path.join(RAIZ, "documents"), "documents")
+
+    from app.registro import registro
+    from app.bm25 import almacen_bm25
+    from app.cargar_en_chroma_db import indexar_documentos
+
+    registro.fabrica_embeddings = lambda modelo: EmbeddingsSimulados()
+    with contextlib.redirect_stdout(io.StringIO()):
+        indexar_documentos("documents/preprocessed", "chroma_db/preprocessed", flag_nuevo=False)
+        indexar_documentos("documents/uploaded", "chroma_db/uploaded", flag_nuevo=False)
+
+    indices = {}
+    for origen in ("preprocessed", "uploaded"):
+        for documento in os.listdir(os.path.join("documents", origen)):
+            indices[documento] = almacen_bm25.obtener(os.path.join("chroma_db", origen), documento)
+    consultas = generar_consultas(indices, args.consultas, 2, args.semilla)
+    llm = LLMSimulado(latencia=args.latencia_llm, latencia_por_token=args.latencia_por_token)
+
+    resumen = []
+    for k in args.k:
+        filas = medir(consultas, k, args.presupuesto, llm, args.detalle)
+        antes = sum(fila["tokens_antes"] for fila in filas)
+        despues = sum(fila["tokens_despues"] for fila in filas)
+        resumen.append((
+            k, statistics.fmean(fila["fragmentos"] for fila in filas), statistics.fmean(fila["bloques"] for fila in filas),
+            antes / len(filas), despues / len(filas), 1 - despues / antes,
+            sum(fila["tokens_despues"] < fila["tokens_antes"] for fila in filas) / len(filas),
+            statistics.median(fila["ensamblado_us"] for fila in filas),
+            statistics.median(fila["generacion_antes_ms"] for fila in filas),
+            statistics.median(fila["generacion_despues_ms"] for fila in filas),
+        ))
+
+    print(f"\n{len(consultas)} consultas, presupuesto de {args.presupuesto or 'sin límite'} tokens")
+    print(f"{'k':>3}{'frag':>6}{'bloq':>6}{'tokens antes':>14}{'después':>9}{'ahorro':>8}{'consultas con ahorro':>22}"
+          f"{'ensamblado p50 (µs)':>21}{'gen. p50 antes (ms)':>21}{'después (ms)':>14}")
+    for k, fragmentos, bloques, antes, despues, ahorro, con_ahorro, ensamblado, gen_antes, gen_despues in resumen:
+        print(f"{k:>3}{fragmentos:>6.1f}{bloques:>6.1f}{antes:>14.0f}{despues:>9.0f}{ahorro:>8.1%}{con_ahorro:>22.0%}"
+              f"{ensamblado:>21.0f}{gen_antes:>21.1f}{gen_despues:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark de la eliminación de fragmentos casi duplicados y de la selección diversa (MMR).
+
+Genera un PDF sintético cuyas páginas repiten un aviso legal con el número de página como
+encabezado (casi duplicados que la caché de embeddings no detecta, porque el texto no es
+idéntico) y un pie, y lo indexa junto con una copia de `documents/` con embeddings simulados:
+1. Ingesta con y sin DEDUP_FRAGMENTOS: fragmentos indexados, descartados, proporción de
+   duplicados, textos enviados al modelo de embeddings y tiempo.
+2. Recuperación sobre el índice sin deduplicar: fragmentos distintos (que no son casi
+   duplicados de otro del top-k) al tomar los k primeros del ranking frente a MMR, para
+   consultas sobre el aviso repetido y sobre el contenido de cada página.
+
+Uso:
+    python -m benchmarks.benchmark_duplicados --paginas 40 --k 3 6
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import statistics
+import time
+from benchmarks.benchmark_memoria_ingesta import RAIZ, generar_pdf
+from benchmarks.stubs import EmbeddingsSimulados, preparar_entorno_aislado
+
+ENCABEZADO = [
+    "Boletin trimestral - pagina {pagina}",
+    "Aviso legal: este boletin es de uso interno y no constituye",
+    "asesoramiento financiero ni una oferta de compra o venta de",
+    "valores. Los resultados pasados no garantizan resultados futuros",
+    "y toda inversion implica riesgos, incluida la perdida del capital.",
+    "Consulte a un profesional antes de tomar decisiones de inversion",
+    "y lea el prospecto completo disponible en las oficinas centrales.",
+    "Prohibida su reproduccion total o parcial sin autorizacion previa.",
+]
+PIE = ["Boletin trimestral de la empresa - pagina {pagina} - documento confidencial"]
+
+
+def ingerir(dedup, directorio, persist_directory):
+    """
+    Indexa `directorio` con DEDUP_FRAGMENTOS activado o no.
+
+    Returns:
+        tuple: (ReporteIngesta, textos embebidos, segundos).
+    """
+    from app import cargar_en_chroma_db
+
+    cargar_en_chroma_db.DEDUP_FRAGMENTOS = dedup
+    embeddings = EmbeddingsSimulados(dimension=768)
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        reporte = cargar_en_chroma_db.indexar_documentos(directorio, persist_directory, flag_nuevo=True, embeddings=embeddings)
+    return reporte, embeddings.textos_embebidos, time.perf_counter() - inicio
+
+
+def distintos(documentos, umbral):
+    """
+    Cuenta los fragmentos que no son casi duplicados (SimHash) de uno anterior de la lista.
+    """
+    from app.duplicados import IndiceSimHash, huella_simhash
+
+    indice, cuenta = IndiceSimHash(umbral), 0
+    for posicion, doc in enumerate(documentos):
+        huella = huella_simhash(doc.page_content)
+        if indice.buscar(huella) is None:
+            cuenta += 1
+        indice.agregar(huella, posicion)
+    return cuenta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", type=int, default=40)
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 6])
+    parser.add_argument("--consultas", type=int, default=20, help="Consultas sobre el contenido de las páginas")
+    parser.add_argument("--semilla", type=int, default=7)
+    args = parser.parse_args()
+
+    base = preparar_entorno_aislado()
+    os.environ["CACHE_RESPUESTAS_MAX"] = "0"
+    from app.registro import registro
+    registro.fabrica_embeddings = lambda modelo: EmbeddingsSimulados(dimension=768)
+
+    # Mismo contenido en dos directorios (con nombres distintos para el enrutador)
+    for sufijo in ("con", "sin"):
+        directorio = os.path.join(base, f"documentos_{sufijo}")
+        shutil.copytree(os.path.join(RAIZ, "documents", "preprocessed"), directorio)
+        generar_pdf(os.path.join(directorio, f"boletin_{sufijo}.pdf"), args.paginas, lineas_por_pagina=14,
+                    semilla=args.semilla, encabezado=ENCABEZADO, pie=PIE)
+        for nombre in os.listdir(directorio):
+            raiz, extension = os.path.splitext(nombre)
+            if not raiz.startswith("boletin"):
+                os.rename(os.path.join(directorio, nombre), os.path.join(directorio, f"{raiz}_{sufijo}{extension}"))
+
+    print(f"PDF sintético de {args.paginas} páginas con encabezado y pie repetidos, más documents/preprocessed\n")
+    print(f"{'Deduplicación':<15}{'indexados':>11}{'descartados':>13}{'duplicados':>12}{'embebidos':>11}{'segundos':>10}")
+    reportes = {}
+    for dedup, sufijo in ((False, "sin"), (True, "con")):
+        reporte, embebidos, segundos = ingerir(dedup, os.path.join(base, f"documentos_{sufijo}"), f"chroma_db/{sufijo}")
+        reportes[dedup] = reporte
+        print(f"{'sí' if dedup else 'no':<15}{reporte.fragmentos:>11}{reporte.fragmentos_duplicados:>13}"
+              f"{reporte.tasa_duplicados:>12.1%}{embebidos:>11}{segundos:>10.2f}")
+    assert reportes[True].fragmentos < reportes[False].fragmentos, "La deduplicación no descartó fragmentos"
+    assert reportes[False].fragmentos_duplicados == 0
+
+    from app import services
+    from app.bm25 import almacen_bm25
+    from app.duplicados import UMBRAL_SIMHASH
+
+    # Consultas: el aviso repetido y frases del contenido propio de cada página
+    indice = almacen_bm25.obtener("chroma_db/sin", "boletin_sin.pdf")
+    aleatorio = random.Random(args.semilla)
+    consultas = [" ".join(ENCABEZADO[1:3])]
+    for texto in aleatorio.sample(indice.textos, min(args.consultas, len(indice.textos))):
+        palabras = texto.split()
+        inicio = aleatorio.randrange(max(1, len(palabras) - 6))
+        consultas.append(" ".join(palabras[inicio:inicio + 6]))
+
+    seleccionar_mmr = services.seleccionar_mmr
+    print(f"\n{len(consultas)} consultas sobre boletin_sin.pdf (índice sin deduplicar)")
+    print(f"{'k':>3}{'distintos top-k':>17}{'distintos MMR':>15}{'aviso top-k':>13}{'aviso MMR':>11}{'MMR (µs)':>10}")
+    for k in args.k:
+        filas = {}
+        for nombre in ("topk", "mmr"):
+            services.seleccionar_mmr = seleccionar_mmr if nombre == "mmr" else (lambda documentos, k, completar=True: documentos[:k])
+            filas[nombre] = [
+                distintos(services._recuperar([consulta], "boletin_sin.pdf", None, k, True, None)[0], UMBRAL_SIMHASH)
+                for consulta in consultas
+            ]
+        services.seleccionar_mmr = seleccionar_mmr
+
+        candidatos, = services._recuperar([consultas[0]], "boletin_sin.pdf", None, 2 * k, True, None)
+        inicio = time.perf_counter()
+        for _ in range(200):
+            seleccionar_mmr(candidatos, k)
+        mmr_us = (time.perf_counter() - inicio) / 200 * 1e6
+
+        print(f"{k:>3}{statistics.fmean(filas['topk']):>17.2f}{statistics.fmean(filas['mmr']):>15.2f}"
+              f"{filas['topk'][0]:>13}{filas['mmr'][0]:>11}{mmr_us:>10.0f}")
+        assert filas["mmr"][0] > filas["topk"][0], "MMR debería diversificar la consulta sobre el aviso repetido"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark del índice de enrutamiento documento -> colección/shard.
+
+Indexa una copia de `documents/` con el origen `uploaded` particionado en varios shards y un
+modelo de embeddings simulado. Luego compara el costo de resolver el store de un documento
+con el índice en memoria frente al sondeo del sistema de archivos usado antes, y ejecuta una
+consulta que abarca varios documentos (fan-out y fusión de resultados).
+
+Uso:
+    python -m benchmarks.benchmark_enrutamiento --shards 3
+"""
+
+import argparse
+import os
+import shutil
+import time
+from benchmarks.stubs import EmbeddingsSimulados, preparar_entorno_aislado
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sondeo_sistema_archivos(documento):
+    # Resolución anterior: revisar las carpetas de documentos en cada consulta
+    for origen in ("preprocessed", "uploaded"):
+        if os.path.exists(os.path.join("documents", origen, documento)):
+            return origen
+    raise FileNotFoundError(documento)
+
+
+def medir(funcion, documentos, repeticiones=2000):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for documento in documentos:
+            funcion(documento)
+    return (time.perf_counter() - inicio) / (repeticiones * len(documentos)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, default=3)
+    parser.add_argument("--copias", type=int, default=3)
+    args = parser.parse_args()
+
+    preparar_entorno_aislado()
+    os.environ["NUM_SHARDS_UPLOADED"] = str(args.shards)
+    shutil.copytree(os.path.join(RAIZ, "documents", "preprocessed"), "documents/preprocessed")
+    os.makedirs("documents/uploaded")
+    for copia in range(args.copias):
+        shutil.copy2(os.path.join(RAIZ, "documents", "uploaded", "HowtoStartAStartUp.pdf"), f"documents/uploaded/startup_{copia}.pdf")
+
+    from app.registro import registro
+    from app.enrutador import enrutador, IndiceEnrutamiento
+    from app.cargar_en_chroma_db import indexar_documentos
+    from app.services import retrieve
+    from app.models import SolicitudConsulta
+
+    embeddings = EmbeddingsSimulados()
+    registro.fabrica_embeddings = lambda modelo: embeddings
+    indexar_documentos("documents/preprocessed", "chroma_db/preprocessed", flag_nuevo=False)
+    reporte = indexar_documentos("documents/uploaded", "chroma_db/uploaded", flag_nuevo=False)
+
+    # Un índice nuevo reconstruido desde los manifiestos debe coincidir con el actualizado en la ingesta
+    reconstruido = IndiceEnrutamiento()
+    documentos = sorted(os.listdir("documents/preprocessed")) + reporte.documentos
+    for documento in documentos:
+        assert reconstruido.resolver(documento) == enrutador.resolver(documento)
+        print(f"{documento:<24} -> {os.path.relpath(enrutador.resolver(documento))}")
+
+    print(f"Resolución con índice en memoria:   {medir(enrutador.resolver, documentos):6.2f} µs/consulta")
+    print(f"Resolución sondeando el disco:      {medir(sondeo_sistema_archivos, documentos):6.2f} µs/consulta")
+
+    state = SolicitudConsulta(user_name="bench", question="How to start a startup with good ideas?")
+    inicio = time.perf_counter()
+    contexto = retrieve(state, reporte.documentos, k=3)["context"]
+    print(f"Fan-out sobre {len(reporte.documentos)} documentos en {args.shards} shards: "
+          f"{len(contexto)} fragmentos únicos (las copias son idénticas) en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark offline de relevancia de la recuperación: vectorial frente a híbrida (vectorial + BM25).
+
+Indexa una copia de `documents/` con un modelo de embeddings simulado y genera consultas
+sintéticas a partir de los propios fragmentos: cada consulta combina los términos más raros
+de un fragmento (nombres, números, códigos) con palabras genéricas de una pregunta, y ese
+fragmento es la respuesta relevante. Reporta recall@k y la latencia p50/p99 de `retrieve()`
+en modo solo vectorial y en modo híbrido con distintos pesos (peso vectorial:peso BM25).
+
+Los embeddings simulados son una bolsa de palabras con hash, por lo que las cifras absolutas
+no representan a Cohere; el benchmark sirve para comparar modos y detectar regresiones.
+
+Uso:
+    python -m benchmarks.benchmark_hibrida --consultas 150 --k 3 --pesos 0:1 1:1 1:2
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import time
+from benchmarks.stubs import EmbeddingsSimulados, preparar_entorno_aislado
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PLANTILLAS = {
+    "es": "¿Qué dice el documento sobre {terminos}?",
+    "en": "What does the document say about {terminos}?",
+}
+
+
+def generar_consultas(indices, cantidad, terminos_por_consulta, semilla):
+    """
+    Genera consultas sintéticas con su fragmento relevante.
+
+    Returns:
+        list: Tuplas (documento, pregunta, texto del fragmento relevante).
+    """
+    from app.bm25 import tokenizar
+
+    aleatorio = random.Random(semilla)
+    candidatos = []
+    for documento, indice in indices.items():
+        for posicion, texto in enumerate(indice.textos):
+            terminos = sorted(set(t for t in tokenizar(texto) if len(t) > 3), key=indice.idf, reverse=True)
+            if len(terminos) >= terminos_por_consulta:
+                candidatos.append((documento, texto, terminos[:terminos_por_consulta * 2]))
+
+    consultas = []
+    for documento, texto, terminos in aleatorio.sample(candidatos, min(cantidad, len(candidatos))):
+        elegidos = aleatorio.sample(terminos, terminos_por_consulta)
+        plantilla = PLANTILLAS["es" if documento.endswith(".docx") else "en"]
+        consultas.append((documento, plantilla.format(terminos=" ".join(elegidos)), texto))
+    return consultas
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def evaluar(consultas, k, hibrida, pesos=(1.0, 1.0)):
+    from app import services
+    from app.services import retrieve
+    from app.models import SolicitudConsulta
+
+    services.PESO_VECTORIAL, services.PESO_BM25 = pesos
+
+    aciertos, latencias = 0, []
+    for documento, pregunta, relevante in consultas:
+        state = SolicitudConsulta(user_name="bench", question=pregunta)
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            contexto = retrieve(state, documento, k=k, hibrida=hibrida)["context"]
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        # El fragmento relevante puede llegar fusionado con sus vecinos en un bloque mayor
+        aciertos += any(relevante in bloque for bloque in contexto)
+    return aciertos / len(consultas), percentil(latencias, 50), percentil(latencias, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--consultas", type=int, default=150)
+    parser.add_argument("--terminos", type=int, default=2, help="Términos raros por consulta")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--pesos", nargs="+", default=["0:1", "1:1", "1:2"], help="Pesos vectorial:BM25 a evaluar")
+    args = parser.parse_args()
+
+    preparar_entorno_aislado()
+    os.environ["CACHE_RESPUESTAS_MAX"] = "0"
+    shutil.copytree(os.path.join(RAIZ, "documents"), "documents")
+
+    from app.registro import registro
+    from app.bm25 import almacen_bm25
+    from app.cargar_en_chroma_db import indexar_documentos
+
+    registro.fabrica_embeddings = lambda modelo: EmbeddingsSimulados()
+    with contextlib.redirect_stdout(io.StringIO()):
+        indexar_documentos("documents/preprocessed", "chroma_db/preprocessed", flag_nuevo=False)
+        indexar_documentos("documents/uploaded", "chroma_db/uploaded", flag_nuevo=False)
+
+    indices = {}
+    for origen in ("preprocessed", "uploaded"):
+        for documento in os.listdir(os.path.join("documents", origen)):
+            indices[documento] = almacen_bm25.obtener(os.path.join("chroma_db", origen), documento)
+    consultas = generar_consultas(indices, args.consultas, args.terminos, args.semilla)
+    print(f"{len(consultas)} consultas sintéticas sobre {len(indices)} documentos "
+          f"({sum(len(i.ids) for i in indices.values())} fragmentos)")
+
+    evaluar(consultas[:5], args.k, hibrida=True)  # Calentamiento (carga de índices y clientes)
+    modos = [("vectorial", False, (1.0, 0.0))]
+    for pesos in args.pesos:
+        vectorial, bm25 = (float(p) for p in pesos.split(":"))
+        modos.append((f"híbrida {pesos}", True, (vectorial, bm25)))
+
+    print(f"{'Modo':<16}{'recall@' + str(args.k):>10}{'p50 (ms)':>12}{'p99 (ms)':>12}")
+    for nombre, hibrida, pesos in modos:
+        recall, p50, p99 = evaluar(consultas, args.k, hibrida, pesos)
+        print(f"{nombre:<16}{recall:>10.2%}{p50:>12.2f}{p99:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
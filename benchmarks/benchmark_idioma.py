@@ -0,0 +1,74 @@
+"""
+Benchmark de precisión y latencia de los detectores de idioma.
+
+Evalúa el detector local (perfiles) y el detector con respaldo LLM sobre el corpus
+`benchmarks/corpus_idioma.jsonl`. El LLM de respaldo es un oráculo simulado con latencia
+fija, de modo que el benchmark mide cuántas consultas escalan y cuánto cuesta en tiempo.
+
+Uso:
+    python -m benchmarks.benchmark_idioma --umbral 0.6 --latencia-llm 0.3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from app.idioma import DetectorConRespaldo, DetectorLLM, DetectorPerfiles
+
+CORPUS = os.path.join(os.path.dirname(__file__), "corpus_idioma.jsonl")
+
+
+def cargar_corpus(ruta=CORPUS):
+    with open(ruta, encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
+
+
+def evaluar(detector, corpus):
+    aciertos = 0
+    tiempos = []
+    for ejemplo in corpus:
+        inicio = time.perf_counter()
+        resultado = detector.detectar(ejemplo["texto"])
+        tiempos.append(time.perf_counter() - inicio)
+        if resultado.idioma == ejemplo["idioma"]:
+            aciertos += 1
+        else:
+            print(f"  fallo: {ejemplo['texto']!r} -> {resultado}")
+    return {
+        "precision": aciertos / len(corpus),
+        "latencia_media_ms": statistics.mean(tiempos) * 1000,
+        "latencia_p99_ms": sorted(tiempos)[int(len(tiempos) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--umbral", type=float, default=0.6)
+    parser.add_argument("--latencia-llm", type=float, default=0.3)
+    args = parser.parse_args()
+
+    corpus = cargar_corpus()
+    etiquetas = {ejemplo["texto"]: ejemplo["idioma"] for ejemplo in corpus}
+    llamadas_llm = []
+
+    def oraculo(prompt):
+        # Recupera la pregunta del prompt few-shot y responde con la etiqueta correcta
+        llamadas_llm.append(prompt)
+        time.sleep(args.latencia_llm)
+        pregunta = prompt.rsplit("Pregunta:", 1)[1].split("Respuesta:")[0].strip()
+        return etiquetas.get(pregunta, "es")
+
+    print("Detector local (perfiles):")
+    local = evaluar(DetectorPerfiles(), corpus)
+    print(json.dumps(local, indent=2))
+
+    print(f"Detector con respaldo LLM (umbral={args.umbral}):")
+    combinado = evaluar(DetectorConRespaldo(DetectorPerfiles(), DetectorLLM(oraculo), args.umbral), corpus)
+    combinado["consultas_escaladas_al_llm"] = len(llamadas_llm)
+    combinado["total_consultas"] = len(corpus)
+    print(json.dumps(combinado, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Micro-benchmark de la búsqueda vectorial: Chroma frente al backend matricial (exacto e IVF).
+
+1. Indexa una copia de `documents/` con embeddings simulados y mide la latencia por consulta
+   de la búsqueda vectorial de un documento por Chroma y por la matriz en memoria, además de
+   la coincidencia del top-3 entre ambos.
+2. Genera un documento sintético grande (vectores agrupados al azar), lo escribe en Chroma y
+   compara la latencia de Chroma, del índice exacto y del índice IVF, junto con el recall@10
+   del IVF respecto del exacto.
+
+Uso:
+    python -m benchmarks.benchmark_indice_matricial --filas 20000 --consultas 200
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import time
+import numpy as np
+from benchmarks.stubs import EmbeddingsSimulados, preparar_entorno_aislado
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIMENSION = 768  # Dimensión de embed-multilingual-v2.0
+
+
+def latencias(funcion, consultas):
+    tiempos = []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        funcion(consulta)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return np.percentile(tiempos, 50), np.percentile(tiempos, 99)
+
+
+def imprimir(nombre, p50, p99):
+    print(f"  {nombre:<22}{p50:>10.3f}{p99:>10.3f}")
+
+
+def documentos_incluidos(consultas_por_documento):
+    from app import services
+    from app.registro import registro
+    from app.cargar_en_chroma_db import indexar_documentos
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        indexar_documentos("documents/preprocessed", "chroma_db/preprocessed", flag_nuevo=False)
+        indexar_documentos("documents/uploaded", "chroma_db/uploaded", flag_nuevo=False)
+
+    embeddings = registro.embeddings()
+    for documento in ("documento.docx", "story_amarok.pdf", "HowtoStartAStartUp.pdf"):
+        ruta = services.obtener_origen_documento(documento)
+        fragmentos = services._indice_bm25(ruta, documento)
+        textos = fragmentos.textos[:consultas_por_documento]
+        vectores = [embeddings.embed_query(" ".join(texto.split()[:12])) for texto in textos]
+
+        coincidencias = sum(
+            [d.id for d, _ in services._buscar_vectorial(ruta, [documento], v, 3)]
+            == [d.id for d, _ in services._buscar_matricial(ruta, [documento], v, 3)]
+            for v in vectores
+        )
+        print(f"{documento} ({len(fragmentos.ids)} fragmentos), top-3 idéntico en {coincidencias}/{len(vectores)} consultas")
+        print(f"  {'Backend':<22}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+        imprimir("chroma", *latencias(lambda v: services._buscar_vectorial(ruta, [documento], v, 10), vectores))
+        imprimir("matricial", *latencias(lambda v: services._buscar_matricial(ruta, [documento], v, 10), vectores))
+
+
+def documento_sintetico(filas, cantidad_consultas, nprobe):
+    from app.registro import registro
+    from app.indice_matricial import AlmacenMatrices, normalizar_filas
+
+    # Vectores agrupados alrededor de centros al azar, como los fragmentos de temas distintos
+    aleatorio = np.random.default_rng(0)
+    centros = normalizar_filas(aleatorio.normal(size=(200, DIMENSION)))
+    asignacion = aleatorio.integers(0, len(centros), filas)
+    vectores = normalizar_filas(centros[asignacion] + 0.6 * normalizar_filas(aleatorio.normal(size=(filas, DIMENSION))))
+    ids = [f"sintetico:{i}" for i in range(filas)]
+
+    persist_directory = "chroma_db/sintetico"
+    coleccion = registro.store(persist_directory)._collection
+    for inicio in range(0, filas, 5000):
+        coleccion.upsert(
+            ids=ids[inicio:inicio + 5000], embeddings=vectores[inicio:inicio + 5000].tolist(),
+            metadatas=[{"document": "sintetico.pdf"}] * len(ids[inicio:inicio + 5000]),
+            documents=[""] * len(ids[inicio:inicio + 5000])
+        )
+
+    inicio = time.perf_counter()
+    exacto = AlmacenMatrices(umbral_ann=filas + 1).construir("matrices_exacto", "sintetico.pdf", ids, vectores)
+    print(f"\nDocumento sintético ({filas} fragmentos): índice exacto construido en {time.perf_counter() - inicio:.2f}s", end="")
+    inicio = time.perf_counter()
+    ivf = AlmacenMatrices(umbral_ann=0).construir("matrices_ivf", "sintetico.pdf", ids, vectores)
+    print(f", IVF ({len(ivf.centroides)} listas) en {time.perf_counter() - inicio:.2f}s")
+
+    consultas = normalizar_filas(centros[aleatorio.integers(0, len(centros), cantidad_consultas)]
+                                 + 0.6 * normalizar_filas(aleatorio.normal(size=(cantidad_consultas, DIMENSION))))
+    recall = np.mean([
+        len({i for i, _ in exacto.buscar(c, 10)} & {i for i, _ in ivf.buscar(c, 10, nprobe)}) / 10 for c in consultas
+    ])
+    print(f"  {'Backend':<22}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    imprimir("chroma", *latencias(lambda c: coleccion.query(
+        query_embeddings=[c.tolist()], n_results=10, where={"document": "sintetico.pdf"}, include=["distances"]
+    ), consultas))
+    imprimir("matricial exacto", *latencias(lambda c: exacto.buscar(c, 10), consultas))
+    imprimir(f"matricial IVF (nprobe={nprobe})", *latencias(lambda c: ivf.buscar(c, 10, nprobe), consultas))
+    print(f"  Recall@10 del IVF frente al exacto: {recall:.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=20000, help="Fragmentos del documento sintético")
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    preparar_entorno_aislado()
+    os.environ["CACHE_RESPUESTAS_MAX"] = "0"
+    shutil.copytree(os.path.join(RAIZ, "documents"), "documents")
+
+    from app.registro import registro
+    registro.fabrica_embeddings = lambda modelo: EmbeddingsSimulados(dimension=DIMENSION)
+
+    documentos_incluidos(args.consultas)
+    documento_sintetico(args.filas, args.consultas, args.nprobe)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark de la API de consultas por lotes frente a procesar_consulta pregunta a pregunta.
+
+Indexa una copia de `documents/` con embeddings simulados (con latencia por llamada) y responde
+las preguntas de `corpus_idioma.jsonl` sobre un documento con un LLM simulado:
+1. Secuencial: procesar_consulta para cada pregunta (sin caché).
+2. Lote: procesar_lote con concurrencia acotada.
+3. Lote contra un LLM que responde 429 cuando recibe más llamadas simultáneas que su límite,
+   para verificar que los reintentos completan todas las preguntas.
+
+Uso:
+    python -m benchmarks.benchmark_lote --preguntas 40 --concurrencia 8 --latencia-llm 0.2
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import threading
+import time
+from benchmarks.stubs import EmbeddingsSimulados, LLMSimulado, preparar_entorno_aislado
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LLMConLimiteDeTasa(LLMSimulado):
+    """
+    LLM simulado que rechaza con HTTP 429 las llamadas que superan un máximo de llamadas simultáneas.
+    """
+
+    def __init__(self, limite, **kwargs):
+        super().__init__(**kwargs)
+        self.limite = limite
+        self.en_curso = 0
+        self.rechazos = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, prompt):
+        import cohere
+
+        with self._lock:
+            if self.en_curso >= self.limite:
+                self.rechazos += 1
+                raise cohere.TooManyRequestsError(body="rate limited", headers={"retry-after": "0.05"})
+            self.en_curso += 1
+        try:
+            return super().invoke(prompt)
+        finally:
+            with self._lock:
+                self.en_curso -= 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preguntas", type=int, default=40)
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--latencia-llm", type=float, default=0.2)
+    parser.add_argument("--latencia-embeddings", type=float, default=0.05)
+    parser.add_argument("--limite-tasa", type=int, default=3, help="Llamadas simultáneas que admite el LLM con límite")
+    args = parser.parse_args()
+
+    preparar_entorno_aislado()
+    os.environ["CACHE_RESPUESTAS_MAX"] = "0"
+    os.environ.setdefault("ESPERA_BASE_REINTENTO", str(args.latencia_llm / 2))
+    shutil.copytree(os.path.join(RAIZ, "documents"), "documents")
+    with open(os.path.join(RAIZ, "benchmarks", "corpus_idioma.jsonl"), encoding="utf-8") as f:
+        textos = [json.loads(linea)["texto"] for linea in f if linea.strip()]
+
+    from app import services
+    from app.registro import registro
+    from app.cache_embeddings import CacheEmbeddings
+    from app.cargar_en_chroma_db import indexar_documentos
+    from app.lote import procesar_lote
+    from app.models import SolicitudConsulta
+
+    # Caché de embeddings en un directorio propio para que cada pregunta sea un fallo de caché
+    registro.fabrica_embeddings = lambda modelo: CacheEmbeddings(
+        EmbeddingsSimulados(latencia=args.latencia_embeddings), modelo, directorio="cache_bench"
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        indexar_documentos("documents/preprocessed", "chroma_db/preprocessed", flag_nuevo=False)
+
+    documento = "story_amarok.pdf"
+    solicitudes = [
+        SolicitudConsulta(user_name="qa", question=f"{textos[i % len(textos)]} ({i})") for i in range(args.preguntas)
+    ]
+    mitad = len(solicitudes) // 2
+
+    services.llm = LLMSimulado(latencia=args.latencia_llm)
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for state in solicitudes[:mitad]:
+            services.procesar_consulta(state, documento, 0)
+    secuencial = (time.perf_counter() - inicio) / mitad * len(solicitudes)
+    print(f"Secuencial (procesar_consulta):  {secuencial:6.2f}s estimados para {len(solicitudes)} preguntas "
+          f"(medido sobre {mitad})")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        lote = procesar_lote(solicitudes, documento, max_concurrencia=args.concurrencia)
+    print(f"Lote (concurrencia={args.concurrencia}):         {lote.segundos:6.2f}s -> {lote}")
+
+    services.llm = LLMConLimiteDeTasa(args.limite_tasa, latencia=args.latencia_llm)
+    with contextlib.redirect_stdout(io.StringIO()):
+        lote = procesar_lote(solicitudes, documento, max_concurrencia=args.concurrencia)
+    print(f"Lote con límite de {args.limite_tasa} llamadas:    {lote.segundos:6.2f}s -> {lote} "
+          f"({services.llm.rechazos} respuestas 429)")
+    respondidas = sum(1 for resultado in lote.resultados if resultado["answer"])
+    print(f"Preguntas respondidas: {respondidas}/{len(solicitudes)}")
+
+
+if __name__ == "__main__":
+    main()
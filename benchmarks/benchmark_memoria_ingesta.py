@@ -0,0 +1,142 @@
+"""
+Benchmark de memoria de la ingesta con PDF sintéticos de distinto tamaño.
+
+Genera PDF de texto con el número de páginas indicado e indexa cada uno en un proceso nuevo
+con embeddings simulados (768 dimensiones, como Cohere). Para cada tamaño mide:
+- pico_rss_mb: crecimiento del pico de memoria residente (VmHWM) durante la ingesta respecto
+  de la memoria tras las importaciones. Incluye el índice HNSW de Chroma, que sí crece con los
+  fragmentos indexados.
+- pico_python_mb: pico de memoria reservada desde Python (tracemalloc) durante la ingesta:
+  páginas, fragmentos, lotes y vectores en vuelo del pipeline, más el índice BM25.
+- paginas_por_s: rendimiento de la ingesta (con tracemalloc activo, por lo que es menor que
+  el real).
+
+Con la lectura página a página, pico_rss_mb debería crecer solo con el índice y no con el
+tamaño del archivo leído de una vez.
+
+Uso:
+    python -m benchmarks.benchmark_memoria_ingesta --paginas 100 400 1600
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def generar_pdf(ruta, paginas, lineas_por_pagina=20, palabras_por_linea=12, semilla=0, encabezado=(), pie=()):
+    """
+    Escribe un PDF de texto (Helvetica) con palabras aleatorias, sin dependencias externas.
+
+    Parameters:
+        ruta (str): Archivo de destino.
+        paginas (int): Número de páginas.
+        lineas_por_pagina (int): Líneas de texto por página.
+        palabras_por_linea (int): Palabras por línea.
+        semilla (int): Semilla del generador de palabras.
+        encabezado (list): Líneas repetidas al comienzo de cada página; admiten {pagina}.
+        pie (list): Líneas repetidas al final de cada página; admiten {pagina}.
+    """
+    aleatorio = random.Random(semilla)
+    vocabulario = ["".join(aleatorio.choices("abcdefghijklmnopqrstuvwxyz", k=aleatorio.randint(3, 9))) for _ in range(3000)]
+
+    # Objetos 1 (catálogo), 2 (árbol de páginas) y 3 (fuente); luego contenido y página por cada hoja
+    objetos = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    hojas = []
+    for pagina in range(1, paginas + 1):
+        textos = [linea.format(pagina=pagina) for linea in encabezado]
+        textos += [" ".join(aleatorio.choices(vocabulario, k=palabras_por_linea)) for _ in range(lineas_por_pagina)]
+        textos += [linea.format(pagina=pagina) for linea in pie]
+        lineas = [f"({texto}) Tj 0 -14 Td" for texto in textos]
+        flujo = ("BT /F1 10 Tf 40 800 Td " + " ".join(lineas) + " ET").encode("latin-1")
+        objetos.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(flujo), flujo))
+        objetos.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objetos)))
+        hojas.append(len(objetos))
+    objetos[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % hoja for hoja in hojas), len(hojas))
+
+    with open(ruta, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        posiciones = []
+        for numero, objeto in enumerate(objetos, 1):
+            posiciones.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (numero, objeto))
+        inicio_xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1))
+        f.writelines(b"%010d 00000 n \n" % posicion for posicion in posiciones)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref))
+
+
+def memoria_mb(campo):
+    with open("/proc/self/status") as f:
+        for linea in f:
+            if linea.startswith(campo + ":"):
+                return int(linea.split()[1]) / 1024
+    return 0.0
+
+
+def medir(directorio):
+    """
+    Indexa `directorio` en el proceso actual e imprime las mediciones en JSON.
+    """
+    from benchmarks.stubs import EmbeddingsSimulados, preparar_entorno_aislado
+    preparar_entorno_aislado()
+    from app.cargar_en_chroma_db import indexar_documentos
+
+    # Ingesta de calentamiento para que las importaciones diferidas no cuenten en el pico
+    calentamiento = os.path.abspath("calentamiento")
+    os.makedirs(calentamiento)
+    generar_pdf(os.path.join(calentamiento, "calentamiento.pdf"), 2)
+    indexar_documentos(calentamiento, "chroma_calentamiento", flag_nuevo=True, embeddings=EmbeddingsSimulados(dimension=768))
+
+    rss_inicial = memoria_mb("VmRSS")
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    reporte = indexar_documentos(directorio, "chroma_db", flag_nuevo=True, embeddings=EmbeddingsSimulados(dimension=768))
+    segundos = time.perf_counter() - inicio
+    _, pico_python = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(json.dumps({
+        "paginas": reporte.paginas,
+        "fragmentos": reporte.fragmentos,
+        "pico_rss_mb": round(memoria_mb("VmHWM") - rss_inicial, 1),
+        "pico_python_mb": round(pico_python / 2**20, 1),
+        "paginas_por_s": round(reporte.paginas / segundos, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", type=int, nargs="+", default=[100, 400, 1600])
+    parser.add_argument("--medir", help=argparse.SUPPRESS)  # Directorio a indexar (proceso hijo)
+    args = parser.parse_args()
+
+    if args.medir:
+        medir(os.path.abspath(args.medir))
+        return
+
+    from benchmarks.stubs import preparar_entorno_aislado
+    base = preparar_entorno_aislado()
+    print(f"{'Páginas':>8}{'MB del PDF':>12}{'fragmentos':>12}{'pico RSS (MB)':>15}{'pico Python (MB)':>18}{'páginas/s':>11}")
+    for paginas in args.paginas:
+        directorio = os.path.join(base, f"pdf_{paginas}")
+        os.makedirs(directorio)
+        ruta = os.path.join(directorio, f"sintetico_{paginas}.pdf")
+        generar_pdf(ruta, paginas)
+        salida = subprocess.run(
+            [sys.executable, "-m", "benchmarks.benchmark_memoria_ingesta", "--medir", directorio],
+            cwd=RAIZ, capture_output=True, text=True, check=True,
+        ).stdout
+        medicion = json.loads(salida.strip().splitlines()[-1])
+        print(f"{paginas:>8}{os.path.getsize(ruta) / 2**20:>12.1f}{medicion['fragmentos']:>12}{medicion['pico_rss_mb']:>15.1f}"
+              f"{medicion['pico_python_mb']:>18.1f}{medicion['paginas_por_s']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
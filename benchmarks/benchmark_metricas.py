@@ -0,0 +1,121 @@
+"""
+Benchmark de la instrumentación por etapas: costo de los spans y lectura del endpoint /metrics.
+
+1. Mide el costo por span con y sin archivo de trazas, y el de un logger.debug desactivado
+   frente al print de los fragmentos recuperados que se hacía antes en retrieve().
+2. Ejecuta consultas en streaming sobre una copia de `documents/` con LLM y embeddings
+   simulados, lee http://127.0.0.1:<puerto>/metrics y muestra los percentiles por etapa,
+   los tokens contados y las líneas escritas en el archivo de trazas.
+
+Uso:
+    python -m benchmarks.benchmark_metricas --consultas 30 --puerto 9109
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import os
+import re
+import shutil
+import time
+import urllib.request
+from benchmarks.stubs import EmbeddingsSimulados, LLMSimulado, preparar_entorno_aislado
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PREGUNTAS = [
+    "¿Quién es el protagonista de la historia?",
+    "What is the main advice for founders?",
+    "¿Qué dice el documento sobre el equipo?",
+]
+
+
+def microsegundos(funcion, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones * 1e6
+
+
+def costo_instrumentacion(repeticiones):
+    from langchain_core.documents import Document
+    from app.metricas import RegistroMetricas, _logger_trazas
+
+    registro = RegistroMetricas()
+
+    def span():
+        with registro.span("recuperacion", documentos="doc.pdf", k=3) as s:
+            s["fragmentos"] = 3
+
+    print(f"Span sin trazas:             {microsegundos(span, repeticiones):8.2f} µs")
+    from app.metricas import configurar_trazas
+    escritor = configurar_trazas("logs/costo.jsonl")
+    print(f"Span con trazas (en cola):   {microsegundos(span, repeticiones):8.2f} µs")
+    escritor.stop()
+    _logger_trazas.handlers.clear()
+
+    docs = [Document(id=f"doc.pdf:{i}", page_content="texto de un fragmento " * 25, metadata={"page": i}) for i in range(3)]
+    logger = logging.getLogger("app.services")
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        costo_print = microsegundos(lambda: print(docs), repeticiones)
+    print(f"print(filtered_docs) previo: {costo_print:8.2f} µs (a /dev/null)")
+
+    def debug_desactivado():
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Fragmentos recuperados: %s", [doc.id for doc in docs])
+
+    print(f"logger.debug desactivado:    {microsegundos(debug_desactivado, repeticiones):8.2f} µs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--consultas", type=int, default=30)
+    parser.add_argument("--puerto", type=int, default=9109)
+    parser.add_argument("--repeticiones", type=int, default=20000)
+    args = parser.parse_args()
+
+    preparar_entorno_aislado()
+    os.environ["CACHE_RESPUESTAS_MAX"] = "0"
+    shutil.copytree(os.path.join(RAIZ, "documents"), "documents")
+
+    from app import services
+    from app.registro import registro
+    from app.models import SolicitudConsulta
+    from app.cargar_en_chroma_db import indexar_documentos
+    from app.metricas import configurar_trazas, iniciar_servidor_metricas, metricas
+
+    costo_instrumentacion(args.repeticiones)
+
+    registro.fabrica_embeddings = lambda modelo: EmbeddingsSimulados()
+    services.llm = LLMSimulado(latencia=0.05)
+    escritor = configurar_trazas("logs/trazas.jsonl")
+    servidor = iniciar_servidor_metricas(args.puerto, host="127.0.0.1")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        indexar_documentos("documents/uploaded", "chroma_db/uploaded", flag_nuevo=False)
+        indexar_documentos("documents/preprocessed", "chroma_db/preprocessed", flag_nuevo=False)
+    for posicion in range(args.consultas):
+        state = SolicitudConsulta(user_name="bench", question=PREGUNTAS[posicion % len(PREGUNTAS)])
+        for _ in services.procesar_consulta_stream(state, "story_amarok.pdf", 0):
+            pass
+
+    with urllib.request.urlopen(f"http://127.0.0.1:{args.puerto}/metrics") as respuesta:
+        texto = respuesta.read().decode("utf-8")
+    servidor.shutdown()
+    escritor.stop()
+
+    print(f"\n/metrics: {len(texto.splitlines())} líneas")
+    print(f"  {'Etapa':<22}{'cantidad':>10}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}")
+    for etapa in sorted(set(re.findall(r'rag_etapa_segundos_count\{etapa="([^"]+)"\}', texto))):
+        resumen = metricas.resumen("etapa_segundos", etapa=etapa)
+        print(f"  {etapa:<22}{resumen['cantidad']:>10}{resumen['p50'] * 1000:>10.2f}"
+              f"{resumen['p95'] * 1000:>10.2f}{resumen['p99'] * 1000:>10.2f}")
+    for linea in texto.splitlines():
+        if linea.startswith("rag_tokens_total"):
+            print(f"  {linea}")
+    with open("logs/trazas.jsonl", encoding="utf-8") as f:
+        print(f"Trazas escritas: {sum(1 for _ in f)} líneas en logs/trazas.jsonl")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark del arranque de un contenedor nuevo con y sin paquete de índices precalculado.
+
+Construye el paquete de una copia de `documents/` con embeddings simulados (con una latencia
+por llamada que imita la de la API) y arranca varias "réplicas", cada una en un directorio
+nuevo sin `chroma_db/` y en un proceso nuevo, ejecutando la inicialización completa (calentar):
+1. sin paquete: se indexan todos los documentos;
+2. con paquete: se instala el paquete y no se calcula ningún embedding;
+3. paquete desactualizado: se agrega un documento que no está en el paquete; solo ese se indexa;
+4. paquete dañado: un byte cambiado en la base Chroma del paquete; la verificación lo rechaza y
+   se indexan todos los documentos.
+
+Uso:
+    python -m benchmarks.benchmark_paquete_indices --latencia-embeddings 0.5
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from benchmarks.benchmark_memoria_ingesta import RAIZ, generar_pdf
+
+
+def medir(directorio, paquete):
+    """
+    Arranca la aplicación en `directorio` (proceso actual) e imprime las mediciones en JSON.
+    """
+    from benchmarks.stubs import preparar_entorno_aislado
+    preparar_entorno_aislado()
+    os.chdir(directorio)
+    os.environ["RUTA_PAQUETE_INDICES"] = paquete
+    from app.arranque import calentar
+    from app.registro import registro
+
+    inicio = time.perf_counter()
+    documentos = calentar()
+    segundos = time.perf_counter() - inicio
+    embeddings = registro.embeddings().embeddings
+    print(json.dumps({
+        "documentos": len(documentos),
+        "segundos": round(segundos, 2),
+        "llamadas": embeddings.llamadas,
+        "textos_embebidos": embeddings.textos_embebidos,
+    }))
+
+
+def construir(directorio):
+    from benchmarks.stubs import preparar_entorno_aislado
+    preparar_entorno_aislado()
+    os.chdir(directorio)
+    from app.paquete_indices import construir_paquete
+    construir_paquete("paquete_indices")
+
+
+def ejecutar(*argumentos, entorno):
+    salida = subprocess.run(
+        [sys.executable, "-m", "benchmarks.benchmark_paquete_indices", *argumentos],
+        cwd=RAIZ, capture_output=True, text=True, check=True, env=entorno,
+    )
+    return salida.stdout.strip().splitlines()[-1] if salida.stdout.strip() else ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latencia-embeddings", type=float, default=0.5, help="Segundos por llamada de embeddings")
+    parser.add_argument("--medir", help=argparse.SUPPRESS)  # Directorio de la réplica (proceso hijo)
+    parser.add_argument("--paquete", default="", help=argparse.SUPPRESS)
+    parser.add_argument("--construir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        medir(args.medir, args.paquete)
+        return
+    if args.construir:
+        construir(args.construir)
+        return
+
+    from benchmarks.stubs import preparar_entorno_aislado
+    base = preparar_entorno_aislado()
+    entorno = {**os.environ, "LATENCIA_EMBEDDINGS_SIMULADOS": str(args.latencia_embeddings),
+               "PUERTO_METRICAS": "0", "ANONYMIZED_TELEMETRY": "False"}
+
+    def replica(nombre):
+        directorio = os.path.join(base, nombre)
+        shutil.copytree(os.path.join(RAIZ, "documents"), os.path.join(directorio, "documents"))
+        return directorio
+
+    construccion = replica("construccion")
+    inicio = time.perf_counter()
+    ejecutar("--construir", construccion, entorno=entorno)
+    segundos_construccion = time.perf_counter() - inicio
+    paquete = os.path.join(construccion, "paquete_indices")
+    with open(os.path.join(paquete, "paquete.json"), encoding="utf-8") as f:
+        descriptor = json.load(f)
+    print(f"Paquete {descriptor['version']} ({descriptor['modelo_embeddings']}): {len(descriptor['archivos'])} archivos, "
+          f"{sum(os.path.getsize(os.path.join(paquete, r)) for r in descriptor['archivos']) / 2**20:.1f} MB, "
+          f"construido en {segundos_construccion:.1f}s\n")
+
+    danado = os.path.join(base, "paquete_danado")
+    shutil.copytree(paquete, danado)
+    with open(os.path.join(danado, "preprocessed", "chroma.sqlite3"), "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        ultimo = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([ultimo[0] ^ 0xFF]))
+
+    escenarios = [("sin paquete", replica("sin_paquete"), os.path.join(base, "no_existe"))]
+    escenarios.append(("con paquete", replica("con_paquete"), paquete))
+    desactualizada = replica("desactualizada")
+    generar_pdf(os.path.join(desactualizada, "documents", "uploaded", "nuevo.pdf"), 4)
+    escenarios.append(("paquete desactualizado", desactualizada, paquete))
+    escenarios.append(("paquete dañado", replica("danado"), danado))
+
+    print(f"{'Arranque':<24}{'documentos':>11}{'segundos':>10}{'llamadas emb.':>15}{'textos embebidos':>18}")
+    resultados = {}
+    for nombre, directorio, ruta_paquete in escenarios:
+        resultados[nombre] = json.loads(ejecutar("--medir", directorio, "--paquete", ruta_paquete, entorno=entorno))
+        medicion = resultados[nombre]
+        print(f"{nombre:<24}{medicion['documentos']:>11}{medicion['segundos']:>10.2f}{medicion['llamadas']:>15}"
+              f"{medicion['textos_embebidos']:>18}")
+
+    assert resultados["con paquete"]["textos_embebidos"] == 0, "El arranque con paquete calculó embeddings"
+    assert 0 < resultados["paquete desactualizado"]["textos_embebidos"] < resultados["sin paquete"]["textos_embebidos"]
+    assert resultados["paquete dañado"]["textos_embebidos"] == resultados["sin paquete"]["textos_embebidos"]
+    print("\nOK: sin embeddings con el paquete, solo el documento nuevo si está desactualizado y "
+          "re-indexado completo si está dañado.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark de arranque: clientes Chroma creados por llamada vs. registro compartido.
+
+Reproduce la secuencia de aperturas del arranque de la aplicación (dos stores del módulo de
+servicios, una ingesta por origen y varias subidas) en un proceso nuevo por modo, y mide el
+tiempo total y la memoria residente (RSS) al terminar.
+
+Uso:
+    python -m benchmarks.benchmark_registro --subidas 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def ejecutar_modo(modo, subidas):
+    from benchmarks.stubs import preparar_entorno_aislado
+    preparar_entorno_aislado()
+    # Importar dependencias antes de medir para comparar solo la construcción de clientes
+    from langchain_chroma import Chroma
+    from langchain_cohere import CohereEmbeddings
+    from app.registro import RegistroVectores
+
+    rutas = ["chroma_db/preprocessed", "chroma_db/uploaded"]
+    secuencia = rutas + rutas + [rutas[1]] * subidas  # servicios + inicialización + subidas
+    registro = RegistroVectores(fabrica_embeddings=lambda modelo: CohereEmbeddings(model=modelo))
+
+    rss_inicial = rss_mb()
+    inicio = time.perf_counter()
+    clientes = []
+    for ruta in secuencia:
+        if modo == "por_llamada":
+            clientes.append(Chroma(collection_name="documentos", embedding_function=CohereEmbeddings(model="embed-multilingual-v2.0"), persist_directory=ruta))
+        else:
+            clientes.append(registro.store(ruta))
+    duracion = time.perf_counter() - inicio
+    print(json.dumps({
+        "modo": modo,
+        "aperturas": len(secuencia),
+        "clientes_distintos": len({id(cliente) for cliente in clientes}),
+        "segundos": round(duracion, 4),
+        "rss_incremental_mb": round(rss_mb() - rss_inicial, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subidas", type=int, default=5)
+    parser.add_argument("--modo", choices=["por_llamada", "registro"])
+    args = parser.parse_args()
+
+    if args.modo:
+        ejecutar_modo(args.modo, args.subidas)
+        return
+
+    for modo in ("por_llamada", "registro"):
+        salida = subprocess.run(
+            [sys.executable, "-m", "benchmarks.benchmark_registro", "--modo", modo, "--subidas", str(args.subidas)],
+            cwd=RAIZ, capture_output=True, text=True, check=True,
+        ).stdout
+        print(salida.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark de la ingesta incremental basada en el manifiesto.
+
+1. Indexa una copia de `documents/` con un modelo de embeddings simulado.
+2. Mide una re-ejecución sin cambios (solo revisa fechas y tamaños en el manifiesto).
+3. Reemplaza el contenido de un archivo y elimina otro, y verifica que solo se re-indexa
+   el modificado y que los fragmentos del eliminado desaparecen de la base.
+
+Uso:
+    python -m benchmarks.benchmark_reindexado
+"""
+
+import os
+import shutil
+import time
+from benchmarks.stubs import EmbeddingsSimulados, preparar_entorno_aislado
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    preparar_entorno_aislado()
+    from langchain_chroma import Chroma
+    from app.cargar_en_chroma_db import indexar_documentos
+
+    corpus = os.path.abspath("corpus")
+    shutil.copytree(os.path.join(RAIZ, "documents", "preprocessed"), corpus)
+    shutil.copy2(os.path.join(RAIZ, "documents", "uploaded", "HowtoStartAStartUp.pdf"), corpus)
+    embeddings = EmbeddingsSimulados()
+
+    reporte = indexar_documentos(corpus, "chroma", flag_nuevo=False, embeddings=embeddings)
+    print(f"Ingesta inicial: {reporte.fragmentos} fragmentos en {reporte.segundos * 1000:.1f} ms")
+
+    inicio = time.perf_counter()
+    reporte = indexar_documentos(corpus, "chroma", flag_nuevo=False, embeddings=embeddings)
+    print(f"Re-ejecución sin cambios: {reporte.documentos_procesados} documentos procesados "
+          f"en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    assert reporte.documentos_procesados == 0
+
+    # Modificar un archivo (mismo nombre, otro contenido) y eliminar otro
+    shutil.copy2(os.path.join(RAIZ, "documents", "preprocessed", "story_amarok.pdf"), os.path.join(corpus, "HowtoStartAStartUp.pdf"))
+    os.remove(os.path.join(corpus, "documento.docx"))
+    reporte = indexar_documentos(corpus, "chroma", flag_nuevo=True, embeddings=embeddings)
+    print(f"Tras modificar y eliminar: procesados={reporte.documentos_procesados} "
+          f"reindexados={reporte.documentos_reindexados} eliminados={reporte.documentos_eliminados}")
+    assert reporte.documentos == ["HowtoStartAStartUp.pdf"]
+    assert reporte.documentos_reindexados == 1 and reporte.documentos_eliminados == 1
+
+    vector_store = Chroma(collection_name="documentos", embedding_function=embeddings, persist_directory="chroma")
+    metadatos = vector_store.get(include=["metadatas"])["metadatas"]
+    conteo = {}
+    for metadato in metadatos:
+        conteo[metadato["document"]] = conteo.get(metadato["document"], 0) + 1
+    print(f"Fragmentos por documento en la base: {conteo}")
+    assert "documento.docx" not in conteo
+    assert conteo["HowtoStartAStartUp.pdf"] == conteo["story_amarok.pdf"]
+    print("OK: solo se re-indexó el archivo modificado y se eliminaron los vectores del borrado.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Benchmark de los controles de latencia de cola del cliente del modelo (app.cliente_llm).
+
+Usa un LLM simulado que inyecta fallas (LLMConFallas):
+1. Cola lenta: una fracción de las llamadas tarda mucho más que el resto. Compara p50, p99 y
+   máximo de ClienteLLM.invocar sin controles, con plazo (las lentas se abandonan y fallan) y
+   con cobertura (las lentas se repiten tras el p95 y gana la primera respuesta).
+2. Errores transitorios (HTTP 503): proporción de llamadas exitosas sin y con reintentos.
+3. Proveedor caído (las llamadas no responden): latencia de procesar_consulta para una
+   pregunta en inglés sin controles, y con plazos, circuito y modelo de respaldo. Con los
+   controles, las primeras consultas esperan el plazo de generación y usan el respaldo; al
+   abrirse el circuito fallan de inmediato, la generación pasa al respaldo sin esperar y la
+   traducción se omite (la respuesta queda en español).
+
+Uso:
+    python -m benchmarks.benchmark_resiliencia --llamadas 400 --tasa-lentas 0.02 --latencia-lenta 1.0
+"""
+
+import argparse
+import os
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.stubs import LLMSimulado, preparar_entorno_aislado
+
+PREGUNTA = "What happens at the end of the story?"
+
+
+class ErrorProveedor(Exception):
+    """
+    Error HTTP simulado del proveedor, con el atributo status_code de los errores de Cohere.
+    """
+
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class LLMConFallas(LLMSimulado):
+    """
+    LLM simulado que inyecta fallas en las llamadas.
+
+    Parameters:
+        tasa_errores (float): Fracción de llamadas que fallan con HTTP 503.
+        tasa_lentas (float): Fracción de llamadas que tardan `latencia_lenta` en lugar de `latencia`.
+        latencia_lenta (float): Segundos de las llamadas lentas.
+        caido (bool): Si es True, ninguna llamada responde antes de `latencia_lenta` y luego fallan con 503.
+        semilla (int): Semilla de las fallas.
+    """
+
+    def __init__(self, tasa_errores=0.0, tasa_lentas=0.0, latencia_lenta=2.0, caido=False, semilla=7, **kwargs):
+        super().__init__(**kwargs)
+        self.tasa_errores = tasa_errores
+        self.tasa_lentas = tasa_lentas
+        self.latencia_lenta = latencia_lenta
+        self.caido = caido
+        self._aleatorio = random.Random(semilla)
+        self._lock = threading.Lock()
+
+    def _falla(self):
+        if self.caido:
+            time.sleep(self.latencia_lenta)
+            raise ErrorProveedor(503)
+        with self._lock:
+            error, lenta = self._aleatorio.random() < self.tasa_errores, self._aleatorio.random() < self.tasa_lentas
+        if error:
+            raise ErrorProveedor(503)
+        if lenta:
+            time.sleep(self.latencia_lenta - self.latencia)
+
+    def invoke(self, prompt):
+        self._falla()
+        return super().invoke(prompt)
+
+    def stream(self, prompt):
+        self._falla()
+        yield from super().stream(prompt)
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+
+def medir_llamadas(cliente, llamadas, concurrencia):
+    """
+    Ejecuta `llamadas` invocaciones de generación con `concurrencia` hilos.
+
+    Returns:
+        dict: Latencias p50/p99/máxima en ms y proporción de llamadas exitosas.
+    """
+    from app.cliente_llm import LLMNoDisponible
+
+    def llamar(_):
+        inicio = time.perf_counter()
+        try:
+            cliente.invocar("Pregunta de prueba", "generacion")
+            exito = True
+        except (LLMNoDisponible, ErrorProveedor):
+            exito = False
+        return time.perf_counter() - inicio, exito
+
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        resultados = list(pool.map(llamar, range(llamadas)))
+    latencias = [latencia * 1000 for latencia, _ in resultados]
+    return {
+        "p50": percentil(latencias, 0.50), "p99": percentil(latencias, 0.99), "max": max(latencias),
+        "exitos": sum(exito for _, exito in resultados) / llamadas,
+    }
+
+
+def medir_caida(services, consultas):
+    """
+    Ejecuta `consultas` veces procesar_consulta y devuelve sus latencias (ms) y respuestas.
+    """
+    from app.models import SolicitudConsulta
+
+    state = SolicitudConsulta(user_name="bench", question=PREGUNTA)
+    filas = []
+    for _ in range(consultas):
+        inicio = time.perf_counter()
+        try:
+            respuesta = services.procesar_consulta(state, "doc.pdf", 0)["answer"]
+        except Exception as e:
+            respuesta = type(e).__name__
+        filas.append(((time.perf_counter() - inicio) * 1000, respuesta))
+    return filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llamadas", type=int, default=400)
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--latencia-llm", type=float, default=0.05)
+    parser.add_argument("--tasa-lentas", type=float, default=0.02)
+    parser.add_argument("--latencia-lenta", type=float, default=1.0)
+    parser.add_argument("--tasa-errores", type=float, default=0.1)
+    parser.add_argument("--plazo", type=float, default=0.3, help="Plazo de generación con controles, en segundos")
+    parser.add_argument("--latencia-caida", type=float, default=3.0, help="Segundos sin respuesta del proveedor caído")
+    parser.add_argument("--consultas-caida", type=int, default=8)
+    args = parser.parse_args()
+
+    preparar_entorno_aislado()
+    os.environ["CACHE_RESPUESTAS_MAX"] = "0"
+    from app import services
+    from app.cliente_llm import PLAZOS_LLM, ClienteLLM
+
+    sin_plazo = dict.fromkeys(PLAZOS_LLM, 3600.0)
+    con_plazo = {**PLAZOS_LLM, "generacion": args.plazo, "traduccion": args.plazo}
+
+    def cliente(llm, plazos, **kwargs):
+        opciones = {"max_reintentos": 0, "umbral_fallos": 10 ** 6, "espera_base": args.latencia_llm, **kwargs}
+        return ClienteLLM(lambda: llm, plazos=plazos, max_llamadas=64, **opciones)
+
+    # 1. Cola lenta
+    print(f"{args.llamadas} llamadas ({args.concurrencia} a la vez), {args.latencia_llm * 1000:.0f} ms cada una y "
+          f"{args.tasa_lentas:.0%} de {args.latencia_lenta * 1000:.0f} ms")
+    print(f"{'Controles':<28}{'p50 (ms)':>10}{'p99 (ms)':>10}{'máx (ms)':>10}{'éxitos':>9}")
+
+    def lenta():
+        return LLMConFallas(tasa_lentas=args.tasa_lentas, latencia_lenta=args.latencia_lenta, latencia=args.latencia_llm)
+
+    escenarios = [
+        ("sin controles", cliente(lenta(), sin_plazo)),
+        (f"plazo {args.plazo * 1000:.0f} ms", cliente(lenta(), con_plazo)),
+        ("plazo + cobertura p95", cliente(lenta(), con_plazo, cobertura=True)),
+    ]
+    cola = {}
+    for nombre, cliente_llm in escenarios:
+        cola[nombre] = fila = medir_llamadas(cliente_llm, args.llamadas, args.concurrencia)
+        extra = f"  ({cliente_llm.estadisticas()['coberturas']} coberturas)" if cliente_llm.cobertura else ""
+        print(f"{nombre:<28}{fila['p50']:>10.0f}{fila['p99']:>10.0f}{fila['max']:>10.0f}{fila['exitos']:>9.1%}{extra}")
+    sin_controles, cobertura = cola["sin controles"], cola["plazo + cobertura p95"]
+    assert cobertura["p99"] < sin_controles["p99"] / 2, "La cobertura debería recortar el p99"
+    assert cobertura["exitos"] > 0.99
+
+    # 2. Errores transitorios
+    print(f"\nErrores transitorios (HTTP 503) en el {args.tasa_errores:.0%} de las llamadas")
+    print(f"{'Reintentos':<28}{'p50 (ms)':>10}{'p99 (ms)':>10}{'máx (ms)':>10}{'éxitos':>9}")
+    errores = {}
+    for reintentos in (0, 2):
+        llm = LLMConFallas(tasa_errores=args.tasa_errores, latencia=args.latencia_llm)
+        plazos = {**PLAZOS_LLM, "generacion": 2.0}
+        errores[reintentos] = fila = medir_llamadas(cliente(llm, plazos, max_reintentos=reintentos), args.llamadas, args.concurrencia)
+        print(f"{reintentos:<28}{fila['p50']:>10.0f}{fila['p99']:>10.0f}{fila['max']:>10.0f}{fila['exitos']:>9.1%}")
+    assert errores[2]["exitos"] > errores[0]["exitos"] and errores[2]["exitos"] > 0.98
+
+    # 3. Proveedor caído (sin los avisos de cada respaldo y traducción omitida)
+    logging.getLogger("app").setLevel(logging.ERROR)
+    services.retrieve = lambda state, doc_seleccionado, embedding=None: {"context": ["Fragmento de contexto simulado."]}
+    caido = LLMConFallas(caido=True, latencia_lenta=args.latencia_caida, latencia=args.latencia_llm)
+    respaldo = LLMSimulado(latencia=args.latencia_llm)
+    print(f"\nProveedor caído ({args.latencia_caida:.0f} s sin respuesta y luego HTTP 503): procesar_consulta en inglés")
+
+    services.llm = caido
+    services.cliente_llm = cliente(caido, sin_plazo)
+    antes = medir_caida(services, 2)
+    print(f"sin controles: {[f'{ms:.0f} ms' for ms, _ in antes]} -> {antes[0][1]}")
+
+    services.cliente_llm = ClienteLLM(
+        lambda: services.llm, respaldo=lambda: respaldo, plazos={**PLAZOS_LLM, "generacion": 1.0, "traduccion": 1.0},
+        max_reintentos=1, espera_base=args.latencia_llm, umbral_fallos=3, espera_circuito=60.0
+    )
+    despues = medir_caida(services, args.consultas_caida)
+    estadisticas = services.cliente_llm.estadisticas()
+    print(f"con plazos, circuito y respaldo: {[f'{ms:.0f} ms' for ms, _ in despues]}")
+    print(f"  respuestas del respaldo: {estadisticas['respaldos']}, rechazos del circuito: {estadisticas['rechazos_circuito']}, "
+          f"aperturas: {estadisticas['aperturas_principal']}, respuesta: {despues[-1][1]!r}")
+    assert all(respuesta == LLMSimulado.respuesta for _, respuesta in despues), "Todas las consultas deberían responder"
+    assert despues[-1][0] < antes[-1][0] / 10, "Con el circuito abierto la consulta no debería esperar al proveedor"
+    print("\nOK: cobertura recorta el p99, los reintentos absorben los 503 y con el proveedor caído "
+          "el circuito y el respaldo mantienen las respuestas.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark del tiempo hasta el primer token (TTFT) con y sin streaming.
+
+Compara procesar_consulta (el usuario ve la respuesta al terminar) con procesar_consulta_stream
+usando un LLM simulado, para una pregunta en español (streaming directo de la generación) y
+otra en inglés (generación completa + streaming de la traducción).
+
+Uso:
+    python -m benchmarks.benchmark_streaming --latencia-llm 1.0
+"""
+
+import argparse
+import os
+import time
+from benchmarks.stubs import LLMSimulado, preparar_entorno_aislado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latencia-llm", type=float, default=1.0)
+    parser.add_argument("--latencia-recuperacion", type=float, default=0.2)
+    args = parser.parse_args()
+
+    preparar_entorno_aislado()
+    os.environ["CACHE_RESPUESTAS_MAX"] = "0"
+    from app import services
+    from app.metricas import metricas
+    from app.models import SolicitudConsulta
+
+    services.llm = LLMSimulado(latencia=args.latencia_llm)
+
+    def retrieve_simulado(state, doc_seleccionado, embedding=None):
+        time.sleep(args.latencia_recuperacion)
+        return {"context": ["Fragmento de contexto simulado."]}
+
+    services.retrieve = retrieve_simulado
+
+    for pregunta in ("¿De qué trata la historia?", "What is the story about?"):
+        state = SolicitudConsulta(user_name="bench", question=pregunta)
+
+        inicio = time.perf_counter()
+        services.procesar_consulta(state, "doc.pdf", 0)
+        bloqueante = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        primer_token = None
+        for _ in services.procesar_consulta_stream(state, "doc.pdf", 0):
+            if primer_token is None:
+                primer_token = time.perf_counter() - inicio
+        total = time.perf_counter() - inicio
+
+        print(f"{pregunta!r:<32} bloqueante={bloqueante * 1000:7.1f} ms  "
+              f"stream TTFT={primer_token * 1000:7.1f} ms total={total * 1000:7.1f} ms")
+
+    print("Métrica tiempo_primer_token_segundos:", metricas.resumen("tiempo_primer_token_segundos"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+Dobles de prueba locales para medir el rendimiento del pipeline sin claves de Cohere.
+
+Funcionalidades principales:
+- Reexportar los modelos simulados de `app.modelos_simulados` (chat y embeddings).
+- Preparar un entorno aislado (proveedor simulado y directorio temporal) antes de importar `app`.
+"""
+
+import os
+import tempfile
+from app.modelos_simulados import EmbeddingsSimulados, LLMSimulado
+
+__all__ = ["EmbeddingsSimulados", "LLMSimulado", "preparar_entorno_aislado"]
+
+
+def preparar_entorno_aislado():
+    """
+    Selecciona los modelos simulados y cambia a un directorio temporal para que las bases
+    Chroma creadas al importar `app.services` no toquen las del proyecto.
+
+    Returns:
+        str: Ruta del directorio temporal de trabajo.
+    """
+    os.environ.setdefault("PROVEEDOR_MODELOS", "simulado")
+    # Algunos benchmarks crean clientes de Cohere (sin llamarlos) y los validan al construirlos
+    os.environ.setdefault("COHERE_API_KEY", "clave-ficticia")
+    os.environ.setdefault("LANGCHAIN_API_KEY", "clave-ficticia")
+    directorio = tempfile.mkdtemp(prefix="rag_bench_")
+    os.chdir(directorio)
+    return directorio
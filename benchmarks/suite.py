@@ -0,0 +1,251 @@
+"""
+Suite de benchmarks end-to-end sin conexión, con resultados en JSON para comparar entre ejecuciones.
+
+Usa los modelos simulados (PROVEEDOR_MODELOS=simulado) con latencias configurables sobre una
+copia de `documents/`, y mide:
+1. arranque: importación de app.services e inicialización de los documentos en un proceso
+   nuevo, con la base vacía (en frío) y con la base ya construida (reinicio).
+2. ingesta: páginas/s y fragmentos/s de indexar todos los documentos con embeddings no cacheados.
+3. consultas: distribución de latencia de procesar_consulta y percentiles por etapa.
+4. concurrencia: usuarios simultáneos con procesar_consulta_stream (consultas/s, latencia y
+   tiempo hasta el primer token).
+
+Las claves terminadas en _ms o _s son tiempos (menor es mejor) y las terminadas en _por_s,
+tasas (mayor es mejor). Con --comparar se muestran las diferencias frente a un JSON anterior y
+se marcan las que empeoran más que --tolerancia.
+
+Uso:
+    python -m benchmarks.suite --salida resultados.json
+    python -m benchmarks.suite --salida nuevos.json --comparar resultados.json --tolerancia 0.15
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.stubs import preparar_entorno_aislado
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOCUMENTO = "story_amarok.pdf"
+PREGUNTAS = [
+    "¿Quién es el protagonista de la historia?",
+    "What does the story say about the village?",
+    "¿Qué ocurre al final del relato?",
+    "O que acontece no final da história?",
+]
+
+# Se ejecuta en un proceso nuevo para que las importaciones cuenten como en un arranque real
+SCRIPT_ARRANQUE = """
+import json, time
+inicio = time.perf_counter()
+from app import services
+importacion = time.perf_counter() - inicio
+from app.inicializar_db import inicializar_documentos
+inicio_documentos = time.perf_counter()
+documentos = inicializar_documentos()
+inicializacion = time.perf_counter() - inicio_documentos
+print(json.dumps({"importacion_s": importacion, "inicializacion_s": inicializacion, "documentos": len(documentos)}))
+"""
+
+
+def percentiles(valores_segundos):
+    ordenados = sorted(valores_segundos)
+
+    def posicion(p):
+        return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+    return {
+        "media_ms": statistics.fmean(ordenados) * 1000,
+        "p50_ms": posicion(50) * 1000,
+        "p95_ms": posicion(95) * 1000,
+        "p99_ms": posicion(99) * 1000,
+    }
+
+
+def medir_arranque(directorio):
+    """
+    Ejecuta el arranque en un proceso nuevo sobre `directorio`, primero con la base vacía y
+    luego con la base ya construida.
+    """
+    entorno = dict(os.environ, PYTHONPATH=RAIZ + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    resultados = {}
+    for escenario in ("en_frio", "reinicio"):
+        inicio = time.perf_counter()
+        proceso = subprocess.run([sys.executable, "-c", SCRIPT_ARRANQUE], cwd=directorio, env=entorno,
+                                 capture_output=True, text=True, check=True)
+        resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+        resultado["proceso_s"] = time.perf_counter() - inicio
+        resultados[escenario] = resultado
+    return resultados
+
+
+def medir_ingesta():
+    from app.cargar_en_chroma_db import indexar_documentos
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        reporte = indexar_documentos("documents/preprocessed", "chroma_db/preprocessed", flag_nuevo=False)
+        reporte.acumular(indexar_documentos("documents/uploaded", "chroma_db/uploaded", flag_nuevo=False))
+    return {
+        "documentos": reporte.documentos_procesados,
+        "paginas": reporte.paginas,
+        "fragmentos": reporte.fragmentos,
+        "total_s": reporte.segundos,
+        "paginas_por_s": reporte.paginas_por_segundo,
+        "fragmentos_por_s": reporte.fragmentos_por_segundo,
+    }
+
+
+def medir_consultas(cantidad):
+    from app import services
+    from app.metricas import metricas
+    from app.models import SolicitudConsulta
+
+    latencias = []
+    for posicion in range(cantidad):
+        state = SolicitudConsulta(user_name="suite", question=PREGUNTAS[posicion % len(PREGUNTAS)])
+        inicio = time.perf_counter()
+        services.procesar_consulta(state, DOCUMENTO, 0)
+        latencias.append(time.perf_counter() - inicio)
+
+    resultado = {"consultas": cantidad, **percentiles(latencias), "etapas": {}}
+    for etapa in ("recuperacion", "deteccion_idioma", "generacion", "traduccion"):
+        resumen = metricas.resumen("etapa_segundos", etapa=etapa)
+        if resumen["cantidad"]:
+            resultado["etapas"][etapa] = {"p50_ms": resumen["p50"] * 1000, "p95_ms": resumen["p95"] * 1000}
+    return resultado
+
+
+def medir_concurrencia(usuarios, consultas_por_usuario):
+    from app import services
+    from app.models import SolicitudConsulta
+
+    def usuario(numero):
+        latencias, primeros_tokens = [], []
+        for posicion in range(consultas_por_usuario):
+            state = SolicitudConsulta(user_name=f"usuario{numero}", question=PREGUNTAS[(numero + posicion) % len(PREGUNTAS)])
+            inicio, primer_token = time.perf_counter(), None
+            for _ in services.procesar_consulta_stream(state, DOCUMENTO, 0):
+                if primer_token is None:
+                    primer_token = time.perf_counter() - inicio
+            latencias.append(time.perf_counter() - inicio)
+            primeros_tokens.append(primer_token)
+        return latencias, primeros_tokens
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=usuarios) as pool:
+        por_usuario = list(pool.map(usuario, range(usuarios)))
+    total = time.perf_counter() - inicio
+
+    latencias = [valor for resultado, _ in por_usuario for valor in resultado]
+    primeros_tokens = [valor for _, resultado in por_usuario for valor in resultado]
+    return {
+        "usuarios": usuarios,
+        "consultas": len(latencias),
+        "total_s": total,
+        "consultas_por_s": len(latencias) / total,
+        "latencia": percentiles(latencias),
+        "primer_token": percentiles(primeros_tokens),
+    }
+
+
+def _aplanar(datos, prefijo=""):
+    for clave, valor in datos.items():
+        ruta = f"{prefijo}{clave}"
+        if isinstance(valor, dict):
+            yield from _aplanar(valor, ruta + ".")
+        elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            yield ruta, valor
+
+
+def comparar(anteriores, actuales, tolerancia):
+    """
+    Muestra las diferencias entre dos ejecuciones y devuelve las métricas que empeoraron.
+
+    Returns:
+        list: Rutas de las métricas que empeoraron más que la tolerancia.
+    """
+    previos = dict(_aplanar(anteriores["resultados"]))
+    regresiones = []
+    print(f"\n{'Métrica':<46}{'anterior':>12}{'actual':>12}{'cambio':>10}")
+    for ruta, valor in _aplanar(actuales["resultados"]):
+        if ruta not in previos:
+            continue
+        previo = previos[ruta]
+        cambio = (valor - previo) / previo if previo else 0.0
+        if ruta.endswith(("_ms", "_s")) and not ruta.endswith("_por_s"):
+            empeora = cambio > tolerancia
+        elif ruta.endswith("_por_s"):
+            empeora = cambio < -tolerancia
+        else:
+            empeora = False
+        if empeora:
+            regresiones.append(ruta)
+        print(f"{ruta:<46}{previo:>12.2f}{valor:>12.2f}{cambio:>+10.1%}{'  ⚠️' if empeora else ''}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto, solo la salida estándar)")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.15, help="Empeoramiento relativo admitido")
+    parser.add_argument("--latencia-llm", type=float, default=0.05)
+    parser.add_argument("--latencia-embeddings", type=float, default=0.02)
+    parser.add_argument("--consultas", type=int, default=40)
+    parser.add_argument("--usuarios", type=int, default=8)
+    parser.add_argument("--consultas-por-usuario", type=int, default=5)
+    parser.add_argument("--omitir-arranque", action="store_true", help="No medir el arranque en procesos nuevos")
+    args = parser.parse_args()
+
+    salida = os.path.abspath(args.salida) if args.salida else None
+    comparar_con = os.path.abspath(args.comparar) if args.comparar else None
+
+    os.environ["PROVEEDOR_MODELOS"] = "simulado"
+    os.environ["LATENCIA_LLM_SIMULADO"] = str(args.latencia_llm)
+    os.environ["LATENCIA_EMBEDDINGS_SIMULADOS"] = str(args.latencia_embeddings)
+    os.environ["CACHE_RESPUESTAS_MAX"] = "0"  # Medir el pipeline completo, sin caché de respuestas
+    os.environ["PUERTO_METRICAS"] = "0"
+    directorio = preparar_entorno_aislado()
+
+    resultados = {}
+    if not args.omitir_arranque:
+        arranque = os.path.join(directorio, "arranque")
+        shutil.copytree(os.path.join(RAIZ, "documents"), os.path.join(arranque, "documents"))
+        resultados["arranque"] = medir_arranque(arranque)
+        print(f"arranque: {json.dumps(resultados['arranque'])}", file=sys.stderr)
+
+    shutil.copytree(os.path.join(RAIZ, "documents"), "documents")
+    resultados["ingesta"] = medir_ingesta()
+    print(f"ingesta: {json.dumps(resultados['ingesta'])}", file=sys.stderr)
+    resultados["consultas"] = medir_consultas(args.consultas)
+    print(f"consultas: {json.dumps(resultados['consultas'])}", file=sys.stderr)
+    resultados["concurrencia"] = medir_concurrencia(args.usuarios, args.consultas_por_usuario)
+
+    informe = {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "parametros": {clave: valor for clave, valor in vars(args).items() if clave not in ("salida", "comparar")},
+        "resultados": resultados,
+    }
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if salida:
+        with open(salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    print(texto)
+
+    if comparar_con:
+        with open(comparar_con, encoding="utf-8") as f:
+            regresiones = comparar(json.load(f), informe, args.tolerancia)
+        print(f"\n{len(regresiones)} regresiones por encima del {args.tolerancia:.0%}")
+        sys.exit(1 if regresiones else 0)
+
+
+if __name__ == "__main__":
+    main()
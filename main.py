@@ -1,12 +1,11 @@
-import os
-import shutil
 import gradio as gr
 from app.models import SolicitudConsulta
-from app.services import procesar_consulta
-from app.config import load_env_vars
-from app.inicializar_db import inicializar_documentos
-from app.cargar_en_chroma_db import cargar_documentos_en_chroma_db
-from dotenv import load_dotenv
+from app.config import configurar_logging, load_env_vars, obtener_parametro
+from app.inicializar_db import documentos_en_cache
+from app.arranque import ARRANQUE_DIFERIDO, calentamiento
+from app.metricas import configurar_trazas, iniciar_servidor_metricas
+from app.admision import MAX_COLA_CONSULTAS, MAX_CONSULTAS_CONCURRENTES, ColaLlena
+from app.cliente_llm import LLMNoDisponible
 
 # Credenciales para autenticación (solo para DEMO)
 USERNAME = "admin"  # Nombre de usuario predeterminado
@@ -15,60 +14,105 @@ PASSWORD = "1234"  # Contraseña predeterminada
 # Carga de Variables de entorno
 load_env_vars()
 
-# Carga de documentos iniciales en Preprocessed y Uploaded
-lista_documentos_iniciales = inicializar_documentos()
+# Logging por niveles, trazas JSONL rotativas y endpoint /metrics (PUERTO_METRICAS) en segundo plano
+configurar_logging()
+configurar_trazas()
+iniciar_servidor_metricas()
 
-def btn_cargar_archivo_nuevo(files, chatbot, rag_with_dropdown):
+# Si es True, la respuesta se genera directamente en el idioma detectado (sin traducción)
+MODO_UNICA_LLAMADA = obtener_parametro("MODO_UNICA_LLAMADA", False, bool)
+
+# Documentos iniciales en Preprocessed y Uploaded. Con el arranque diferido se leen de los
+# manifiestos de ingesta y la indexación, Chroma y los modelos se inicializan en segundo plano
+if ARRANQUE_DIFERIDO:
+    lista_documentos_iniciales = documentos_en_cache()
+else:
+    lista_documentos_iniciales = calentamiento.esperar()
+
+def documentos_disponibles():
+    """
+    Devuelve los documentos consultables: los iniciales más los indexados por tareas completadas.
+    """
+    if not calentamiento.listo:
+        return lista_documentos_iniciales
+    from app.cola_indexacion import cola_indexacion
+    return list(dict.fromkeys(calentamiento.resultado + cola_indexacion.documentos_indexados()))
+
+def refrescar_documentos():
     """
-    Carga nuevos archivos seleccionados en ChromaDB y actualiza la interfaz con un mensaje de confirmación.
+    Actualiza las opciones del dropdown al cargar (o recargar) la página.
+    """
+    return gr.Dropdown(choices=documentos_disponibles())
+
+def btn_cargar_archivo_nuevo(files, chatbot, tareas_pendientes):
+    """
+    Encola la indexación de los archivos subidos y devuelve de inmediato con el ID de la tarea.
+    El avance se muestra con actualizar_tareas, que se ejecuta periódicamente mientras haya
+    tareas pendientes.
     
     Parameters:
         files (List): Lista de archivos subidos.
         chatbot (List): Historial del chatbot para mostrar mensajes.
-        rag_with_dropdown (str): Dropdown para seleccionar documentos.
+        tareas_pendientes (List): IDs de las tareas de esta sesión aún no terminadas.
     
     Returns:
-        tuple: Estado del chatbot actualizado y lista de documentos actualizada en el dropdown.
+        tuple: Caja de texto, chatbot, tareas pendientes, estado de las tareas y temporizador activado.
     """
+    from app.cola_indexacion import cola_indexacion
+
     try:
         # Directorios para almacenar archivos subidos y persistencia en ChromaDB
         upload_dir = "documents/uploaded/"
         persist_dir = "chroma_db/uploaded/"
-        
-        documentos_cargados = []
-
-        # Guardar cada archivo en el directorio correspondiente
-        for file in files:
-            file_name = os.path.basename(file.name)
-            file_path = os.path.join(upload_dir, file_name)
-            shutil.copy2(file.name, file_path) # Copiar el archivo al directorio uploaded
-            documentos_cargados.append(file_name)
-
-        # Procesar los documentos cargados e indexarlos en ChromaDB
-        nuevos_documentos = cargar_documentos_en_chroma_db(
-            directory=upload_dir,
-            persist_directory=persist_dir,
-            flag_nuevo=True
-        )
-        
-        # Combinar lista de documentos iniciales y nuevos
-        lista_documentos_total = lista_documentos_iniciales + nuevos_documentos
-
-        # Actualizar historial del chatbot con mensaje de éxito
-        chatbot.append({"role": "user", "content": "Cargando documento..."})
-        chatbot.append({"role": "assistant", "content": "Documento cargado con éxito. Ya puedes hacerle consultas :)"})
 
-        # Retornar el estado actualizado
-        return "", chatbot, gr.Dropdown(choices=lista_documentos_total, value=lista_documentos_total[-1])
+        # La copia y la indexación se hacen en segundo plano, solo para los archivos subidos
+        tarea = cola_indexacion.encolar([file.name for file in files], upload_dir, persist_dir)
+        tareas_pendientes = tareas_pendientes + [tarea.id]
+
+        chatbot.append({"role": "user", "content": "Cargando documento..."})
+        chatbot.append({"role": "assistant", "content": f"Indexando en segundo plano (tarea {tarea.id}). Te aviso cuando esté listo :)"})
+        return "", chatbot, tareas_pendientes, tarea.descripcion(), gr.Timer(active=True)
     except Exception as e:
         # Manejo de errores y actualización del chatbot
         chatbot.append({"role": "assistant", "content": f"Error al cargar documento: {str(e)}"})
-        return "", chatbot, gr.Dropdown()
+        return "", chatbot, tareas_pendientes, "", gr.Timer()
+
+def actualizar_tareas(tareas_pendientes, chatbot):
+    """
+    Revisa las tareas de indexación pendientes de la sesión: muestra su avance y, al terminar,
+    avisa en el chatbot y agrega los documentos nuevos al dropdown.
+
+    Parameters:
+        tareas_pendientes (List): IDs de las tareas de esta sesión aún no terminadas.
+        chatbot (List): Historial del chatbot.
+
+    Returns:
+        tuple: Tareas pendientes, chatbot, dropdown, estado de las tareas y temporizador.
+    """
+    from app.cola_indexacion import cola_indexacion
+
+    pendientes, lineas, nuevos = [], [], []
+    for tarea_id in tareas_pendientes:
+        tarea = cola_indexacion.obtener(tarea_id)
+        if tarea is None:
+            continue
+        lineas.append(tarea.descripcion())
+        if tarea.activa:
+            pendientes.append(tarea_id)
+        elif tarea.error:
+            chatbot.append({"role": "assistant", "content": f"Error al cargar documento: {tarea.error}"})
+        else:
+            chatbot.append({"role": "assistant", "content": "Documento cargado con éxito. Ya puedes hacerle consultas :)"})
+            nuevos.extend(tarea.documentos)
+
+    # El dropdown solo cambia cuando termina alguna tarea; se selecciona el último documento nuevo
+    dropdown = gr.Dropdown(choices=list(dict.fromkeys(documentos_disponibles() + nuevos)), value=nuevos[-1]) if nuevos else gr.Dropdown()
+    return pendientes, chatbot, dropdown, "\n\n".join(lineas), gr.Timer(active=bool(pendientes))
     
 # Función para procesar la consulta
 def consultar_llm(question, doc_seleccionado, history, temperature):
     """
-    Procesa la consulta del usuario y devuelve la respuesta generada por el modelo LLM.
+    Procesa la consulta del usuario y muestra la respuesta del modelo LLM a medida que se genera.
 
     Parameters:
         question (str): Pregunta del usuario.
@@ -76,23 +120,42 @@ def consultar_llm(question, doc_seleccionado, history, temperature):
         history (List): Historial de interacciones del chatbot.
         temperature (float): Valor de temperatura para la generación de texto.
 
-    Returns:
-        tuple: Historial actualizado y texto de la consulta enviada.
+    Yields:
+        tuple: Historial actualizado con la respuesta parcial y texto de la consulta enviada.
     """
+    # Agregar la pregunta y un mensaje del asistente que se completa token a token
+    history.append({"role": "user", "content": question})
+    history.append({"role": "assistant", "content": ""})
+
+    # La primera consulta espera a que termine la inicialización en segundo plano
+    try:
+        calentamiento.esperar()
+    except Exception as e:
+        history[-1]["content"] = f"La aplicación no pudo inicializarse ({e}). Revisa los logs del servidor."
+        yield history, ""
+        return
+    from app.services import procesar_consulta_stream
+
     # Crear instancia de la solicitud de consulta
     state = SolicitudConsulta(
         user_name=USERNAME,
         question=str(question)
     )
 
-    # Procesar la consulta utilizando el servicio configurado
-    response = procesar_consulta(state, doc_seleccionado, temperature)
-
-    # Actualizar el historial con el rol de usuario y asistente
-    history.append({"role": "user", "content": question})
-    history.append({"role": "assistant", "content": response["answer"]})
-    
-    return history, ""
+    # Los errores esperables se muestran en el chat en lugar del error genérico de Gradio
+    try:
+        for respuesta_parcial in procesar_consulta_stream(state, doc_seleccionado, temperature, MODO_UNICA_LLAMADA):
+            history[-1]["content"] = respuesta_parcial
+            yield history, ""
+    except ColaLlena:
+        history[-1]["content"] = "Hay demasiadas consultas en curso. Intenta nuevamente en unos segundos."
+        yield history, ""
+    except FileNotFoundError:
+        history[-1]["content"] = f"El documento {doc_seleccionado} ya no está disponible. Selecciona otro documento."
+        yield history, ""
+    except LLMNoDisponible:
+        history[-1]["content"] = "El modelo no está disponible en este momento. Intenta nuevamente en unos minutos."
+        yield history, ""
 
 # Interfaz
 with gr.Blocks() as demo:
@@ -131,35 +194,65 @@ with gr.Blocks() as demo:
                 rag_with_dropdown = gr.Dropdown(label="Selecciona documento:", scale=2, choices=lista_documentos_iniciales, value=lista_documentos_iniciales[0])
                 clear_button = gr.ClearButton([input_txt, chatbot])
 
+            # Cuarta fila: avance de las tareas de indexación en segundo plano
+            with gr.Row() as row_four:
+                estado_tareas = gr.Markdown()
+                tareas_pendientes = gr.State([])
+                temporizador_tareas = gr.Timer(1.0, active=False)
+
                 # Configuración de eventos de botones
                 file_msg = upload_btn.upload(
                     fn=btn_cargar_archivo_nuevo, 
-                    inputs=[upload_btn, chatbot, rag_with_dropdown], 
-                    outputs=[input_txt, chatbot, rag_with_dropdown], 
+                    inputs=[upload_btn, chatbot, tareas_pendientes], 
+                    outputs=[input_txt, chatbot, tareas_pendientes, estado_tareas, temporizador_tareas], 
                     queue=True
                 )
 
+                temporizador_tareas.tick(
+                    fn=actualizar_tareas,
+                    inputs=[tareas_pendientes, chatbot],
+                    outputs=[tareas_pendientes, chatbot, rag_with_dropdown, estado_tareas, temporizador_tareas],
+                    queue=False
+                )
+
+                # El streaming de respuestas requiere que los eventos pasen por la cola. Ambos
+                # eventos comparten el mismo grupo de workers (concurrency_id) y su límite
                 txt_msg = input_txt.submit(
                     fn=consultar_llm,
                     inputs=[input_txt, rag_with_dropdown, chatbot, temperature_bar],
                     outputs=[chatbot, input_txt],
-                    queue=False
+                    queue=True,
+                    concurrency_limit=MAX_CONSULTAS_CONCURRENTES,
+                    concurrency_id="consultas"
                 )
 
                 text_submit_btn.click(
                     fn=consultar_llm,
                     inputs=[input_txt, rag_with_dropdown, chatbot, temperature_bar],
                     outputs=[chatbot, input_txt],
-                    queue=False
+                    queue=True,
+                    concurrency_limit=MAX_CONSULTAS_CONCURRENTES,
+                    concurrency_id="consultas"
                 ).then(
                     lambda: gr.Textbox(interactive=True), None, [input_txt], queue=False
                 )
 
+    # Al recargar la página el dropdown incluye los documentos subidos desde el arranque
+    demo.load(fn=refrescar_documentos, outputs=[rag_with_dropdown], queue=False)
+
+# Cola de eventos: hasta MAX_CONSULTAS_CONCURRENTES consultas a la vez (Gradio atiende por
+# defecto una sola) y hasta MAX_COLA_CONSULTAS en espera; con la cola llena, Gradio rechaza
+# los eventos nuevos en lugar de acumularlos
+demo.queue(default_concurrency_limit=MAX_CONSULTAS_CONCURRENTES, max_size=MAX_COLA_CONSULTAS)
+
 # Lanzar la aplicación con autenticación
 # La opción `share=True` permite compartir la aplicación públicamente durante su ejecución
 # NOTA: No se usarán credenciales planas en producción
 
-demo.launch(
-    share=True,
-    #auth=[(USERNAME, PASSWORD)] # Si se prende la autenticación entonces el link público no funcionará
-)
\ No newline at end of file
+if __name__ == "__main__":
+    # La inicialización pesada avanza mientras se levanta el servidor
+    calentamiento.iniciar()
+    demo.launch(
+        share=True,
+        #auth=[(USERNAME, PASSWORD)] # Si se prende la autenticación entonces el link público no funcionará
+    )
\ No newline at end of file